@@ -2,39 +2,20 @@ import json
 import logging
 import os
 from base64 import b64decode
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import argparse
 
-# Set up argument parsing
-parser = argparse.ArgumentParser(description='Decode Base64 encoded data from a JSON file')
-parser.add_argument('--write-all', action='store_true', help='Write all files regardless of existence')
-parser.add_argument('--write-new', action='store_true', help='Write only new files that do not already exist')
-args = parser.parse_args()
+from utils.export_stream import iter_export_items, Base64FileSink
 
-# Get the current date and time
-current_time = datetime.now()
-log_directory = 'logs'
-log_filename = f'decoding_logs_{current_time.strftime("%Y_%m_%d_%H_%M_%S")}.log'
-log_file_path = os.path.join(log_directory, log_filename)
+DEFAULT_INPUT_FILE = 'exported_dataset_1189933_1190932.json'
 
-# Ensure 'logs' directory exists or create it
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
-
-# Configure logging to save to the dynamically named log file
-logging.basicConfig(level=logging.INFO, filename=log_file_path,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# Upper bound on Base64 text handed to worker processes but not yet written (--jobs mode)
+MAX_INFLIGHT_BYTES = 256 * 1024 * 1024
 
 # Directory to save the files
 output_directory = 'output_files'
 
-# Create the directory if it doesn't exist
-os.makedirs(output_directory, exist_ok=True)
-
-# Read data from input.json
-with open('exported_dataset_1189933_1190932.json') as json_file:
-    data = json.load(json_file)
-
 # Function to determine file type based on magic numbers
 def determine_file_type(bytes_data):
     if bytes_data[0:4] == b'%PDF':
@@ -52,47 +33,213 @@ def determine_file_type(bytes_data):
     else:
         return 'bin'  # Treat any unsupported file type as a bin file
 
-# Iterate over each item in the JSON data
-for item in data:
-    id = item['id']
-    api_request = item['api_request']
-    b64_string = api_request.encode('utf-8')
-
-    # Decode the Base64 string
-    try:
-        bytes_data = b64decode(b64_string, validate=True)
-    except Exception as e:
-        logging.error(f'Error decoding Base64 string for id: {id} - {e}')
-        continue
-
-    # Determine file type based on magic number
-    file_type = determine_file_type(bytes_data)
-
-    # If file type is None, it's unsupported
-    if file_type is None:
-        logging.warning(f'Unsupported file format for id: {id}')
-        continue
-
-    # Determine output file path
-    output_file_path = os.path.join(output_directory, f'file_{id}.{file_type}')
-
-    # Check if the file exists
-    if os.path.exists(output_file_path):
+def should_write(id, output_file_path, args, exists=None):
+    """Apply the --write-all / --write-new rules for one output file and log the decision."""
+    if exists is None:
+        exists = os.path.exists(output_file_path)
+    if exists:
         if args.write_all:
             logging.info(f'Overwriting existing file for id: {id}')
         elif args.write_new:
             logging.info(f'Skipping existing file for id: {id}')
-            continue
+            return False
         else:
             logging.info(f'File already exists for id: {id}')
-            continue
+            return False
     else:
         logging.info(f'Writing new file for id: {id}')
+    return True
+
+def decode_export(input_file, args):
+    """Original mode: load the whole export, then decode each item in memory."""
+    # Read data from input.json
+    with open(input_file) as json_file:
+        data = json.load(json_file)
+
+    # Iterate over each item in the JSON data
+    for item in data:
+        id = item['id']
+        api_request = item['api_request']
+        b64_string = api_request.encode('utf-8')
+
+        # Decode the Base64 string
+        try:
+            bytes_data = b64decode(b64_string, validate=True)
+        except Exception as e:
+            logging.error(f'Error decoding Base64 string for id: {id} - {e}')
+            continue
+
+        # Determine file type based on magic number
+        file_type = determine_file_type(bytes_data)
+
+        # If file type is None, it's unsupported
+        if file_type is None:
+            logging.warning(f'Unsupported file format for id: {id}')
+            continue
+
+        # Determine output file path
+        output_file_path = os.path.join(output_directory, f'file_{id}.{file_type}')
+
+        # Check if the file exists
+        if not should_write(id, output_file_path, args):
+            continue
 
-    # Write the file contents to a local file in the output directory
-    with open(output_file_path, 'wb') as f:
-        f.write(bytes_data)
+        # Write the file contents to a local file in the output directory
+        with open(output_file_path, 'wb') as f:
+            f.write(bytes_data)
+
+def decode_export_streaming(input_file, args):
+    """--stream mode: parse the export item by item and decode base64 in chunks to disk.
+
+    Peak memory is one read chunk plus one base64 quantum, whatever the export size.
+    When "id" precedes "api_request" in an item (the usual export layout), existing files
+    are skipped after decoding only the first few bytes.
+    """
+    def make_sink(fields_so_far):
+        id = fields_so_far.get('id')
+        if id is None:
+            return Base64FileSink(output_directory)  # decide once the whole item has been read
+
+        def on_head(head):
+            output_file_path = os.path.join(output_directory, f'file_{id}.{determine_file_type(head)}')
+            return should_write(id, output_file_path, args)
+
+        return Base64FileSink(output_directory, on_head)
+
+    for item in iter_export_items(input_file, 'api_request', sink_factory=make_sink):
+        id = item.get('id')
+        sink = item.get('api_request')
+        if not isinstance(sink, Base64FileSink):
+            logging.error(f'Missing Base64 string for id: {id}')
+            continue
+
+        sink.close()
+        if sink.error is not None:
+            logging.error(f'Error decoding Base64 string for id: {id} - {sink.error}')
+            continue
+        if sink.skipped:
+            continue
+
+        output_file_path = os.path.join(output_directory, f'file_{id}.{determine_file_type(sink.head)}')
+        if sink.on_head is None and not should_write(id, output_file_path, args):
+            sink.discard()
+            continue
+        sink.commit(output_file_path)
+
+def decode_and_write(id, api_request, output_file_path):
+    """Worker side of --jobs: decode one item and write it atomically. Returns an error or None."""
+    try:
+        bytes_data = b64decode(api_request.encode('utf-8'), validate=True)
+    except Exception as e:
+        return f'Error decoding Base64 string for id: {id} - {e}'
+    partial_path = f'{output_file_path}.partial_{os.getpid()}'
+    try:
+        with open(partial_path, 'wb') as f:
+            f.write(bytes_data)
+        os.replace(partial_path, output_file_path)
+    except OSError as e:
+        return f'Error writing file for id: {id} - {e}'
+    return None
+
+def decode_exports_parallel(input_files, args):
+    """--jobs mode: the parent streams items and sniffs file types, a process pool decodes and writes.
+
+    Only the first few Base64 characters are decoded in the parent, which is enough for
+    determine_file_type and the --write-all/--write-new decision, so skipped items never
+    reach the pool. Submission pauses while more than MAX_INFLIGHT_BYTES of Base64 text
+    is queued, keeping memory bounded however far the parser is ahead of the workers.
+    """
+    pending = {}
+    inflight_bytes = 0
+    # Paths already handed to the pool count as existing, as they would in the serial modes
+    scheduled = set()
+
+    def drain(block):
+        nonlocal inflight_bytes
+        if not pending:
+            return
+        done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            id, size = pending.pop(future)
+            inflight_bytes -= size
+            try:
+                error = future.result()
+            except Exception as e:
+                error = f'Error decoding Base64 string for id: {id} - {e}'
+            if error:
+                logging.error(error)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for input_file in input_files:
+            logging.info(f'Decoding {input_file} with {args.jobs} processes')
+            for item in iter_export_items(input_file, 'api_request'):
+                id = item.get('id')
+                api_request = item.get('api_request')
+                if not isinstance(api_request, str):
+                    logging.error(f'Missing Base64 string for id: {id}')
+                    continue
+
+                # 24 Base64 characters decode to 18 bytes, more than the longest magic number
+                try:
+                    head = b64decode(api_request[:24].encode('utf-8'), validate=True)
+                except Exception as e:
+                    logging.error(f'Error decoding Base64 string for id: {id} - {e}')
+                    continue
+                output_file_path = os.path.join(output_directory, f'file_{id}.{determine_file_type(head)}')
+                exists = output_file_path in scheduled or os.path.exists(output_file_path)
+                if not should_write(id, output_file_path, args, exists):
+                    continue
+                scheduled.add(output_file_path)
+
+                size = len(api_request)
+                while pending and (inflight_bytes + size > MAX_INFLIGHT_BYTES or len(pending) >= args.jobs * 4):
+                    drain(block=True)
+                future = executor.submit(decode_and_write, id, api_request, output_file_path)
+                pending[future] = (id, size)
+                inflight_bytes += size
+                del api_request, item
+                drain(block=False)
+        while pending:
+            drain(block=True)
+
+def main():
+    # Set up argument parsing
+    parser = argparse.ArgumentParser(description='Decode Base64 encoded data from a JSON file')
+    parser.add_argument('--write-all', action='store_true', help='Write all files regardless of existence')
+    parser.add_argument('--write-new', action='store_true', help='Write only new files that do not already exist')
+    parser.add_argument('--input', nargs='+', default=[DEFAULT_INPUT_FILE], help='Export file(s) to decode')
+    parser.add_argument('--stream', action='store_true', help='Parse the export incrementally with bounded memory')
+    parser.add_argument('--jobs', type=int, default=1, help='Decode and write with N worker processes (implies incremental parsing)')
+    args = parser.parse_args()
+
+    # Get the current date and time
+    current_time = datetime.now()
+    log_directory = 'logs'
+    log_filename = f'decoding_logs_{current_time.strftime("%Y_%m_%d_%H_%M_%S")}.log'
+    log_file_path = os.path.join(log_directory, log_filename)
+
+    # Ensure 'logs' directory exists or create it
+    if not os.path.exists(log_directory):
+        os.makedirs(log_directory)
+
+    # Configure logging to save to the dynamically named log file
+    logging.basicConfig(level=logging.INFO, filename=log_file_path,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Create the directory if it doesn't exist
+    os.makedirs(output_directory, exist_ok=True)
+
+    if args.jobs > 1:
+        decode_exports_parallel(args.input, args)
+    else:
+        for input_file in args.input:
+            if args.stream:
+                decode_export_streaming(input_file, args)
+            else:
+                decode_export(input_file, args)
 
-# Logging completed
-logging.info('Decoding completed!')
+    # Logging completed
+    logging.info('Decoding completed!')
 
+if __name__ == "__main__":
+    main()
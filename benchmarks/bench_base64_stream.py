@@ -0,0 +1,101 @@
+"""Peak RSS and throughput of base64_decoder.py on a synthetic export.
+
+Generates an exported_dataset-style JSON array of the requested size (written
+incrementally, so generating it does not need the memory either), then runs the
+decoder in a child process and reports its peak RSS and MB/s.
+
+    python benchmarks/bench_base64_stream.py --size-mb 4096
+    python benchmarks/bench_base64_stream.py --size-mb 512 --modes stream legacy
+    python benchmarks/bench_base64_stream.py --size-mb 2048 --modes stream --jobs 2 4 8
+"""
+import argparse
+import base64
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DECODER = os.path.join(REPO_ROOT, "base64_decoder.py")
+
+MAGIC_NUMBERS = [b"%PDF-1.7\n", b"\xFF\xD8\xFF\xE0", b"PK\x03\x04", b"\x89PNG\r\n\x1a\n", b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"]
+
+
+def generate_export(path, size_mb, min_item_kb, max_item_kb, seed=1189933):
+    """Write a JSON array of {"id", "api_request"} items totalling roughly size_mb."""
+    rng = random.Random(seed)
+    # Reuse a pool of random blocks so generation is not dominated by os.urandom
+    blocks = [os.urandom(64 * 1024) for _ in range(16)]
+    target = size_mb * 1024 * 1024
+    written = 0
+    count = 0
+    with open(path, "w", encoding="ascii") as export:
+        export.write("[\n")
+        while written < target:
+            item_size = rng.randint(min_item_kb, max_item_kb) * 1024
+            payload = bytearray(rng.choice(MAGIC_NUMBERS))
+            while len(payload) < item_size:
+                payload += rng.choice(blocks)
+            encoded = base64.b64encode(bytes(payload[:item_size])).decode("ascii")
+            if count:
+                export.write(",\n")
+            export.write(f'  {{"id": "{1189933 + count}", "api_request": "{encoded}"}}')
+            written += len(encoded)
+            count += 1
+        export.write("\n]\n")
+    return count
+
+
+def run_decoder(export_path, mode):
+    workdir = tempfile.mkdtemp(prefix=f"bench_decode_{mode}_")
+    command = [sys.executable, DECODER, "--write-all", "--input", export_path]
+    if mode == "stream":
+        command.append("--stream")
+    elif mode.startswith("jobs="):
+        command += ["--jobs", mode.split("=", 1)[1]]
+    start = time.perf_counter()
+    subprocess.run(command, cwd=workdir, check=True)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss of the children is the largest child seen so far, hence one child per mode run
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    files = len(os.listdir(os.path.join(workdir, "output_files")))
+    return elapsed, peak_rss_mb, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=2048, help="Approximate export size in MB")
+    parser.add_argument("--min-item-kb", type=int, default=50)
+    parser.add_argument("--max-item-kb", type=int, default=4096)
+    parser.add_argument("--modes", nargs="+", default=["stream"],
+                        help="stream, legacy (json.load of the whole export, may exhaust memory) or jobs=N")
+    parser.add_argument("--jobs", type=int, nargs="*", default=[], help="Also run --jobs N for each value")
+    parser.add_argument("--export", help="Reuse an existing export instead of generating one")
+    parser.add_argument("--no-header", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    export_path = args.export
+    if not export_path:
+        export_path = os.path.join(tempfile.mkdtemp(prefix="bench_export_"), "exported_dataset_synthetic.json")
+        start = time.perf_counter()
+        count = generate_export(export_path, args.size_mb, args.min_item_kb, args.max_item_kb)
+        print(f"Generated {count} items in {time.perf_counter() - start:.1f}s: {export_path}")
+    export_mb = os.path.getsize(export_path) / (1024 * 1024)
+
+    if not args.no_header:
+        print(f"{'mode':<8} {'export MB':>10} {'seconds':>9} {'MB/s':>8} {'peak RSS MB':>12} {'files':>7}")
+    modes = args.modes + [f"jobs={jobs}" for jobs in args.jobs]
+    for mode in modes:
+        # Run each mode in a fresh interpreter so RUSAGE_CHILDREN reflects only that mode
+        if len(modes) > 1:
+            subprocess.run([sys.executable, __file__, "--export", export_path, "--modes", mode, "--no-header"], check=True)
+            continue
+        elapsed, peak_rss_mb, files = run_decoder(export_path, mode)
+        print(f"{mode:<8} {export_mb:>10.1f} {elapsed:>9.2f} {export_mb / elapsed:>8.1f} {peak_rss_mb:>12.1f} {files:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Batch mode (main.py --batch) against the local mock Batch API, with an interrupted first run.
+
+The first run is stopped right after the Batch API accepted its first batch, before the batch id
+was recorded locally (the worst place for a crash). The second run must pick up that batch by its
+metadata instead of creating it again, submit the rest, and write every output exactly once.
+
+    python benchmarks/bench_batch.py --files 2000 --shard-requests 500 --line-error-rate 0.02
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import Args, write_docx  # noqa: E402
+from mock_batch_server import start_mock_batch_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.batch_runner import BatchRunner, BatchAPI  # noqa: E402
+from utils.functions import OpenAIClient, FileProcessor  # noqa: E402
+
+
+class InterruptingAPI(BatchAPI):
+    """Raises KeyboardInterrupt once, after the server created a batch but before the caller saw its id."""
+
+    interrupted = False
+
+    def create(self, input_file_id, endpoint, metadata=None):
+        batch = super().create(input_file_id, endpoint, metadata)
+        if not InterruptingAPI.interrupted:
+            InterruptingAPI.interrupted = True
+            raise KeyboardInterrupt
+        return batch
+
+
+def make_runner(base_url, input_dir, output_dir, work_dir, args, api_class):
+    client = OpenAIClient("bench-key", "bench-key", provider_urls={"openai": base_url + "/chat/completions"},
+                          providers={"openai": {"api_key": "bench-key"}})
+    processor = FileProcessor(input_dir, output_dir, client, Args(8), system_prompt, user_prompt, json_template)
+    runner = BatchRunner(client, processor, "openai", os.path.join(work_dir, "state.sqlite3"), work_dir,
+                         poll_interval=args.poll_interval, max_requests=args.shard_requests,
+                         api=api_class(base_url, "bench-key"))
+    return runner, client, processor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--shard-requests", type=int, default=500, help="Requests per batch input file")
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="Seconds the mock takes per batch")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--line-error-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    server, base_url = start_mock_batch_server(batch_delay=args.batch_delay, line_error_rate=args.line_error_rate,
+                                               seed=args.seed)
+    input_dir = tempfile.mkdtemp(prefix="bench_in_")
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    work_dir = tempfile.mkdtemp(prefix="bench_batch_")
+    files = []
+    for i in range(args.files):
+        name = f"resume_{i:05d}.docx"
+        write_docx(os.path.join(input_dir, name), f"Candidate {i} - Python developer with {i % 12} years of experience")
+        files.append(name)
+
+    try:
+        start = time.perf_counter()
+        runner, client, processor = make_runner(base_url, input_dir, output_dir, work_dir, args, InterruptingAPI)
+        try:
+            runner.run(files)
+        except KeyboardInterrupt:
+            print(f"run 1 interrupted after {time.perf_counter() - start:.2f}s: "
+                  f"{server.state.batches_created} batch created, {len(os.listdir(output_dir))} outputs written")
+        finally:
+            runner.close()
+            processor.close()
+            client.close()
+
+        # Like main.py, the second run is given only the files without an output yet
+        remaining = [f for f in files if not os.path.exists(os.path.join(output_dir, f.replace(".docx", ".json")))]
+        runner, client, processor = make_runner(base_url, input_dir, output_dir, work_dir, args, BatchAPI)
+        try:
+            runner.run(remaining)
+            counters = runner.counters
+        finally:
+            runner.close()
+            processor.close()
+            client.close()
+        elapsed = time.perf_counter() - start
+
+        written = len(os.listdir(output_dir))
+        expected_batches = -(-args.files // args.shard_requests)
+        print(f"run 2: {counters}")
+        print(f"{written}/{args.files} outputs written in {elapsed:.2f}s (both runs)")
+        print(f"batches created: {server.state.batches_created} "
+              f"({expected_batches} shards + retries of failed requests; duplicates would add more)")
+        print(f"HTTP requests to the provider: {server.state.requests} "
+              f"(synchronous mode: {args.files} plus retries)")
+    finally:
+        server.shutdown()
+        for directory in (input_dir, output_dir, work_dir):
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Throughput of FileProcessor with --workers against the local mock LLM server.
+
+    python benchmarks/bench_concurrent_dispatch.py --files 64 --latency 0.5 --workers 1 2 4 8 16
+    python benchmarks/bench_concurrent_dispatch.py --rpm 600   # show the plateau at the provider quota
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_llm_server import start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient, FileProcessor  # noqa: E402
+
+DOCUMENT_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:body><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>'
+)
+
+
+def write_docx(path, text):
+    with zipfile.ZipFile(path, "w") as docx:
+        docx.writestr("[Content_Types].xml", '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+        docx.writestr("word/document.xml", DOCUMENT_XML.format(text=text))
+
+
+class Args:
+    write_all = True
+    write_new = False
+
+    def __init__(self, workers):
+        self.workers = workers
+
+
+def run(url, rpm_limit, files, input_dir, workers):
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={"cerebras": rpm_limit}, provider_urls={"cerebras": url})
+    processor = FileProcessor(input_dir, output_dir, client, Args(workers), system_prompt, user_prompt, json_template)
+    start = time.perf_counter()
+    processor.process_docx_files(files)
+    elapsed = time.perf_counter() - start
+    written = len(os.listdir(output_dir))
+    return elapsed, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock completion latency in seconds")
+    parser.add_argument("--rpm", type=int, default=None, help="Mock provider quota (requests/minute)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    server, url = start_mock_server(latency=args.latency, rpm=args.rpm)
+    # The client limiter is configured at the provider quota, as in config.PROVIDER_RATE_LIMITS
+    rpm_limit = args.rpm or 100000
+
+    input_dir = tempfile.mkdtemp(prefix="bench_in_")
+    files = []
+    for i in range(args.files):
+        name = f"resume_{i:05d}.docx"
+        write_docx(os.path.join(input_dir, name), f"Candidate {i} - Python developer with {i % 12} years of experience")
+        files.append(name)
+
+    print(f"{'workers':>8} {'seconds':>9} {'files/s':>9} {'speedup':>8} {'written':>8}")
+    baseline = None
+    for workers in args.workers:
+        elapsed, written = run(url, rpm_limit, files, input_dir, workers)
+        throughput = len(files) / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:>8} {elapsed:>9.2f} {throughput:>9.2f} {throughput / baseline:>7.2f}x {written:>8}")
+
+    print(f"mock server: {server.state.requests} requests, {server.state.rate_limited} answered 429")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
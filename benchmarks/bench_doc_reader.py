@@ -0,0 +1,101 @@
+"""Native .doc text extraction (utils/doc_reader.py) vs LibreOffice conversion + Docx2txtLoader.
+
+Reports files/second for both paths and how closely their texts agree (whitespace-normalized
+similarity). Without LibreOffice only the native reader is timed.
+
+    python benchmarks/bench_doc_reader.py --corpus samples/doc
+    python benchmarks/bench_doc_reader.py --files 40 --instances 2
+"""
+import argparse
+import difflib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_office_pool import generate_corpus  # noqa: E402
+from utils.doc_reader import extract_doc_text, DocFormatError  # noqa: E402
+from utils.office_pool import OfficeConversionPool, find_soffice  # noqa: E402
+
+
+def normalize(text):
+    return " ".join(text.split())
+
+
+def run_native(paths):
+    texts, failed = {}, 0
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            texts[path] = extract_doc_text(path).text
+        except DocFormatError:
+            failed += 1
+    return time.perf_counter() - start, texts, failed
+
+
+def run_converted(paths, soffice, instances):
+    from concurrent.futures import ThreadPoolExecutor
+    from langchain_community.document_loaders import Docx2txtLoader
+
+    pool = OfficeConversionPool(instances, soffice=soffice)
+
+    def convert_and_read(path):
+        docx_path = pool.convert(path)
+        if not docx_path:
+            return path, None
+        try:
+            return path, "".join(page.page_content for page in Docx2txtLoader(docx_path).load())
+        finally:
+            pool.release(docx_path)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=instances) as executor:
+            results = dict(executor.map(convert_and_read, paths))
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - start
+    texts = {path: text for path, text in results.items() if text is not None}
+    return elapsed, texts, len(paths) - len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of .doc files")
+    parser.add_argument("--files", type=int, default=40, help="Sample corpus size (generated with LibreOffice)")
+    parser.add_argument("--instances", type=int, default=2, help="Office instances for the conversion path")
+    parser.add_argument("--soffice", default=find_soffice())
+    args = parser.parse_args()
+
+    corpus = args.corpus
+    if not corpus:
+        if not args.soffice:
+            sys.exit("No --corpus given and LibreOffice is not available to generate one")
+        corpus = tempfile.mkdtemp(prefix="bench_doc_")
+        generate_corpus(corpus, args.files, args.soffice)
+    paths = sorted(os.path.join(corpus, f) for f in os.listdir(corpus) if f.lower().endswith(".doc"))
+    print(f"{len(paths)} .doc files from {corpus}")
+
+    print(f"{'path':<22} {'files':>6} {'failed':>7} {'seconds':>8} {'files/s':>9} {'ms/file':>8}")
+    native_elapsed, native_texts, native_failed = run_native(paths)
+    print(f"{'native':<22} {len(paths):>6} {native_failed:>7} {native_elapsed:>8.3f} "
+          f"{len(paths) / native_elapsed:>9.1f} {native_elapsed / len(paths) * 1000:>8.2f}")
+    if not args.soffice:
+        print("LibreOffice not found; conversion path skipped")
+        return
+
+    converted_elapsed, converted_texts, converted_failed = run_converted(paths, args.soffice, args.instances)
+    print(f"{f'convert x{args.instances} + docx2txt':<22} {len(paths):>6} {converted_failed:>7} {converted_elapsed:>8.3f} "
+          f"{len(paths) / converted_elapsed:>9.1f} {converted_elapsed / len(paths) * 1000:>8.2f}")
+
+    common = [path for path in paths if path in native_texts and path in converted_texts]
+    if common:
+        ratios = [difflib.SequenceMatcher(None, normalize(native_texts[p]), normalize(converted_texts[p])).ratio()
+                  for p in common]
+        print(f"Text agreement over {len(common)} files: mean {sum(ratios) / len(ratios):.3f}, min {min(ratios):.3f}")
+
+
+if __name__ == "__main__":
+    main()
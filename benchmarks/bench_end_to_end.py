@@ -0,0 +1,223 @@
+"""End-to-end throughput of main.py per file type and concurrency level, against the local mock server.
+
+A synthetic corpus (benchmarks/corpus.py) is generated once per seed and reused. Every (file type,
+--workers) cell runs main.main() in a fresh interpreter with its own input_files holding only that
+file type, so each cell pays its own imports, pool start-up and peak RSS. Provider URLs point at the
+mock server (latency distribution, error rate and token throughput as given), the extraction cache is
+off and every file is written. For each cell the runner reports files/second, the p50/p95/p99 of every
+stage from the run's stage report (utils/tracing.py) and the peak RSS of the process and its workers.
+
+Results are saved as JSON under --results-dir, named after the git commit; --compare a previous result
+to list the cells whose throughput, stage p95 or peak RSS got worse by more than --tolerance. With
+regressions the exit status is 1, so it can gate a CI job.
+
+    python benchmarks/bench_end_to_end.py --per-kind 20 --workers 1 8 --latency 0.5 --latency-sigma 0.4
+    python benchmarks/bench_end_to_end.py --compare benchmarks/results/3f2c1ab.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import EXTENSIONS, KINDS, generate_corpus  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Client-side limit per provider when the mock server has no quota (--rpm), so only the pipeline is measured
+UNLIMITED_RPM = 1000000
+
+# A stage p95 must also grow by this many seconds to count as a regression; smaller changes are timer noise
+MIN_REGRESSION_SECONDS = 0.02
+
+# main.main() in the cell's working directory, with every provider pointed at the mock server
+CHILD = """
+import json, os, resource, sys, time
+root, url, workers, rpm = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+sys.path.insert(0, root)
+import config
+for provider in config.LLM_PROVIDERS:
+    config.LLM_PROVIDERS[provider]["url"] = url
+for provider in config.PROVIDER_RATE_LIMITS:
+    config.PROVIDER_RATE_LIMITS[provider] = rpm
+import main
+sys.argv = ["main.py", "--write-all", "--no-cache", "--workers", workers]
+started = time.perf_counter()
+main.main()
+seconds = time.perf_counter() - started
+# ru_maxrss is in KiB on Linux and in bytes on macOS
+scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+# Linux carries ru_maxrss over execve, so it starts at the benchmark's own size; VmHWM is this process only
+if os.path.exists("/proc/self/status"):
+    with open("/proc/self/status") as f:
+        peak = next((int(line.split()[1]) / 1024 for line in f if line.startswith("VmHWM:")), peak)
+print(json.dumps({"seconds": seconds, "written": len(os.listdir("extracted_json")), "peak_rss_mb": peak,
+                  "children_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale}))
+"""
+
+
+def git_revision():
+    """Short commit of the tree being measured, with -dirty when tracked files are modified."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def stage_latencies(report):
+    """stage -> count, errors and p50/p95/p99 seconds, from a stage report of a single file type run."""
+    stages = {}
+    for stage, by_type in report.get("stages", {}).items():
+        # A cell holds one kind, so there is one file type; take the busiest if a stage saw several
+        entry = max(by_type.values(), key=lambda e: e["count"])
+        stages[stage] = {key: entry[key] for key in ("count", "errors", "p50_seconds", "p95_seconds", "p99_seconds")}
+    return stages
+
+
+def run_cell(url, corpus_dir, names, workers, rpm):
+    """One main.py run over names (copied into a fresh working directory) with --workers workers."""
+    work_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    try:
+        input_dir = os.path.join(work_dir, "input_files")
+        os.makedirs(input_dir)
+        for name in names:
+            shutil.copy(os.path.join(corpus_dir, name), input_dir)
+        # The vision calls go through the openai SDK, which takes its endpoint from the environment
+        env = dict(os.environ, OPENAI_BASE_URL=url.rsplit("/chat/completions", 1)[0])
+        result = subprocess.run([sys.executable, "-c", CHILD, ROOT, url, str(workers), str(rpm)], cwd=work_dir,
+                                env=env, capture_output=True, text=True)
+        lines = result.stdout.strip().splitlines()
+        if result.returncode != 0 or not lines:
+            raise RuntimeError(f"main.py failed (exit {result.returncode})\n{result.stderr[-3000:]}")
+        cell = json.loads(lines[-1])
+        report_path = os.path.join(work_dir, "logs", "stage_report.json")
+        report = {}
+        if os.path.exists(report_path):
+            with open(report_path, encoding="utf-8") as f:
+                report = json.load(f)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    cell["stages"] = stage_latencies(report)
+    return cell
+
+
+def compare(results, baseline, tolerance):
+    """Human-readable regressions of results against baseline (matching kind and workers)."""
+    for section in ("corpus", "mock"):
+        if results[section] != baseline.get(section):
+            print(f"warning: {section} settings differ from the baseline, the comparison is not like for like")
+    previous = {(run["kind"], run["workers"]): run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in results["runs"]:
+        before = previous.get((run["kind"], run["workers"]))
+        if before is None:
+            continue
+        cell = f"{run['kind']} x{run['workers']}"
+        if run["files_per_second"] < before["files_per_second"] * (1 - tolerance):
+            regressions.append(f"{cell}: {before['files_per_second']:.2f} -> {run['files_per_second']:.2f} files/s")
+        for stage, stats in run["stages"].items():
+            old = before["stages"].get(stage)
+            if old is None or stats["p95_seconds"] - old["p95_seconds"] < MIN_REGRESSION_SECONDS:
+                continue
+            if stats["p95_seconds"] > old["p95_seconds"] * (1 + tolerance):
+                regressions.append(f"{cell}: {stage} p95 {old['p95_seconds'] * 1e3:.1f} -> "
+                                   f"{stats['p95_seconds'] * 1e3:.1f} ms")
+        for key in ("peak_rss_mb", "children_peak_rss_mb"):
+            if before[key] and run[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{cell}: {key} {before[key]:.0f} -> {run[key]:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Corpus directory (default: a per-seed directory under the system temp dir)")
+    parser.add_argument("--per-kind", type=int, default=20, help="Files of every kind in the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kinds", nargs="+", default=list(KINDS), choices=KINDS)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels")
+    parser.add_argument("--latency", type=float, default=0.3, help="Median seconds before the first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal sigma of the latency (0: fixed)")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Share of requests answered with HTTP 500/503")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="Mock generation speed")
+    parser.add_argument("--rpm", type=int, default=None, help="Mock provider quota; the client limits match it")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--label", help="Name of the results file (default: the git commit)")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative change reported as a regression")
+    args = parser.parse_args()
+
+    corpus_dir = args.corpus or os.path.join(tempfile.gettempdir(), f"resume_bench_corpus_{args.seed}")
+    started = time.perf_counter()
+    corpus = generate_corpus(corpus_dir, args.per_kind, args.seed, args.kinds)
+    print(f"corpus: {len(corpus['files'])} files in {corpus_dir} ({time.perf_counter() - started:.1f} s)")
+
+    mock = {"latency": args.latency, "latency_sigma": args.latency_sigma, "error_rate": args.error_rate,
+            "tokens_per_second": args.tokens_per_second, "rpm": args.rpm, "seed": args.seed}
+    revision = git_revision()
+    results = {"label": args.label or revision or time.strftime("%Y%m%d-%H%M%S"), "revision": revision,
+               "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+               "platform": platform.platform(), "cpus": os.cpu_count(), "corpus": corpus["settings"], "mock": mock,
+               "runs": []}
+    print(f"{'kind':<12} {'workers':>7} {'files/s':>8} {'file p50':>9} {'file p95':>9} {'llm p95':>8} "
+          f"{'rss MB':>7} {'workers MB':>10} {'failed':>6}")
+    for kind in args.kinds:
+        names = [entry["name"] for entry in corpus["files"] if entry["kind"] == kind]
+        if not names:
+            continue
+        for workers in args.workers:
+            # A fresh server per cell, so every cell sees the same seeded latencies and failures
+            server, url = start_mock_server(**mock)
+            try:
+                cell = run_cell(url, corpus_dir, names, workers, args.rpm or UNLIMITED_RPM)
+            finally:
+                server.shutdown()
+                server.server_close()
+            run = {"kind": kind, "file_type": EXTENSIONS[kind], "workers": workers, "files": len(names),
+                   "written": cell["written"], "seconds": round(cell["seconds"], 3),
+                   "files_per_second": round(len(names) / cell["seconds"], 3),
+                   "peak_rss_mb": round(cell["peak_rss_mb"], 1),
+                   "children_peak_rss_mb": round(cell["children_peak_rss_mb"], 1),
+                   "llm_requests": server.state.requests, "injected_errors": server.state.errors,
+                   "stages": cell["stages"]}
+            results["runs"].append(run)
+            stages = run["stages"]
+            file_stage, llm_stage = stages.get("file", {}), stages.get("llm", {})
+            print(f"{kind:<12} {workers:>7} {run['files_per_second']:>8.2f} "
+                  f"{file_stage.get('p50_seconds', 0):>9.3f} {file_stage.get('p95_seconds', 0):>9.3f} "
+                  f"{llm_stage.get('p95_seconds', 0):>8.3f} {run['peak_rss_mb']:>7.0f} "
+                  f"{run['children_peak_rss_mb']:>10.0f} {len(names) - run['written']:>6}")
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"{results['label']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"compared with {baseline.get('label')}: " + (f"{len(regressions)} regressions" if regressions
+                                                             else f"no regression beyond {args.tolerance:.0%}"))
+        for line in regressions:
+            print(f"  {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Per-request latency with and without pooled keep-alive connections.
+
+Compares the old bare requests.post(..., verify=False) call against the
+PooledTransport used by OpenAIClient, both against the local mock server.
+With --tls a throwaway self-signed certificate is generated (needs the openssl
+CLI) so the handshake cost matches what real providers charge per connection.
+
+    python benchmarks/bench_http_pool.py --requests 200 --tls
+    python benchmarks/bench_http_pool.py --requests 400 --concurrency 8
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+from utils.http_pool import PooledTransport  # noqa: E402
+
+BODY = {"model": "llama-3.3-70b", "messages": [{"role": "user", "content": "resume text " * 200}], "stream": False}
+HEADERS = {"Content-Type": "application/json", "Authorization": "Bearer bench-key"}
+
+
+def make_self_signed_cert(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-keyout", keyfile, "-out", certfile],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return certfile, keyfile
+
+
+def measure(post, url, total, concurrency):
+    def timed(_):
+        start = time.perf_counter()
+        response = post(url, headers=HEADERS, json=BODY)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(total)))
+    wall = time.perf_counter() - start
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "req_per_s": total / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server think time per request")
+    parser.add_argument("--tls", action="store_true", help="Serve HTTPS with a self-signed certificate")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Unverified HTTPS request")
+    certfile = keyfile = None
+    if args.tls:
+        certfile, keyfile = make_self_signed_cert(tempfile.mkdtemp(prefix="bench_tls_"))
+
+    results = {}
+
+    server, url = start_mock_server(certfile=certfile, keyfile=keyfile, latency=args.latency)
+    results["bare requests.post"] = measure(lambda u, **kw: requests.post(u, verify=False, **kw), url, args.requests, args.concurrency)
+    results["bare requests.post"]["connections"] = server.state.connections
+    server.shutdown()
+
+    server, url = start_mock_server(certfile=certfile, keyfile=keyfile, latency=args.latency)
+    transport = PooledTransport("bench", pool_size=max(4, args.concurrency))
+    results["PooledTransport"] = measure(transport.post, url, args.requests, args.concurrency)
+    results["PooledTransport"]["connections"] = server.state.connections
+    transport.close()
+    server.shutdown()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {'HTTPS' if args.tls else 'HTTP'}")
+    print(f"{'transport':<22} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'req/s':>8} {'conns':>6}")
+    for name, row in results.items():
+        print(f"{name:<22} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['mean_ms']:>8.2f} {row['req_per_s']:>8.1f} {row['connections']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""LLM requests and prompt tokens for resubmitted CVs, and index lookup time at millions of entries.
+
+Extracts --originals synthetic resumes (benchmarks/corpus.py) through FileProcessor against the
+local mock server, indexing them in a fresh near-duplicate index, then submits them again as
+DOCX files in four variants, each run on its own mock server: unchanged, with a new phone number,
+with one more job line, and as many new (unrelated) resumes. For each variant it reports the LLM
+requests, prompt tokens per resume and how the index answered them. New resumes must all be
+extracted in full; a match among them is a false positive.
+
+Then it fills an index with --entries random signatures and times lookups and inserts, which must
+stay flat as the index grows.
+
+    python benchmarks/bench_near_duplicates.py --originals 200 --entries 1000000
+"""
+import argparse
+import array
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import Args  # noqa: E402
+from corpus import resume_text, write_docx  # noqa: E402
+from mock_llm_server import MOCK_RESUME_JSON, start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient, FileProcessor  # noqa: E402
+from utils.near_duplicates import NUM_PERM, NearDuplicateIndex, shingle_hashes  # noqa: E402
+
+NAMESPACE = "\0".join((system_prompt, user_prompt, str(json_template)))
+
+
+def new_phone(rng, text):
+    lines = text.splitlines()
+    city, _, email = lines[1].split(" | ")
+    lines[1] = f"{city} | +91 8{rng.randrange(10 ** 8, 10 ** 9)} | {email}"
+    return "\n".join(lines)
+
+
+def new_job(rng, text):
+    lines = text.splitlines()
+    at = lines.index("EXPERIENCE") + 1
+    lines.insert(at, "Senior Consultant, Example Labs, Pune (2024 - 2025)")
+    return "\n".join(lines)
+
+
+def run(url, index_path, texts, workers):
+    """Extract every text (written as DOCX) through FileProcessor; returns (seconds, index counters)."""
+    input_dir = tempfile.mkdtemp(prefix="bench_in_")
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    files = []
+    for i, text in enumerate(texts):
+        name = f"resume_{i:05d}.docx"
+        write_docx(os.path.join(input_dir, name), text)
+        files.append(name)
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={"cerebras": 100000}, provider_urls={"cerebras": url})
+    index = NearDuplicateIndex(index_path, NAMESPACE,
+                               lambda instruction, payload: client.fix_output(system_prompt, instruction, payload))
+    processor = FileProcessor(input_dir, output_dir, client, Args(workers), system_prompt, user_prompt, json_template,
+                              near_duplicates=index)
+    stats = None
+    start = time.perf_counter()
+    try:
+        processor.process_docx_files(files)
+        stats = index.stats()
+    finally:
+        processor.close()
+        client.close()
+        shutil.rmtree(input_dir, ignore_errors=True)
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return time.perf_counter() - start, stats
+
+
+def resubmissions(args, directory):
+    rng = random.Random(args.seed)
+    originals = [resume_text(rng, rng.randrange(2, 6)) for _ in range(args.originals)]
+    fresh = [resume_text(rng, rng.randrange(2, 6)) for _ in range(args.originals)]
+    variants = [("original", originals), ("unchanged", originals),
+                ("new phone", [new_phone(rng, text) for text in originals]),
+                ("new job line", [new_job(rng, text) for text in originals]),
+                ("new resume", fresh)]
+    index_path = os.path.join(directory, "near_duplicates.sqlite3")
+    print(f"{'submission':<13} {'seconds':>8} {'requests':>9} {'prompt tok/resume':>18} {'reused':>7} "
+          f"{'updated':>8} {'full':>5}")
+    for label, texts in variants:
+        server, url = start_mock_server(latency=args.latency, seed=args.seed)
+        try:
+            seconds, stats = run(url, index_path, texts, args.workers)
+        finally:
+            server.shutdown()
+            server.server_close()
+        full = stats["lookups"] - stats["reused"] - stats["updated"]
+        print(f"{label:<13} {seconds:>8.2f} {server.state.requests:>9} "
+              f"{server.state.prompt_tokens / len(texts):>18.1f} {stats['reused']:>7} {stats['updated']:>8} "
+              f"{full:>5}")
+        if stats["update_failed"] or stats["diff_too_large"]:
+            print(f"  {stats['update_failed']} failed updates, {stats['diff_too_large']} diffs too large")
+        if label == "new resume" and stats["matches"]:
+            print(f"  {stats['matches']} new resumes matched an earlier one (false positives)")
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def scale(args, directory):
+    """Lookup and insert times with --entries signatures in the index."""
+    index = NearDuplicateIndex(os.path.join(directory, "scale.sqlite3"), NAMESPACE)
+    rng = random.Random(args.seed)
+    result = json.dumps(MOCK_RESUME_JSON)
+    start = time.perf_counter()
+    # Filled straight through SQLite in large transactions; add() commits every entry
+    with index.lock:
+        for first in range(0, args.entries, 10000):
+            count = min(10000, args.entries - first)
+            signatures = [array.array("I", (rng.getrandbits(32) for _ in range(NUM_PERM))) for _ in range(count)]
+            index.conn.executemany("INSERT INTO entries VALUES (?, NULL, ?, x'', ?, 0)",
+                                   [(first + i + 1, s.tobytes(), result) for i, s in enumerate(signatures)])
+            index.conn.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?)",
+                                   [(key, first + i + 1) for i, s in enumerate(signatures)
+                                    for key in index._band_keys(s)])
+        index.conn.commit()
+    print(f"filled {args.entries} entries in {time.perf_counter() - start:.1f} s, "
+          f"{os.path.getsize(index.path) / 2 ** 20:.0f} MB")
+
+    texts = [resume_text(rng, rng.randrange(2, 6)) for _ in range(args.lookups)]
+    lookups, adds = [], []
+    for text in texts:
+        start = time.perf_counter()
+        lookup = index.lookup(text)
+        lookups.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.add(lookup, "bench.docx", result)
+        adds.append(time.perf_counter() - start)
+    hashing = []
+    for text in texts[:100]:
+        start = time.perf_counter()
+        index.hasher.signature(shingle_hashes(text))
+        hashing.append(time.perf_counter() - start)
+    index.close()
+    print(f"{'operation':<22} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, values in (("signature", hashing), ("lookup (incl. signature)", lookups), ("add", adds)):
+        print(f"{label:<22} {statistics.median(values) * 1e3:>8.2f} {percentile(values, 0.99) * 1e3:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--originals", type=int, default=200)
+    parser.add_argument("--entries", type=int, default=1000000, help="Index size for the lookup timings")
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    directory = tempfile.mkdtemp(prefix="bench_near_dup_")
+    try:
+        resubmissions(args, directory)
+        scale(args, directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
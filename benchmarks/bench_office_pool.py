@@ -0,0 +1,92 @@
+"""Throughput of .doc -> .docx conversion: one fresh LibreOffice per file vs utils/office_pool.py.
+
+Point --corpus at a directory of .doc resumes; without it a sample corpus is made by
+writing small DOCX files and converting them to .doc with LibreOffice itself.
+
+    python benchmarks/bench_office_pool.py --files 40 --instances 1 2 4
+    python benchmarks/bench_office_pool.py --corpus samples/doc --instances 4
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import write_docx  # noqa: E402
+from utils.office_pool import OfficeConversionPool, find_soffice, uno_available  # noqa: E402
+
+
+def generate_corpus(directory, files, soffice):
+    source = tempfile.mkdtemp(prefix="bench_docx_")
+    paths = []
+    for i in range(files):
+        path = os.path.join(source, f"resume_{i:04d}.docx")
+        write_docx(path, f"Candidate {i}. Senior Software Engineer, Example Corp, 01/2019 - Present. Python, SQL, AWS.")
+        paths.append(path)
+    subprocess.run([soffice, "--headless", "--convert-to", "doc", "--outdir", directory] + paths,
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    shutil.rmtree(source, ignore_errors=True)
+
+
+def per_file(paths, soffice):
+    """The previous behaviour: a cold `libreoffice --convert-to docx` per file, one at a time."""
+    outdir = tempfile.mkdtemp(prefix="bench_perfile_")
+    converted = 0
+    for path in paths:
+        subprocess.run([soffice, "--headless", "--convert-to", "docx", "--outdir", outdir, path],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        converted += os.path.exists(os.path.join(outdir, os.path.splitext(os.path.basename(path))[0] + ".docx"))
+    shutil.rmtree(outdir, ignore_errors=True)
+    return converted
+
+
+def pooled(paths, soffice, instances, use_uno):
+    pool = OfficeConversionPool(instances, soffice=soffice, use_uno=use_uno)
+    try:
+        with ThreadPoolExecutor(max_workers=instances) as executor:
+            results = list(executor.map(pool.convert, paths))
+        return sum(1 for result in results if result), pool.stats()
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of .doc files")
+    parser.add_argument("--files", type=int, default=40, help="Sample corpus size")
+    parser.add_argument("--instances", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--soffice", default=find_soffice())
+    parser.add_argument("--no-uno", action="store_true", help="Use per-instance CLI conversion even if python3-uno is installed")
+    parser.add_argument("--skip-per-file", action="store_true")
+    args = parser.parse_args()
+    if not args.soffice:
+        sys.exit("LibreOffice (soffice) not found on PATH")
+
+    corpus = args.corpus
+    if not corpus:
+        corpus = tempfile.mkdtemp(prefix="bench_doc_")
+        generate_corpus(corpus, args.files, args.soffice)
+    paths = sorted(os.path.join(corpus, f) for f in os.listdir(corpus) if f.lower().endswith(".doc"))
+    use_uno = uno_available() and not args.no_uno
+    print(f"{len(paths)} .doc files from {corpus}, pool mode: {'uno' if use_uno else 'cli'}")
+
+    print(f"{'mode':<14} {'converted':>9} {'seconds':>8} {'files/s':>8} {'restarts':>9}")
+    if not args.skip_per_file:
+        start = time.perf_counter()
+        converted = per_file(paths, args.soffice)
+        elapsed = time.perf_counter() - start
+        print(f"{'per-file':<14} {converted:>9} {elapsed:>8.2f} {converted / elapsed:>8.2f} {'-':>9}")
+    for instances in args.instances:
+        start = time.perf_counter()
+        converted, stats = pooled(paths, args.soffice, instances, use_uno)
+        elapsed = time.perf_counter() - start
+        print(f"{f'pool x{instances}':<14} {converted:>9} {elapsed:>8.2f} {converted / elapsed:>8.2f} {stats['restarts']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Requests and prompt tokens per resume with and without packing short resumes (main.py --pack).
+
+Generates short one-paragraph resumes plus a few long ones, and runs them through FileProcessor
+against the local mock server, once unpacked and once packed. --drop-rate leaves that share of
+resumes out of packed answers, to exercise the single-file fallback. Prompt tokens are counted
+by the mock server from what it actually received.
+
+    python benchmarks/bench_packing.py --files 200 --long-share 0.1 --drop-rate 0.02
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import Args, write_docx  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient, FileProcessor  # noqa: E402
+from utils.packing import ResumePacker  # noqa: E402
+
+SKILLS = ["Python", "SQL", "AWS", "Java", "React", "Docker", "Kubernetes", "Excel", "Tally", "SAP", "Selenium"]
+
+
+def resume_text(rng, i, long):
+    lines = [f"Candidate {i}, Pune. Phone +91 90000{i:05d}. candidate{i}@example.com.",
+             f"Skills: {', '.join(rng.sample(SKILLS, 4))}."]
+    for job in range(12 if long else 2):
+        lines.append(f"Engineer at Company {job} from 0{job % 9 + 1}/20{10 + job} to 0{job % 9 + 1}/20{11 + job}. "
+                     + "Built and maintained internal services, reviewed code and mentored new joiners. " * (6 if long else 1))
+    return " ".join(lines)
+
+
+def run(url, input_dir, files, args, packed):
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={"cerebras": 100000}, provider_urls={"cerebras": url})
+    processor = FileProcessor(input_dir, output_dir, client, Args(args.workers), system_prompt, user_prompt, json_template)
+    packer = ResumePacker(processor, token_budget=args.budget, enabled=packed)
+    processor.resume_packer = packer
+    start = time.perf_counter()
+    try:
+        processor.process_all_files([], files, [], [])
+    finally:
+        processor.close()
+        client.close()
+    elapsed = time.perf_counter() - start
+    written = len(os.listdir(output_dir))
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return elapsed, written, packer.stats() if packed else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--long-share", type=float, default=0.1, help="Share of resumes too long to pack")
+    parser.add_argument("--budget", type=int, default=6000, help="Resume tokens per packed request")
+    parser.add_argument("--drop-rate", type=float, default=0.02, help="Share of resumes missing from packed answers")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    rng = random.Random(args.seed)
+    input_dir = tempfile.mkdtemp(prefix="bench_in_")
+    files = []
+    for i in range(args.files):
+        name = f"resume_{i:05d}.docx"
+        write_docx(os.path.join(input_dir, name), resume_text(rng, i, rng.random() < args.long_share))
+        files.append(name)
+
+    print(f"{'mode':<9} {'seconds':>8} {'written':>8} {'requests':>9} {'req/resume':>11} {'prompt tok/resume':>18}")
+    try:
+        for packed in (False, True):
+            server, url = start_mock_server(latency=args.latency, pack_drop_rate=args.drop_rate, seed=args.seed)
+            elapsed, written, stats = run(url, input_dir, files, args, packed)
+            state = server.state
+            print(f"{'packed' if packed else 'single':<9} {elapsed:>8.2f} {written:>8} {state.requests:>9} "
+                  f"{state.requests / args.files:>11.3f} {state.prompt_tokens / args.files:>18.1f}")
+            if stats:
+                print(f"  packer: {stats}")
+            server.shutdown()
+    finally:
+        shutil.rmtree(input_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
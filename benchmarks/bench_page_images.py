@@ -0,0 +1,113 @@
+"""Peak RSS and vision payload size of the scanned-document fallback, before and after.
+
+"stitched" is the old path (FileProcessor.extract_and_combine_images[_from_docx]: every
+embedded image pasted onto one canvas, saved and base64-encoded whole); "pages" is
+utils/page_images.py (one page at a time, at the vision model's resolution). Each mode
+runs in its own interpreter so its peak RSS is measured in isolation.
+
+    python benchmarks/bench_page_images.py --pages 10 --dpi 300
+"""
+import argparse
+import io
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+LINE = "Senior Software Engineer, Example Corp, Pune 01/2019 - Present. Python, SQL, AWS, Docker."
+
+
+def scanned_page(dpi, seed):
+    """An A4 page image at the given DPI with a few lines of dark text, like a flatbed scan."""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    page = Image.new("RGB", (width, height), (246, 244, 238))
+    draw = ImageDraw.Draw(page)
+    for i in range(60):
+        draw.text((dpi // 2, dpi // 2 + i * height // 64), f"{seed}.{i} {LINE}", fill=(20, 20, 20))
+    buffer = io.BytesIO()
+    page.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue(), width, height
+
+
+def generate(directory, pages, dpi):
+    import fitz  # PyMuPDF
+    pdf = fitz.open()
+    media = []
+    for number in range(pages):
+        jpeg, width, height = scanned_page(dpi, number)
+        media.append(jpeg)
+        page = pdf.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=jpeg)
+    pdf_path = os.path.join(directory, "scanned.pdf")
+    pdf.save(pdf_path)
+    pdf.close()
+
+    docx_path = os.path.join(directory, "image_only.docx")
+    with zipfile.ZipFile(docx_path, "w") as docx:
+        docx.writestr("word/document.xml", "<w:document/>")
+        for number, jpeg in enumerate(media):
+            docx.writestr(f"word/media/image{number + 1}.jpeg", jpeg)
+    return pdf_path, docx_path
+
+
+class Args:
+    write_all = True
+    write_new = False
+    workers = 1
+
+
+def run_mode(mode, path):
+    """Returns (payload bytes, images) for one document; runs in a child interpreter."""
+    from utils.page_images import pdf_page_images, docx_images
+    if mode == "pages":
+        images = pdf_page_images(path) if path.endswith(".pdf") else docx_images(path)
+        return sum(len(image) for image in images), len(images)
+
+    from utils.functions import FileProcessor
+    # Work on a private copy: the old path leaves its combined .jpg next to the input and reuses it
+    workdir = tempfile.mkdtemp(prefix="bench_stitched_")
+    path = shutil.copy(path, workdir)
+    processor = FileProcessor(workdir, workdir, None, Args(), "", "", "")
+    if path.endswith(".pdf"):
+        combined = processor.extract_and_combine_images(path)
+    else:
+        combined = processor.extract_and_combine_images_from_docx(path)
+    payload = processor.encode_image_to_base64(combined)
+    return len(payload), 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        start = time.perf_counter()
+        payload, images = run_mode(*args.run)
+        elapsed = time.perf_counter() - start
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{os.path.basename(args.run[1]):<16} {args.run[0]:<9} {images:>6} {payload / 1024 / 1024:>11.2f} "
+              f"{peak_rss_mb:>12.1f} {elapsed:>8.2f}")
+        return
+
+    directory = tempfile.mkdtemp(prefix="bench_pages_")
+    documents = generate(directory, args.pages, args.dpi)
+    print(f"{args.pages} pages at {args.dpi} DPI in {directory}")
+    print(f"{'document':<16} {'mode':<9} {'images':>6} {'payload MB':>11} {'peak RSS MB':>12} {'seconds':>8}")
+    for path in documents:
+        for mode in ("stitched", "pages"):
+            subprocess.run([sys.executable, __file__, "--run", mode, path], check=True)
+
+
+if __name__ == "__main__":
+    main()
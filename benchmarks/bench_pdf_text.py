@@ -0,0 +1,83 @@
+"""Pages/second of each PDF text backend in utils/pdf_text.py.
+
+Point --corpus at a directory of real resume PDFs; without it a synthetic corpus
+of text PDFs is generated with PyMuPDF.
+
+    python benchmarks/bench_pdf_text.py --corpus input_files
+    python benchmarks/bench_pdf_text.py --files 50 --pages 3 --workers 1 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import pdf_text  # noqa: E402
+
+LINES = [
+    "Senior Software Engineer - Example Corp, Pune (01/2019 - Present)",
+    "Built document processing pipelines in Python; led a team of five engineers.",
+    "B.E. Computer Engineering, University of Pune, 2014, 72%",
+    "Skills: Python, SQL, AWS, Docker, Kubernetes, React",
+]
+
+
+def generate_corpus(directory, files, pages):
+    import fitz  # PyMuPDF
+    for i in range(files):
+        pdf = fitz.open()
+        for page_number in range(pages):
+            page = pdf.new_page()
+            y = 72
+            for line_number in range(40):
+                page.insert_text((72, y), f"{LINES[(i + line_number) % len(LINES)]} [{page_number}.{line_number}]", fontsize=9)
+                y += 17
+        pdf.save(os.path.join(directory, f"resume_{i:04d}.pdf"))
+        pdf.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of PDFs to benchmark")
+    parser.add_argument("--files", type=int, default=40, help="Synthetic corpus size")
+    parser.add_argument("--pages", type=int, default=2, help="Pages per synthetic PDF")
+    parser.add_argument("--backends", nargs="+", default=list(pdf_text.BACKENDS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="Page worker processes (pymupdf only)")
+    args = parser.parse_args()
+
+    corpus = args.corpus
+    if not corpus:
+        corpus = tempfile.mkdtemp(prefix="bench_pdf_")
+        generate_corpus(corpus, args.files, args.pages)
+    paths = sorted(os.path.join(corpus, f) for f in os.listdir(corpus) if f.lower().endswith(".pdf"))
+    print(f"{len(paths)} PDFs from {corpus}")
+
+    runs = []
+    for backend in args.backends:
+        for workers in (args.workers if backend == "pymupdf" else [1]):
+            runs.append((backend, workers))
+
+    print(f"{'backend':<10} {'workers':>7} {'pages':>7} {'seconds':>8} {'pages/s':>9} {'chars':>10} {'empty pages':>12} {'errors':>7}")
+    for backend, workers in runs:
+        pdf_text.shutdown()
+        pdf_text.warm_pool(workers)
+        pages = chars = empty = errors = 0
+        start = time.perf_counter()
+        for path in paths:
+            try:
+                result = pdf_text.extract_pdf_text(path, backend=backend, workers=workers)
+            except Exception:
+                errors += 1
+                continue
+            pages += result.page_count
+            chars += len(result.text)
+            empty += len(result.empty_pages)
+        elapsed = time.perf_counter() - start
+        print(f"{backend:<10} {workers:>7} {pages:>7} {elapsed:>8.2f} {pages / elapsed:>9.1f} {chars:>10} {empty:>12} {errors:>7}")
+    pdf_text.shutdown()
+
+
+if __name__ == "__main__":
+    main()
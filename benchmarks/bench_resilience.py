@@ -0,0 +1,140 @@
+"""Completion rate and tail latency of extract() under provider faults, with and without the resilient layer.
+
+Three local mock servers stand in for Cerebras (fast, with injected faults), Together and OpenAI
+(healthy, slower). Scenarios:
+
+    degraded  Cerebras answers --error-rate of requests with 500/503 and --slow-rate of them after --slow-latency
+    outage    as degraded, and Cerebras fails every request for the middle third of the run
+
+Modes: the old direct call (one provider, None on error), retries on Cerebras only, retries with
+failover and circuit breakers, and all of that plus hedging. With --stream the requests are
+streamed, so a hedge's losing request is cancelled at its next chunk. "lost" counts the losing
+requests and "wasted tok" their estimated prompt tokens plus what they generated before stopping.
+
+    python benchmarks/bench_resilience.py --requests 300 --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_llm_server import start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient  # noqa: E402
+from utils.resilience import RetryPolicy  # noqa: E402
+
+RESUME_TEXT = "Asha Rao, Pune. Senior Software Engineer at Example Corp since 01/2019. Python, SQL, AWS."
+
+MODES = {
+    "direct": None,
+    "retry": dict(provider_order=("cerebras",), hedge=False),
+    "failover": dict(provider_order=("cerebras", "together", "openai"), hedge=False),
+    "hedged": dict(provider_order=("cerebras", "together", "openai"), hedge=True),
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(mode, scenario, args):
+    servers = {
+        "cerebras": start_mock_server(latency=args.latency, jitter=args.latency / 4, error_rate=args.error_rate,
+                                      slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=args.seed),
+        "together": start_mock_server(latency=args.latency * 2, jitter=args.latency / 2, seed=args.seed + 1),
+        "openai": start_mock_server(latency=args.latency * 1.5, jitter=args.latency / 2, seed=args.seed + 2),
+    }
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={p: 100000 for p in servers},
+                          provider_urls={p: url for p, (_, url) in servers.items()}, streaming=args.stream,
+                          providers={p: {"api_key": "bench-key"} for p in servers})
+    options = MODES[mode]
+    if options is not None:
+        client.enable_resilience(policy=RetryPolicy(args.attempts, args.base_delay, args.max_delay),
+                                 failure_threshold=args.breaker_failures, reset_timeout=args.breaker_reset,
+                                 hedge_initial_delay=args.hedge_initial_delay, max_workers=args.workers * 2, **options)
+
+    cerebras_state = servers["cerebras"][0].state
+    done = [0]
+    lock = threading.Lock()
+
+    def one(_):
+        with lock:
+            done[0] += 1
+            if scenario == "outage":
+                # Middle third of the run: Cerebras is down
+                cerebras_state.down = args.requests / 3 <= done[0] < 2 * args.requests / 3
+        start = time.perf_counter()
+        try:
+            content = client.extract(system_prompt, user_prompt, json_template, RESUME_TEXT)
+        except Exception:
+            content = None
+        elapsed = time.perf_counter() - start
+        try:
+            valid = content is not None and isinstance(json.loads(content), dict)
+        except ValueError:
+            valid = False
+        return elapsed, valid
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(one, range(args.requests)))
+        stats = client.resilience.stats() if client.resilience is not None else {}
+    finally:
+        client.close()
+        for server, _ in servers.values():
+            server.shutdown()
+    latencies = [r[0] for r in results]
+    return {
+        "completed": sum(1 for r in results if r[1]),
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "sent": {p: server.state.requests for p, (server, _) in servers.items()},
+        "hedged": stats.get("hedged", 0),
+        "hedge_wins": stats.get("hedge_wins", 0),
+        "hedge_losers": stats.get("hedge_losers", 0),
+        "hedge_wasted_tokens": stats.get("hedge_wasted_tokens", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="Cerebras mock latency; Together 2x, OpenAI 1.5x")
+    parser.add_argument("--error-rate", type=float, default=0.15)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=8.0)
+    parser.add_argument("--attempts", type=int, default=4)
+    parser.add_argument("--base-delay", type=float, default=0.2)
+    parser.add_argument("--max-delay", type=float, default=2.0)
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-reset", type=float, default=2.0)
+    parser.add_argument("--hedge-initial-delay", type=float, default=1.0)
+    parser.add_argument("--scenarios", nargs="+", default=["degraded", "outage"])
+    parser.add_argument("--modes", nargs="+", default=list(MODES))
+    parser.add_argument("--stream", action="store_true", help="Stream completions (losing hedges are cancelled)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"{'scenario':<10} {'mode':<10} {'done':>9} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'hedged':>7} "
+          f"{'won':>4} {'lost':>5} {'wasted tok':>10}  requests sent (cerebras/together/openai)")
+    for scenario in args.scenarios:
+        for mode in args.modes:
+            r = run(mode, scenario, args)
+            sent = "/".join(str(r["sent"][p]) for p in ("cerebras", "together", "openai"))
+            print(f"{scenario:<10} {mode:<10} {r['completed']:>4}/{args.requests:<4} {r['p50']:>6.2f} {r['p95']:>6.2f} "
+                  f"{r['p99']:>6.2f} {r['hedged']:>7} {r['hedge_wins']:>4} {r['hedge_losers']:>5} "
+                  f"{r['hedge_wasted_tokens']:>10}  {sent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Throughput and traffic split of the adaptive provider router vs the static provider order.
+
+Three mock providers: Cerebras (fast), Together and OpenAI (slower). For the middle third of the
+run Cerebras slows down --slowdown times, as during a provider-side incident; the router should
+move traffic away and back. Both modes use the resilient layer without hedging.
+
+    python benchmarks/bench_router.py --requests 600 --workers 12
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_llm_server import start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient  # noqa: E402
+from utils.router import AdaptiveRouter  # noqa: E402
+
+RESUME_TEXT = "Asha Rao, Pune. Senior Software Engineer at Example Corp since 01/2019. Python, SQL, AWS."
+PROVIDERS = ("cerebras", "together", "openai")
+PHASES = ("before", "incident", "after")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(routed, args):
+    latencies = {"cerebras": args.latency, "together": args.latency * 2, "openai": args.latency * 3}
+    servers = {p: start_mock_server(latency=latency, jitter=latency / 5, seed=args.seed + i)
+               for i, (p, latency) in enumerate(latencies.items())}
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={p: 100000 for p in PROVIDERS},
+                          provider_urls={p: url for p, (_, url) in servers.items()},
+                          providers={p: {"max_concurrency": args.cap, "api_key": "bench-key"} for p in PROVIDERS})
+    router = None
+    if routed:
+        router = AdaptiveRouter([client.providers[p] for p in PROVIDERS], stats_interval=3600, rng=random.Random(args.seed))
+    client.enable_resilience(PROVIDERS, router=router, hedge=False)
+
+    cerebras = servers["cerebras"][0].state
+    counter = [0]
+    lock = threading.Lock()
+    # Server request counters when each phase started
+    marks = {}
+
+    def one(_):
+        with lock:
+            index = counter[0]
+            counter[0] += 1
+            phase = PHASES[min(2, index * 3 // args.requests)]
+            if phase not in marks:
+                marks[phase] = {p: servers[p][0].state.requests for p in PROVIDERS}
+            cerebras.latency = args.latency * (args.slowdown if phase == "incident" else 1)
+        start = time.perf_counter()
+        client.extract(system_prompt, user_prompt, json_template, RESUME_TEXT)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(one, range(args.requests)))
+        wall = time.perf_counter() - start
+        snapshot = router.snapshot() if router is not None else None
+        marks["end"] = {p: servers[p][0].state.requests for p in PROVIDERS}
+        bounds = PHASES + ("end",)
+        split = {phase: {p: marks[bounds[i + 1]][p] - marks[phase][p] for p in PROVIDERS}
+                 for i, phase in enumerate(PHASES)}
+    finally:
+        client.close()
+        for server, _ in servers.values():
+            server.shutdown()
+    return wall, percentile(results, 0.95), split, snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.1, help="Cerebras latency; Together 2x, OpenAI 3x")
+    parser.add_argument("--slowdown", type=float, default=10.0)
+    parser.add_argument("--cap", type=int, default=8, help="max_concurrency per provider")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for routed in (False, True):
+        wall, p95, split, snapshot = run(routed, args)
+        print(f"{'router' if routed else 'static order'}: {args.requests / wall:.1f} req/s, p95 {p95:.2f}s")
+        for phase in PHASES:
+            total = sum(split[phase].values()) or 1
+            print(f"  {phase:<9} " + "  ".join(f"{p} {split[phase][p] / total:>4.0%}" for p in PROVIDERS))
+        if snapshot:
+            print("  final: " + "; ".join(f"{p} share {s['share']:.0%}, {s['tokens_per_sec']} tok/s, "
+                                          f"latency {s['latency_s']}s" for p, s in snapshot.items()))
+
+
+if __name__ == "__main__":
+    main()
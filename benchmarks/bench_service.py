@@ -0,0 +1,123 @@
+"""Latency of the extraction service (main.py --serve) under more load than it can take.
+
+Starts the mock LLM server and the service in this process, then sends DOCX uploads at a fixed
+rate above what the workers can sustain, once with the bounded queue (excess uploads answered
+429 at once) and once with a queue large enough to accept everything. With the bounded queue
+the p99 of accepted uploads stays near the handling time; unbounded, it grows with the backlog.
+
+    python benchmarks/bench_service.py --workers 4 --latency 0.2 --rate 40 --seconds 10
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import Args, write_docx  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+from utils.extraction_service import ExtractionService  # noqa: E402
+
+
+class WorkerFactory:
+    """What main.py's build_service_worker builds, pointed at the mock server (picklable for the workers)."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def __call__(self):
+        from config import system_prompt, user_prompt, json_template
+        from utils.functions import OpenAIClient, FileProcessor
+        client = OpenAIClient("bench-key", "bench-key", rate_limits={"cerebras": 100000},
+                              provider_urls={"cerebras": self.url})
+        return FileProcessor(None, None, client, Args(1), system_prompt, user_prompt, json_template)
+
+
+def upload(service_url, upload_id, payload):
+    body = json.dumps({"id": upload_id, "api_request": payload}).encode("utf-8")
+    request = urllib.request.Request(service_url + "/extract", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    return status, time.perf_counter() - start
+
+
+def run(url, args, queue_size, payloads):
+    service = ExtractionService(WorkerFactory(url), workers=args.workers, queue_size=queue_size)
+    thread = threading.Thread(target=service.serve, args=("127.0.0.1", 0), daemon=True)
+    thread.start()
+    while service.httpd is None:
+        time.sleep(0.05)
+    service_url = f"http://127.0.0.1:{service.httpd.server_address[1]}"
+
+    results = []
+    total = int(args.rate * args.seconds)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(total, 512)) as clients:
+        futures = []
+        for i in range(total):
+            # Open loop: uploads arrive on schedule whether or not earlier ones were answered
+            delay = start + i / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(clients.submit(upload, service_url, str(i), payloads[i % len(payloads)]))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    health = service.health()
+    service.close()
+    return results, elapsed, health
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=8, help="Bounded run: uploads queued beyond the workers")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per mock completion")
+    parser.add_argument("--rate", type=float, default=40, help="Uploads per second offered")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    payloads = []
+    for i in range(16):
+        buffer = io.BytesIO()
+        write_docx(buffer, f"Candidate {i} - Python developer with {i % 12} years of experience in Pune")
+        payloads.append(base64.b64encode(buffer.getvalue()).decode("ascii"))
+
+    server, url = start_mock_server(latency=args.latency)
+    total = int(args.rate * args.seconds)
+    print(f"{args.workers} workers, {args.rate:g} uploads/s offered for {args.seconds:g}s "
+          f"(about {args.workers / args.latency:.0f}/s can be served)")
+    print(f"{'queue':<10} {'ok':>5} {'429':>5} {'other':>6} {'ok/s':>7} {'p50 s':>7} {'p99 s':>7} {'max s':>7}")
+    try:
+        for label, queue_size in (("bounded", args.queue_size), ("unbounded", total)):
+            results, elapsed, health = run(url, args, queue_size, payloads)
+            ok = sorted(seconds for status, seconds in results if status == 200)
+            rejected = sum(1 for status, _ in results if status == 429)
+            print(f"{label:<10} {len(ok):>5} {rejected:>5} {len(results) - len(ok) - rejected:>6} "
+                  f"{len(ok) / elapsed:>7.1f} {statistics.median(ok) if ok else float('nan'):>7.3f} "
+                  f"{percentile(ok, 0.99):>7.3f} {ok[-1] if ok else float('nan'):>7.3f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
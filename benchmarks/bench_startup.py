@@ -0,0 +1,167 @@
+"""Cold-start time of a single-file run (main.py --process <file>) per file type, against a budget.
+
+Each measurement is a fresh interpreter that imports utils.functions, builds the client and
+FileProcessor the way main.py does and processes one file against the local mock server, so it
+includes interpreter start, imports, setup and the handler itself. Run with -X importtime, the
+slowest imports of the first run per type are listed. Exits non-zero if a median exceeds its
+budget, so it can gate a CI job.
+
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --types pdf docx --budget-scale 2   # slower CI machine
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import write_docx  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median seconds from process start to the output file being written, per file type
+COLD_START_BUDGETS = {"pdf": 0.6, "docx": 0.6, "doc": 0.6, "image": 1.2}
+
+RESUME = "Asha Rao, Pune. Senior Software Engineer at Example Corp since 01/2019. Python, SQL, AWS."
+
+# What main.py --process does, minus argument parsing and the manifest
+CHILD = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from utils.functions import OpenAIClient, FileProcessor
+from config import system_prompt, user_prompt, json_template
+imported = time.perf_counter()
+
+class Args:
+    write_all = True
+    write_new = False
+    workers = 1
+    pdf_workers = 4
+
+url, input_dir, output_dir, name = sys.argv[1:5]
+client = OpenAIClient("bench-key", "bench-key", provider_urls={{p: url for p in ("cerebras", "together", "openai")}})
+processor = FileProcessor(input_dir, output_dir, client, Args(), system_prompt, user_prompt, json_template)
+if name.endswith(".pdf"):
+    processor.process_pdf_files([name])
+elif name.endswith(".docx"):
+    processor.process_docx_files([name])
+elif name.endswith(".doc"):
+    processor.process_doc_files([name])
+else:
+    processor.process_image_files([name])
+processor.close()
+client.close()
+print(round(imported - started, 4), round(time.perf_counter() - started, 4))
+"""
+
+
+def generate(directory, types):
+    files = {}
+    if "pdf" in types:
+        import fitz  # PyMuPDF
+        pdf = fitz.open()
+        pdf.new_page().insert_text((72, 72), RESUME, fontsize=9)
+        pdf.save(os.path.join(directory, "resume.pdf"))
+        pdf.close()
+        files["pdf"] = "resume.pdf"
+    if "docx" in types:
+        write_docx(os.path.join(directory, "resume.docx"), RESUME)
+        files["docx"] = "resume.docx"
+    if "image" in types:
+        from PIL import Image, ImageDraw
+        image = Image.new("RGB", (1240, 1754), "white")
+        ImageDraw.Draw(image).text((60, 60), RESUME, fill="black")
+        image.save(os.path.join(directory, "resume.png"))
+        files["image"] = "resume.png"
+    if "doc" in types:
+        from utils.office_pool import find_soffice
+        soffice = find_soffice()
+        if soffice:
+            subprocess.run([soffice, "--headless", "--convert-to", "doc", "--outdir", directory,
+                            os.path.join(directory, "resume.docx")],
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            files["doc"] = "resume.doc"
+        else:
+            print("LibreOffice not found, skipping .doc")
+    return files
+
+
+def slowest_imports(stderr, count):
+    """Top-level imports under the child's own imports, by cumulative microseconds."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) <= 3:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def run_child(url, input_dir, output_dir, name, importtime):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        "-c", CHILD.format(root=ROOT), url, input_dir, output_dir, name]
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, cwd=ROOT,
+                            env=dict(os.environ, OPENAI_BASE_URL=url.rsplit("/chat/completions", 1)[0]))
+    wall = time.perf_counter() - start
+    if result.returncode != 0 or not result.stdout.strip():
+        raise RuntimeError(f"{name}: child failed\n{result.stderr[-2000:]}")
+    imports, total = map(float, result.stdout.split()[-2:])
+    return wall, imports, total, result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--types", nargs="+", default=["pdf", "docx", "image", "doc"], choices=sorted(COLD_START_BUDGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Multiply every budget (slow machines)")
+    parser.add_argument("--top", type=int, default=6, help="Slowest imports listed per type")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(latency=0.0)
+    input_dir = tempfile.mkdtemp(prefix="bench_in_")
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    results = {}
+    over = []
+    try:
+        files = generate(input_dir, args.types)
+        print(f"{'type':<6} {'wall s':>8} {'imports s':>10} {'in-process s':>13} {'budget s':>9}")
+        for kind, name in files.items():
+            _, _, _, stderr = run_child(url, input_dir, output_dir, name, importtime=True)
+            runs = [run_child(url, input_dir, output_dir, name, importtime=False) for _ in range(args.repeat)]
+            wall = statistics.median(r[0] for r in runs)
+            imports = statistics.median(r[1] for r in runs)
+            total = statistics.median(r[2] for r in runs)
+            budget = COLD_START_BUDGETS[kind] * args.budget_scale
+            if wall > budget:
+                over.append(kind)
+            print(f"{kind:<6} {wall:>8.3f} {imports:>10.3f} {total:>13.3f} {budget:>9.2f}"
+                  f"{'  OVER BUDGET' if wall > budget else ''}")
+            top = slowest_imports(stderr, args.top)
+            print("       slowest imports: " + ", ".join(f"{module} {us / 1e3:.0f}ms" for us, module in top))
+            results[kind] = {"wall_s": wall, "imports_s": imports, "in_process_s": total, "budget_s": budget,
+                             "slowest_imports_ms": {module: round(us / 1e3, 1) for us, module in top}}
+    finally:
+        server.shutdown()
+        shutil.rmtree(input_dir, ignore_errors=True)
+        shutil.rmtree(output_dir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if over:
+        print(f"over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
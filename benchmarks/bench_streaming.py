@@ -0,0 +1,86 @@
+"""Latency of extract_resume_info with and without streaming, when some answers go bad.
+
+The mock server generates at a fixed speed (--token-delay per ~4 tokens) and turns
+--bad-rate of its answers into fenced, prose-prefixed or runaway generations. Without
+streaming every bad answer costs its full generation time; with streaming the guard
+aborts it as soon as it diverges from the template.
+
+    python benchmarks/bench_streaming.py --requests 60 --bad-rate 0.2 --token-delay 0.002
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_llm_server import start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient  # noqa: E402
+
+RESUME_TEXT = "Asha Rao, Pune. Senior Software Engineer at Example Corp since 01/2019. Python, SQL, AWS."
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(streaming, args):
+    server, url = start_mock_server(latency=args.latency, token_delay=args.token_delay, bad_rate=args.bad_rate,
+                                    seed=args.seed)
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={"cerebras": 100000}, provider_urls={"cerebras": url},
+                          streaming=streaming, max_response_chars=args.max_chars)
+
+    def one(_):
+        start = time.perf_counter()
+        content = client.extract_resume_info(system_prompt, user_prompt, json_template, RESUME_TEXT)
+        elapsed = time.perf_counter() - start
+        try:
+            valid = content is not None and isinstance(json.loads(content), dict)
+        except ValueError:
+            valid = False
+        return elapsed, content is None, valid
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(one, range(args.requests)))
+    finally:
+        client.close()
+        server.shutdown()
+    latencies = [r[0] for r in results]
+    return {
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies),
+        "total": sum(latencies),
+        "aborted": sum(1 for r in results if r[1]),
+        "valid": sum(1 for r in results if r[2]),
+        "cancelled": server.state.streams_cancelled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1, help="Mock time to first token")
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--bad-rate", type=float, default=0.2)
+    parser.add_argument("--max-chars", type=int, default=32000, help="Streaming size cap")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"{'mode':<10} {'p50 s':>7} {'p95 s':>7} {'max s':>7} {'sum s':>8} {'valid':>6} {'aborted':>8} {'cancelled':>10}")
+    for streaming in (False, True):
+        r = run(streaming, args)
+        print(f"{'stream' if streaming else 'blocking':<10} {r['p50']:>7.2f} {r['p95']:>7.2f} {r['max']:>7.2f} {r['total']:>8.1f} "
+              f"{r['valid']:>6} {r['aborted']:>8} {r['cancelled']:>10}")
+
+
+if __name__ == "__main__":
+    main()
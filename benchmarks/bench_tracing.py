@@ -0,0 +1,116 @@
+"""Overhead of the per-stage spans (utils/tracing.py), and what the report looks like.
+
+First times entering and leaving a span with tracing disabled and enabled, against an empty
+with block. Then runs the same DOCX corpus through FileProcessor against the local mock server
+with tracing off and on, and prints the per-stage percentiles and the start of the Prometheus
+exposition from the traced run.
+
+    python benchmarks/bench_tracing.py --files 400 --workers 8 --latency 0
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import Args, write_docx  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient, FileProcessor  # noqa: E402
+from utils.tracing import Tracer  # noqa: E402
+
+
+def span_cost(tracer, iterations):
+    """Seconds per nested file/extract span pair."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with tracer.span("file", file="resume.docx"):
+            with tracer.span("extract", bytes=1000) as span:
+                span.set(pages=1)
+    return (time.perf_counter() - start) / iterations
+
+
+def bare_cost(iterations):
+    null = contextlib.nullcontext()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with null:
+            with null:
+                pass
+    return (time.perf_counter() - start) / iterations
+
+
+def run(url, input_dir, files, workers, tracer):
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={"cerebras": 1000000}, provider_urls={"cerebras": url},
+                          tracer=tracer)
+    processor = FileProcessor(input_dir, output_dir, client, Args(workers), system_prompt, user_prompt, json_template)
+    start = time.perf_counter()
+    try:
+        processor.process_all_files([], files, [], [])
+    finally:
+        processor.close()
+        client.close()
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per mock completion")
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=3, help="End-to-end runs per mode (best is kept)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    bare = bare_cost(args.iterations)
+    disabled = span_cost(Tracer(enabled=False), args.iterations)
+    enabled = span_cost(Tracer(enabled=True), args.iterations)
+    print(f"two nested spans: empty with blocks {bare * 1e6:.2f} us, disabled {disabled * 1e6:.2f} us, "
+          f"enabled {enabled * 1e6:.2f} us")
+
+    server, url = start_mock_server(latency=args.latency)
+    input_dir = tempfile.mkdtemp(prefix="bench_in_")
+    files = []
+    for i in range(args.files):
+        name = f"resume_{i:05d}.docx"
+        write_docx(os.path.join(input_dir, name), f"Candidate {i} - Python developer with {i % 12} years of experience")
+        files.append(name)
+    try:
+        best = {}
+        tracer = None
+        for _ in range(args.rounds):
+            for enabled_run in (False, True):
+                tracer_run = Tracer(enabled=enabled_run)
+                elapsed = run(url, input_dir, files, args.workers, tracer_run)
+                best[enabled_run] = min(best.get(enabled_run, elapsed), elapsed)
+                if enabled_run:
+                    tracer = tracer_run
+        for enabled_run in (False, True):
+            print(f"tracing {'on ' if enabled_run else 'off'}: {args.files / best[enabled_run]:8.1f} files/s")
+        report = tracer.report()
+        print(f"{'stage':<9} {'type':<5} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  counters")
+        for stage, by_type in report["stages"].items():
+            for file_type, entry in by_type.items():
+                counters = {k: v for k, v in entry.items() if not k.endswith("seconds") and k not in ("count", "errors",
+                                                                                                    "seconds_total")}
+                print(f"{stage:<9} {file_type:<5} {entry['count']:>6} {entry['p50_seconds'] * 1e3:>8.2f} "
+                      f"{entry['p95_seconds'] * 1e3:>8.2f} {entry['p99_seconds'] * 1e3:>8.2f}  {json.dumps(counters)}")
+        print("slowest file:", json.dumps(report["slowest_files"][0]))
+        print("\n".join(line for line in tracer.prometheus().splitlines() if 'stage="llm"' in line)[:1200])
+    finally:
+        server.shutdown()
+        shutil.rmtree(input_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""New-file-to-JSON latency of main.py --watch, with uploads that arrive slowly or by rename.
+
+Runs the DirectoryWatcher and FileProcessor (with a manifest) against the local mock server while
+files are dropped into the input directory at --rate per second. A third of them are written in
+two halves --gap seconds apart (a slow copy), a third are written under a temporary name and
+renamed, the rest in one go. Reports latency from the last byte written to the JSON appearing,
+and checks that no half-written file was ever extracted.
+
+    python benchmarks/bench_watch.py --files 60 --rate 10 --settle 1.0
+"""
+import argparse
+import io
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_concurrent_dispatch import Args, write_docx  # noqa: E402
+from mock_llm_server import start_mock_server  # noqa: E402
+from config import system_prompt, user_prompt, json_template  # noqa: E402
+from utils.functions import OpenAIClient, FileProcessor  # noqa: E402
+from utils.manifest import ProcessingManifest, output_name_for  # noqa: E402
+from utils.watcher import DirectoryWatcher  # noqa: E402
+
+
+def docx_bytes(text):
+    buffer = io.BytesIO()
+    write_docx(buffer, text)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=60)
+    parser.add_argument("--rate", type=float, default=10, help="Files arriving per second")
+    parser.add_argument("--settle", type=float, default=1.0, help="WATCH_SETTLE_SECONDS")
+    parser.add_argument("--gap", type=float, default=0.4, help="Pause inside slow copies (must be below --settle)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per mock completion")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cron", type=float, default=300, help="Cron interval compared against, in seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    server, url = start_mock_server(latency=args.latency)
+    input_dir = tempfile.mkdtemp(prefix="bench_in_")
+    output_dir = tempfile.mkdtemp(prefix="bench_out_")
+    state_dir = tempfile.mkdtemp(prefix="bench_state_")
+    client = OpenAIClient("bench-key", "bench-key", rate_limits={"cerebras": 100000}, provider_urls={"cerebras": url})
+    manifest = ProcessingManifest(os.path.join(state_dir, "manifest.sqlite3"))
+    processor = FileProcessor(input_dir, output_dir, client, Args(args.workers), system_prompt, user_prompt,
+                              json_template, manifest=manifest)
+    bad_reads = []
+
+    def handle(entries):
+        todo, changed = manifest.pending(input_dir, entries)
+        for entry in todo:
+            # What the pipeline is about to read must be the whole upload
+            with open(os.path.join(input_dir, entry.name), "rb") as f:
+                if f.read() != expected[entry.name]:
+                    bad_reads.append(entry.name)
+        processor.changed_inputs = set(changed)
+        processor.process_all_files([], [entry.name for entry in todo], [], [])
+
+    expected = {}
+    # Two files wait before the watcher starts, to exercise the catch-up listing
+    for i in range(2):
+        name = f"waiting_{i}.docx"
+        expected[name] = docx_bytes(f"Candidate waiting {i} - Python developer in Pune")
+        with open(os.path.join(input_dir, name), "wb") as f:
+            f.write(expected[name])
+    written_at = {}
+
+    watcher = DirectoryWatcher(input_dir, (".docx",), handle, settle=args.settle)
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    start = time.perf_counter()
+    for name in expected:
+        written_at[name] = start
+
+    def copy(i):
+        name = f"resume_{i:05d}.docx"
+        data = docx_bytes(f"Candidate {i} - Python developer with {i % 12} years of experience in Pune")
+        expected[name] = data
+        path = os.path.join(input_dir, name)
+        if i % 3 == 0:
+            with open(path, "wb") as f:
+                f.write(data[:len(data) // 2])
+            time.sleep(args.gap)
+            with open(path, "ab") as f:
+                f.write(data[len(data) // 2:])
+        elif i % 3 == 1:
+            with open(os.path.join(input_dir, f".{name}.part"), "wb") as f:
+                f.write(data)
+            os.rename(os.path.join(input_dir, f".{name}.part"), path)
+        else:
+            with open(path, "wb") as f:
+                f.write(data)
+        written_at[name] = time.perf_counter()
+
+    done_at = {}
+
+    def poll():
+        deadline = time.perf_counter() + args.files / args.rate + 60
+        while time.perf_counter() < deadline and len(done_at) < args.files + 2:
+            for name in list(written_at):
+                if name not in done_at and os.path.exists(os.path.join(output_dir, output_name_for(name))):
+                    done_at[name] = time.perf_counter()
+            time.sleep(0.01)
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    copiers = []
+    for i in range(args.files):
+        copier = threading.Thread(target=copy, args=(i,))
+        copier.start()
+        copiers.append(copier)
+        time.sleep(1 / args.rate)
+    for copier in copiers:
+        copier.join()
+
+    poller.join()
+    watcher.stop()
+    thread.join()
+    watcher.close()
+    processor.close()
+    manifest.close()
+    client.close()
+    server.shutdown()
+
+    latencies = sorted(done_at[name] - written_at[name] for name in done_at)
+    print(f"{len(done_at)}/{len(expected)} outputs written, {server.state.requests} LLM requests, "
+          f"{len(bad_reads)} half-written files extracted")
+    print(f"last byte -> JSON: p50 {statistics.median(latencies):.2f}s, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f}s, max {latencies[-1]:.2f}s "
+          f"(cron every {args.cron:g}s: {args.cron / 2:g}s on average)")
+    print(f"watcher: {watcher.counters}")
+    for directory in (input_dir, output_dir, state_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Reproducible synthetic resume corpus for the end-to-end benchmark (bench_end_to_end.py).
+
+Every kind of input main.py handles, at varied sizes: text PDFs (1-3 pages), scanned PDFs (page
+images only, 150-300 dpi), DOCX, image-only DOCX, DOC (converted from DOCX with LibreOffice, skipped
+when it is not installed) and JPG/PNG photos of a page from phone to 300 dpi scanner resolution. The
+same seed always gives the same resumes; corpus.json lists every file with its kind and size.
+
+    python benchmarks/corpus.py bench_corpus --per-kind 20 --seed 1
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KINDS = ("text_pdf", "scanned_pdf", "docx", "image_docx", "doc", "jpg", "png")
+
+# Extension of each kind, i.e. the main.py handler that processes it
+EXTENSIONS = {"text_pdf": "pdf", "scanned_pdf": "pdf", "docx": "docx", "image_docx": "docx", "doc": "doc",
+              "jpg": "jpg", "png": "png"}
+
+MANIFEST = "corpus.json"
+
+# Bumped whenever the generated documents change, so stored results are only compared on the same corpus
+CORPUS_VERSION = 1
+
+# Lines of resume text per text PDF page
+PDF_LINES_PER_PAGE = 45
+
+# Page image widths in pixels: phone photo, A4 at 150, 200 and 300 dpi
+IMAGE_WIDTHS = (900, 1240, 1654, 2480)
+
+FIRST_NAMES = ("Asha", "Rahul", "Priya", "Vikram", "Neha", "Arjun", "Meera", "Karan", "Divya", "Sanjay", "Anita", "Rohan")
+LAST_NAMES = ("Rao", "Sharma", "Iyer", "Patel", "Menon", "Gupta", "Nair", "Reddy", "Das", "Kulkarni", "Joshi", "Bose")
+CITIES = ("Pune", "Bengaluru", "Chennai", "Hyderabad", "Mumbai", "Delhi", "Kolkata", "Ahmedabad")
+EMPLOYERS = ("Example Corp", "Acme Systems", "Globex Technologies", "Initech", "Umbrella Analytics", "Stark Software",
+             "Wayne Logistics", "Hooli Labs", "Vandelay Industries", "Soylent Foods")
+TITLES = ("Software Engineer", "Senior Software Engineer", "Data Analyst", "Project Manager", "QA Engineer",
+          "DevOps Engineer", "Business Analyst", "Accountant", "Sales Executive", "HR Generalist")
+SKILLS = ("Python", "Java", "SQL", "AWS", "Docker", "Kubernetes", "Excel", "Tally", "SAP", "React", "Node.js",
+          "Power BI", "Salesforce", "Linux", "Git", "Selenium", "Spark", "Recruitment", "Negotiation", "GST filing")
+DEGREES = ("B.E. Computer Science", "B.Com", "MBA Finance", "B.Sc Physics", "M.Tech Electronics", "BBA", "MCA")
+DUTIES = (
+    "Designed and maintained services handling {n} requests per day.",
+    "Led a team of {n} engineers through quarterly releases.",
+    "Reduced monthly reporting time by {n} percent by automating reconciliations.",
+    "Migrated {n} legacy applications to the cloud without downtime.",
+    "Handled {n} enterprise accounts and grew renewals year over year.",
+    "Wrote test plans and automated {n} regression suites.",
+    "Coordinated with {n} vendors on delivery schedules and invoices.",
+)
+
+DOCUMENT_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<w:body>{body}</w:body></w:document>'
+)
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>'
+)
+
+
+def resume_text(rng, jobs):
+    """Plain-text resume with jobs work experience entries (more jobs, more pages)."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    lines = [f"{first} {last}", f"{rng.choice(CITIES)} | +91 9{rng.randrange(10 ** 8, 10 ** 9)} | "
+             f"{first.lower()}.{last.lower()}@example.com", "",
+             "SUMMARY", f"{rng.choice(TITLES)} with {jobs * 2 + rng.randrange(3)} years of experience.", "",
+             "SKILLS", ", ".join(rng.sample(SKILLS, 6)), "", "EXPERIENCE"]
+    year = 2024
+    for _ in range(jobs):
+        start = year - rng.randrange(1, 4)
+        lines.append(f"{rng.choice(TITLES)}, {rng.choice(EMPLOYERS)}, {rng.choice(CITIES)} ({start} - {year})")
+        lines += [f"- {duty.format(n=rng.randrange(3, 500))}" for duty in rng.sample(DUTIES, 4)]
+        lines.append("")
+        year = start
+    lines += ["EDUCATION", f"{rng.choice(DEGREES)}, {rng.choice(CITIES)} University, {year - 3}"]
+    return "\n".join(lines)
+
+
+def render_pages(text, width, rng):
+    """Pillow images of A4 pages (width pixels wide) holding text, with a little scanner noise."""
+    from PIL import Image, ImageDraw, ImageFont
+    height = int(width * 297 / 210)
+    font_size = max(10, width // 60)
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except TypeError:
+        # Pillow < 10.1 has a single bitmap size
+        font = ImageFont.load_default()
+    line_height = int(font_size * 1.4)
+    lines_per_page = max(1, (height - 2 * font_size * 4) // line_height)
+    lines = text.splitlines()
+    pages = []
+    for start in range(0, len(lines), lines_per_page):
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image)
+        y = font_size * 4
+        for line in lines[start:start + lines_per_page]:
+            draw.text((font_size * 4, y), line, fill="black", font=font)
+            y += line_height
+        for _ in range(width):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.point((x, y), fill=(rng.randrange(150, 230),) * 3)
+        pages.append(image)
+    return pages
+
+
+def write_text_pdf(path, text):
+    import fitz  # PyMuPDF
+    pdf = fitz.open()
+    lines = text.splitlines()
+    for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+        page_text = "\n".join(lines[start:start + PDF_LINES_PER_PAGE])
+        if pdf.new_page().insert_textbox(fitz.Rect(50, 50, 545, 792), page_text, fontsize=10) < 0:
+            raise ValueError(f"{path}: page text does not fit the page")
+    pdf.set_metadata({})
+    pdf.save(path, garbage=3, deflate=True, no_new_id=True)
+    pages = pdf.page_count
+    pdf.close()
+    return pages
+
+
+def write_scanned_pdf(path, pages):
+    import fitz  # PyMuPDF
+    pdf = fitz.open()
+    for image in pages:
+        buffer = io.BytesIO()
+        image.convert("L").save(buffer, "JPEG", quality=75)
+        page = pdf.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    pdf.set_metadata({})
+    pdf.save(path, garbage=3, deflate=True, no_new_id=True)
+    pdf.close()
+
+
+def write_docx(path, text=None, images=()):
+    """DOCX with one paragraph per line of text, or only the given PNG images (no text at all)."""
+    paragraphs = "".join(f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>'
+                         for line in (text or "").splitlines())
+    relationships = "".join(
+        f'<Relationship Id="rIdImage{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" '
+        f'Target="media/image{i}.png"/>' for i in range(1, len(images) + 1))
+    drawings = "".join(f'<w:p><w:r><w:drawing><a:blip xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+                       f'r:embed="rIdImage{i}"/></w:drawing></w:r></w:p>' for i in range(1, len(images) + 1))
+    # Fixed timestamps, so the archive bytes only depend on the content
+    def write(docx, name, data):
+        docx.writestr(zipfile.ZipInfo(name, date_time=(2024, 1, 1, 0, 0, 0)), data, zipfile.ZIP_DEFLATED)
+
+    with zipfile.ZipFile(path, "w") as docx:
+        write(docx, "[Content_Types].xml", CONTENT_TYPES_XML)
+        write(docx, "_rels/.rels", '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+              '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+              '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+              'officeDocument" Target="word/document.xml"/></Relationships>')
+        write(docx, "word/_rels/document.xml.rels", '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+              '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+              f'{relationships}</Relationships>')
+        write(docx, "word/document.xml", DOCUMENT_XML.format(body=paragraphs + drawings))
+        for i, image in enumerate(images, 1):
+            buffer = io.BytesIO()
+            image.save(buffer, "PNG", optimize=True)
+            write(docx, f"word/media/image{i}.png", buffer.getvalue())
+
+
+def convert_to_doc(docx_paths, directory):
+    """Convert DOCX files to DOC with LibreOffice (one headless run); False if it is not installed."""
+    from utils.office_pool import find_soffice
+    soffice = find_soffice()
+    if not soffice or not docx_paths:
+        return False
+    subprocess.run([soffice, "--headless", "--convert-to", "doc", "--outdir", directory, *docx_paths],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return True
+
+
+def generate_corpus(directory, per_kind=20, seed=0, kinds=KINDS):
+    """Write per_kind files of every kind to directory; returns the manifest (also saved as corpus.json).
+
+    A directory already holding the corpus for the same seed, size and kinds is reused as it is.
+    """
+    os.makedirs(directory, exist_ok=True)
+    settings = {"version": CORPUS_VERSION, "seed": seed, "per_kind": per_kind, "kinds": sorted(kinds)}
+    manifest_path = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("settings") == settings and all(
+                os.path.exists(os.path.join(directory, entry["name"])) for entry in manifest["files"]):
+            return manifest
+
+    files = []
+    doc_sources = []
+    scratch = tempfile.mkdtemp(prefix="bench_corpus_")
+    try:
+        for kind in kinds:
+            # One generator per kind, so adding a kind never changes the files of the others
+            rng = random.Random(f"{seed}:{kind}")
+            for i in range(per_kind):
+                name = f"{kind}_{i:04d}.{EXTENSIONS[kind]}"
+                path = os.path.join(directory, name)
+                text = resume_text(rng, jobs=rng.randrange(1, 13))
+                pages = 1
+                if kind == "text_pdf":
+                    pages = write_text_pdf(path, text)
+                elif kind == "scanned_pdf":
+                    images = render_pages(text, rng.choice(IMAGE_WIDTHS[1:]), rng)
+                    write_scanned_pdf(path, images)
+                    pages = len(images)
+                elif kind == "docx":
+                    write_docx(path, text)
+                elif kind == "image_docx":
+                    images = render_pages(text, rng.choice(IMAGE_WIDTHS[:3]), rng)
+                    write_docx(path, images=images)
+                    pages = len(images)
+                elif kind == "doc":
+                    source = os.path.join(scratch, f"{kind}_{i:04d}.docx")
+                    write_docx(source, text)
+                    doc_sources.append(source)
+                    continue
+                else:
+                    image = render_pages(text, rng.choice(IMAGE_WIDTHS), rng)[0]
+                    if kind == "jpg":
+                        image.save(path, "JPEG", quality=rng.choice((70, 85, 95)))
+                    else:
+                        image.convert("L").save(path, "PNG")
+                files.append({"name": name, "kind": kind, "bytes": os.path.getsize(path), "pages": pages})
+        if doc_sources:
+            if convert_to_doc(doc_sources, directory):
+                for source in doc_sources:
+                    name = os.path.splitext(os.path.basename(source))[0] + ".doc"
+                    files.append({"name": name, "kind": "doc", "bytes": os.path.getsize(os.path.join(directory, name)),
+                                  "pages": 1})
+            else:
+                print("LibreOffice not found, the corpus has no .doc files")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    manifest = {"settings": settings, "files": files}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--per-kind", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kinds", nargs="+", default=list(KINDS), choices=KINDS)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.directory, args.per_kind, args.seed, args.kinds)
+    for kind in args.kinds:
+        sizes = [entry["bytes"] for entry in manifest["files"] if entry["kind"] == kind]
+        if sizes:
+            print(f"{kind:<12} {len(sizes):>4} files, {min(sizes) / 1024:>7.1f} - {max(sizes) / 1024:>7.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
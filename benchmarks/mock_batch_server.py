@@ -0,0 +1,174 @@
+"""Local stand-in for an OpenAI-compatible Batch API (files + batches endpoints).
+
+Batches move validating -> in_progress -> completed after --batch-delay seconds; --line-error-rate
+of the requests come back in the error file, and --expire makes every batch expire after answering
+only half of its requests, as a real batch can at the end of its completion window.
+
+    python benchmarks/mock_batch_server.py --port 8098 --batch-delay 5
+"""
+import argparse
+import email.parser
+import email.policy
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from mock_llm_server import mock_completion
+
+
+class BatchState:
+    def __init__(self, batch_delay=2.0, line_error_rate=0.0, expire=False, seed=None):
+        self.batch_delay = batch_delay
+        self.line_error_rate = line_error_rate
+        self.expire = expire
+        self.rng = random.Random(seed)
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+        # Every HTTP request, and batches created, for comparing with one request per resume
+        self.requests = 0
+        self.batches_created = 0
+
+    def process(self, batch_id):
+        """Answer every line of a batch after batch_delay seconds (runs on its own thread)."""
+        time.sleep(self.batch_delay / 2)
+        with self.lock:
+            batch = self.batches[batch_id]
+            batch["status"] = "in_progress"
+            lines = [json.loads(line) for line in self.files[batch["input_file_id"]].splitlines() if line.strip()]
+        time.sleep(self.batch_delay / 2)
+        outputs, errors = [], []
+        answered = lines[:len(lines) // 2] if self.expire else lines
+        for request in answered:
+            with self.lock:
+                failed = self.rng.random() < self.line_error_rate
+            if failed:
+                errors.append({"id": f"req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                               "response": {"status_code": 500, "body": {"error": {"message": "injected failure"}}},
+                               "error": None})
+                continue
+            content = mock_completion()
+            outputs.append({"id": f"req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"], "error": None,
+                            "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": {
+                                "id": "chatcmpl-mock", "object": "chat.completion", "model": request["body"].get("model"),
+                                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                             "finish_reason": "stop"}],
+                                "usage": {"prompt_tokens": 1000, "completion_tokens": len(content) // 4}}}})
+        with self.lock:
+            for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+                if records:
+                    file_id = f"file-{uuid.uuid4().hex[:24]}"
+                    self.files[file_id] = "".join(json.dumps(record) + "\n" for record in records)
+                    batch[key] = file_id
+            batch["status"] = "expired" if self.expire else "completed"
+            batch["request_counts"] = {"total": len(lines), "completed": len(outputs), "failed": len(errors)}
+
+
+class BatchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _count(self):
+        with self.server.state.lock:
+            self.server.state.requests += 1
+
+    def do_POST(self):
+        self._count()
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urlparse(self.path).path
+        if path.endswith("/files"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("ascii") + body)
+            content = next(part.get_payload(decode=True) for part in message.iter_parts()
+                           if part.get_param("name", header="content-disposition") == "file")
+            file_id = f"file-{uuid.uuid4().hex[:24]}"
+            with state.lock:
+                state.files[file_id] = content.decode("utf-8")
+            self._send_json(200, {"id": file_id, "object": "file", "bytes": len(content), "purpose": "batch"})
+        elif path.endswith("/batches"):
+            request = json.loads(body)
+            if request.get("input_file_id") not in state.files:
+                self._send_json(404, {"error": {"message": "input file not found"}})
+                return
+            batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+            batch = {"id": batch_id, "object": "batch", "endpoint": request["endpoint"], "status": "validating",
+                     "input_file_id": request["input_file_id"], "output_file_id": None, "error_file_id": None,
+                     "created_at": int(time.time()), "metadata": request.get("metadata") or {},
+                     "request_counts": {"total": 0, "completed": 0, "failed": 0}}
+            with state.lock:
+                state.batches[batch_id] = batch
+                state.batches_created += 1
+            threading.Thread(target=state.process, args=(batch_id,), daemon=True).start()
+            self._send_json(200, batch)
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_GET(self):
+        self._count()
+        state = self.server.state
+        url = urlparse(self.path)
+        parts = url.path.rstrip("/").split("/")
+        with state.lock:
+            if parts[-1] == "batches":
+                # Newest first, paginated with ?after=<batch id>
+                batches = sorted(state.batches.values(), key=lambda b: b["created_at"], reverse=True)
+                query = parse_qs(url.query)
+                limit = int(query.get("limit", ["20"])[0])
+                after = query.get("after", [None])[0]
+                if after:
+                    ids = [b["id"] for b in batches]
+                    batches = batches[ids.index(after) + 1:] if after in ids else []
+                self._send_json(200, {"object": "list", "data": batches[:limit], "has_more": len(batches) > limit})
+            elif parts[-2] == "batches" and parts[-1] in state.batches:
+                self._send_json(200, state.batches[parts[-1]])
+            elif parts[-1] == "content" and parts[-2] in state.files:
+                payload = state.files[parts[-2]].encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/jsonl")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+
+def start_mock_batch_server(port=0, **state_kwargs):
+    """Start the server on a background thread; returns (server, base_url) with base_url ending in /v1."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), BatchHandler)
+    server.daemon_threads = True
+    server.state = BatchState(**state_kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock Batch API server")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="Seconds until a batch completes")
+    parser.add_argument("--line-error-rate", type=float, default=0.0, help="Share of requests returned as errors")
+    parser.add_argument("--expire", action="store_true", help="Expire every batch after half of its requests")
+    cli_args = parser.parse_args()
+
+    mock_server, base_url = start_mock_batch_server(cli_args.port, batch_delay=cli_args.batch_delay,
+                                                    line_error_rate=cli_args.line_error_rate, expire=cli_args.expire)
+    print(f"Mock Batch API listening on {base_url} (use {base_url}/chat/completions as the provider url)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock_server.shutdown()
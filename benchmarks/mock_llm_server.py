@@ -0,0 +1,285 @@
+"""Local stand-in for an OpenAI-compatible chat-completions endpoint.
+
+Used by the benchmarks so throughput can be measured without paying for real
+Cerebras/Together/OpenAI calls. Run it standalone or start it in-process:
+
+    python benchmarks/mock_llm_server.py --port 8099 --latency 0.5 --rpm 600
+"""
+import argparse
+import json
+import math
+import random
+import re
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_RESUME_JSON = {
+    "City": "Pune",
+    "PersonalDetails": {
+        "Name": {"FirstName": "Asha", "LastName": "Rao", "MiddleName": "", "FullName": "Asha Rao", "TitleName": ""},
+        "DateOfBirth": "01/01/1990",
+        "Mobile": ["+91 9000000000"],
+        "Email": ["asha.rao@example.com"],
+        "Nationality": "Indian"
+    },
+    "Academics": [],
+    "CurrentEmployer": "Example Corp",
+    "CurrentSalary": "",
+    "ExpectedSalary": "",
+    "WorkedPeriod": {"TotalExperienceInMonths": "60", "TotalExperienceInYear": "5", "TotalExperienceRange": "5-6"},
+    "Skills": ["Python"],
+    "WorkExperience": []
+}
+
+
+# Bad generations the server can be asked to produce (see MockState.bad_rate)
+BAD_OUTPUTS = ("fence", "prose", "runaway")
+
+# Characters per streamed chunk, roughly a few tokens
+STREAM_CHUNK_CHARS = 16
+
+# Section headers of a packed request (utils/packing.py), one per resume
+PACKED_RESUME = re.compile(r"^### Resume (\S+)$", re.MULTILINE)
+
+
+def mock_completion(kind="good", resume_ids=None, drop=()):
+    """One answer; with resume_ids, a packed answer holding every id not in drop."""
+    if resume_ids:
+        return json.dumps({"resumes": [{"resume_id": resume_id, "data": MOCK_RESUME_JSON}
+                                       for resume_id in resume_ids if resume_id not in drop]})
+    content = json.dumps(MOCK_RESUME_JSON)
+    if kind == "fence":
+        return f"```json\n{content}\n```"
+    if kind == "prose":
+        return f"Sure! Here are the details extracted from the resume:\n\n{content}"
+    if kind == "runaway":
+        return content[:-1] + ', "Summary": "' + "The candidate has worked on many projects. " * 2000 + '"}'
+    return content
+
+
+class MockState:
+    def __init__(self, latency=0.2, jitter=0.0, rpm=None, token_delay=0.0, bad_rate=0.0, bad_kinds=BAD_OUTPUTS, seed=None,
+                 error_rate=0.0, slow_rate=0.0, slow_latency=10.0, down=False, pack_drop_rate=0.0, latency_sigma=0.0,
+                 tokens_per_second=None):
+        self.latency = latency
+        self.jitter = jitter
+        # With a sigma, latency is the median of a log-normal distribution (a long tail, as real providers have)
+        self.latency_sigma = latency_sigma
+        self.rpm = rpm
+        # Generation time per STREAM_CHUNK_CHARS of output, so long answers take longer, as with a real model
+        self.token_delay = token_delay
+        if tokens_per_second:
+            self.token_delay = STREAM_CHUNK_CHARS / 4 / tokens_per_second
+        self.bad_rate = bad_rate
+        self.bad_kinds = bad_kinds
+        self.streams_cancelled = 0
+        # Fault injection: share of requests answered with HTTP 500/503, share that take slow_latency
+        # instead of latency, and a switch that fails every request (a provider outage)
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.down = down
+        self.errors = 0
+        # Share of the resumes of a packed request left out of its answer
+        self.pack_drop_rate = pack_drop_rate
+        # Estimated prompt tokens received and completion tokens sent (~4 characters per token)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Seeded so repeated runs see the same mix of good and bad answers
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.connections = 0
+
+    def admit(self):
+        """Return (allowed, remaining, reset_seconds) for a fixed one-minute window."""
+        with self.lock:
+            self.requests += 1
+            if not self.rpm:
+                return True, 1000000, 60.0
+            now = time.monotonic()
+            if now - self.window_start >= 60.0:
+                self.window_start = now
+                self.window_count = 0
+            reset = 60.0 - (now - self.window_start)
+            if self.window_count >= self.rpm:
+                self.rate_limited += 1
+                return False, 0, reset
+            self.window_count += 1
+            return True, self.rpm - self.window_count, reset
+
+    def draw_latency(self):
+        """Seconds before the first token of one answer; call with the lock held."""
+        if self.rng.random() < self.slow_rate:
+            return self.slow_latency
+        if self.latency_sigma and self.latency > 0:
+            return self.rng.lognormvariate(math.log(self.latency), self.latency_sigma)
+        return self.latency
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+    disable_nagle_algorithm = True  # headers and body are written separately
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # A client exited with its keep-alive connection open
+            self.close_connection = True
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        allowed, remaining, reset = state.admit()
+        headers = {
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }
+        if not allowed:
+            headers["retry-after"] = f"{reset:.3f}"
+            self._send_json(429, {"error": {"message": "rate limit exceeded"}}, headers)
+            return
+
+        prompt = "".join(m["content"] for m in request.get("messages", []) if isinstance(m.get("content"), str))
+        resume_ids = PACKED_RESUME.findall(prompt)
+        with state.lock:
+            state.prompt_tokens += len(prompt) // 4
+            drop = {resume_id for resume_id in resume_ids if state.rng.random() < state.pack_drop_rate}
+            fail = state.down or state.rng.random() < state.error_rate
+            latency = state.draw_latency()
+            kind = state.rng.choice(state.bad_kinds) if state.rng.random() < state.bad_rate else "good"
+            if fail:
+                state.errors += 1
+        if fail:
+            time.sleep(min(latency, 0.05))
+            status = state.rng.choice((500, 503))
+            self._send_json(status, {"error": {"message": "injected failure"}}, headers)
+            return
+        time.sleep(max(0.0, latency + random.uniform(-state.jitter, state.jitter)))
+        content = mock_completion(kind, resume_ids, drop)
+        with state.lock:
+            state.completion_tokens += len(content) // 4
+        chunks = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+        if request.get("stream"):
+            self._stream(chunks, request.get("model", "mock"), headers)
+            return
+        time.sleep(state.token_delay * len(chunks))
+        self._send_json(200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }, headers)
+
+
+    def _stream(self, chunks, model, headers):
+        """Server-sent events, one chat.completion.chunk per chunk, over chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        def write_event(data):
+            payload = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for chunk in chunks:
+                time.sleep(self.server.state.token_delay)
+                write_event(json.dumps({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                                        "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}))
+            write_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client aborted the generation
+            with self.server.state.lock:
+                self.server.state.streams_cancelled += 1
+            self.close_connection = True
+
+
+def start_mock_server(port=0, certfile=None, keyfile=None, **state_kwargs):
+    """Start the server on a background thread; returns (server, chat_completions_url).
+
+    Pass certfile/keyfile to serve HTTPS, so benchmarks include the TLS handshake cost.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(**state_kwargs)
+    scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"{scheme}://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    return server, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock chat-completions server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.0,
+                        help="Log-normal latency with --latency as the median and this sigma (0: fixed)")
+    parser.add_argument("--tokens-per-second", type=float, default=None,
+                        help="Generation speed; overrides --token-delay")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute before answering 429")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per generated chunk of ~4 tokens")
+    parser.add_argument("--bad-rate", type=float, default=0.0, help="Share of answers that are fenced, prose or runaway")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500/503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests that take --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="Seconds per slow completion")
+    parser.add_argument("--pack-drop-rate", type=float, default=0.0, help="Share of resumes left out of packed answers")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--certfile", help="PEM certificate to serve HTTPS")
+    parser.add_argument("--keyfile", help="PEM private key for --certfile")
+    cli_args = parser.parse_args()
+
+    mock_server, mock_url = start_mock_server(cli_args.port, certfile=cli_args.certfile, keyfile=cli_args.keyfile,
+                                              latency=cli_args.latency, jitter=cli_args.jitter, rpm=cli_args.rpm,
+                                              latency_sigma=cli_args.latency_sigma,
+                                              tokens_per_second=cli_args.tokens_per_second,
+                                              token_delay=cli_args.token_delay, bad_rate=cli_args.bad_rate,
+                                              error_rate=cli_args.error_rate, slow_rate=cli_args.slow_rate,
+                                              slow_latency=cli_args.slow_latency, pack_drop_rate=cli_args.pack_drop_rate,
+                                              seed=cli_args.seed)
+    print(f"Mock chat-completions server listening on {mock_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock_server.shutdown()
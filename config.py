@@ -126,3 +126,190 @@ json_template = {
 OPENAI_API_KEY='xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
 IMAGE_API_KEY='xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
 
+# API key of each chat-completions provider (LLM_PROVIDERS). OPENAI_API_KEY is the key extraction requests
+# have always been sent to Cerebras with; the OpenAI provider defaults to the vision key (an OpenAI key).
+# A provider without a key cannot be put in LLM_PROVIDER_ORDER.
+CEREBRAS_API_KEY = OPENAI_API_KEY
+TOGETHER_API_KEY = None
+OPENAI_CHAT_API_KEY = IMAGE_API_KEY
+
+
+# Requests per minute allowed per provider. The limiter starts at this ceiling and
+# adapts to the provider's x-ratelimit-* headers and HTTP 429 responses at runtime.
+PROVIDER_RATE_LIMITS = {
+    "cerebras": 30,
+    "together": 60,
+    "openai": 500,
+}
+
+# Number of files processed concurrently (overridden by --workers)
+EXTRACTION_WORKERS = 1
+
+# Keep-alive HTTP pools shared by all workers (one pool per provider).
+# HTTP/2 is used only when httpx[http2] is installed.
+HTTP_POOL_SIZE = 32
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 300
+HTTP2_ENABLED = True
+
+# Persistent cache of LLM extraction results, keyed on a hash of the normalized resume
+# content, prompts, template, model and sampling parameters (bypass with --no-cache).
+CACHE_ENABLED = True
+CACHE_PATH = "cache/extraction_cache.sqlite3"
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Index of processed input files (path, size, mtime, content hash -> output, status).
+# main.py consults it before any extraction so unchanged files never reach the LLM.
+MANIFEST_PATH = "cache/manifest.sqlite3"
+
+# PDF text extraction backend: "pymupdf" (fast default), "pypdf" or "langchain" (the old PyPDFLoader path).
+# PDFs with at least 8 pages are split across PDF_TEXT_WORKERS processes.
+PDF_TEXT_BACKEND = "pymupdf"
+PDF_TEXT_WORKERS = 4
+
+# Vision fallback for scanned PDFs and image-only DOCX: each page/image is rendered or downscaled to
+# the resolution the vision model uses and sent as its own image_url part, within these limits.
+VISION_MAX_LONG_EDGE = 2048
+VISION_MAX_SHORT_EDGE = 768
+VISION_JPEG_QUALITY = 80
+VISION_MAX_IMAGES = 10
+VISION_MAX_PAYLOAD_BYTES = 8 * 1024 * 1024
+
+# Images (JPG/PNG resumes and DOCX media) are EXIF-rotated, downscaled to the limits above and
+# recompressed as JPEG at VISION_JPEG_QUALITY before upload; VISION_GRAYSCALE also drops colour.
+# Optimized images are cached in IMAGE_CACHE_DIR by content hash.
+VISION_GRAYSCALE = False
+IMAGE_CACHE_DIR = "cache/images"
+
+# .doc conversion on Linux/macOS: warm headless LibreOffice instances, each with its own profile in a
+# per-process subdirectory of OFFICE_SCRATCH_DIR (converted files are written there too, not into the
+# input directory), so concurrent runs and --serve workers never share a profile or output file.
+# A conversion running longer than OFFICE_TIMEOUT seconds kills and restarts its instance.
+OFFICE_INSTANCES = 2
+OFFICE_SCRATCH_DIR = "cache/office"
+OFFICE_TIMEOUT = 120
+
+# Resume text is normalized before extraction (whitespace, running headers/footers, duplicate lines)
+# and truncated to PROMPT_TOKEN_BUDGET estimated tokens, keeping the start and end of the resume.
+PROMPT_COMPACTION_ENABLED = True
+PROMPT_TOKEN_BUDGET = 6000
+
+# Stream completions and abort generations that diverge from json_template (markdown fences, prose,
+# runaway strings, answers longer than LLM_MAX_RESPONSE_CHARS). Disable with --no-stream.
+LLM_STREAMING = True
+LLM_MAX_RESPONSE_CHARS = 32000
+
+# Answers are validated against json_template before they are written: fences, prose, trailing commas,
+# truncation, missing/renamed keys and dates that are not dd/MM/yyyy are repaired locally, and the file
+# is written as canonical JSON. With OUTPUT_FIX_REQUESTS, what cannot be repaired locally is sent back
+# as a small targeted request (the broken JSON or the offending fields only, never the resume).
+OUTPUT_VALIDATION_ENABLED = True
+OUTPUT_FIX_REQUESTS = True
+
+# Provider registry (utils/providers.py): overrides of the built-in cerebras/together/openai entries, or new
+# OpenAI-compatible providers (url, model, params, api_key). weight is a static preference and max_concurrency
+# caps the requests in flight to that provider. Add a provider here and to LLM_PROVIDER_ORDER to use it.
+# Providers use other models and sampling parameters (Together samples at temperature 0.7), so answers differ.
+LLM_PROVIDERS = {
+    "cerebras": {"api_key": CEREBRAS_API_KEY, "weight": 1.0, "max_concurrency": 16},
+    "together": {"api_key": TOGETHER_API_KEY, "weight": 1.0, "max_concurrency": 16},
+    "openai": {"api_key": OPENAI_CHAT_API_KEY, "weight": 0.5, "max_concurrency": 32},
+}
+
+# Extraction calls go through utils/resilience.py: providers in LLM_PROVIDER_ORDER (preferred first) are
+# retried with jittered exponential backoff, a provider failing BREAKER_FAILURE_THRESHOLD times in a row is
+# skipped for BREAKER_RESET_TIMEOUT seconds. Hedging is opt-in (HEDGE_ENABLED or --hedge): a request still
+# running after the provider's recent p95 latency (HEDGE_INITIAL_DELAY until enough calls are seen) is also
+# sent to the next provider, the first valid answer wins and the other request is cancelled. Each hedge can
+# pay for two requests, so it trades cost for tail latency.
+# Only Cerebras by default, as before; add "together" and/or "openai" (with their keys) to fail over to them.
+LLM_PROVIDER_ORDER = ["cerebras"]
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+HEDGE_ENABLED = False
+HEDGE_QUANTILE = 0.95
+HEDGE_INITIAL_DELAY = 15.0
+
+# Opt-in (ROUTER_ENABLED or --router): traffic is split between the providers in LLM_PROVIDER_ORDER by weight
+# times their rolling tokens/second and success rate (utils/router.py) instead of always preferring the first
+# one. The split and the numbers behind it are logged and written to ROUTER_STATS_PATH every
+# ROUTER_STATS_INTERVAL seconds.
+ROUTER_ENABLED = False
+ROUTER_STATS_INTERVAL = 60
+ROUTER_STATS_PATH = "cache/router_stats.json"
+
+# main.py --batch sends the extraction requests through BATCH_PROVIDER's Batch API (utils/batch_runner.py)
+# instead of one synchronous call per resume: text extraction runs locally, the request bodies are written to
+# JSONL shards of at most BATCH_MAX_REQUESTS requests / BATCH_MAX_BYTES bytes under BATCH_WORK_DIR, and the
+# batches are polled every BATCH_POLL_INTERVAL seconds. Progress is kept in BATCH_STATE_PATH, so running
+# --batch again after an interruption resumes it; failed requests are resubmitted up to BATCH_MAX_ATTEMPTS times.
+BATCH_PROVIDER = "openai"
+BATCH_STATE_PATH = "cache/batch_state.sqlite3"
+BATCH_WORK_DIR = "cache/batch"
+BATCH_POLL_INTERVAL = 60
+BATCH_MAX_REQUESTS = 50000
+BATCH_MAX_BYTES = 190 * 1024 * 1024
+BATCH_MAX_ATTEMPTS = 3
+
+# With PACKING_ENABLED (or main.py --pack), resumes of at most PACK_MAX_RESUME_TOKENS tokens are bin-packed up to
+# PACK_MAX_PER_REQUEST to a request and PACK_TOKEN_BUDGET resume tokens per request (utils/packing.py), so the
+# system prompt and template are sent once for several resumes. Any resume whose part of the answer does not
+# validate is extracted again on its own. Tokens and requests per resume are logged at the end of the run.
+PACKING_ENABLED = False
+PACK_TOKEN_BUDGET = 6000
+PACK_MAX_RESUME_TOKENS = 1500
+PACK_MAX_PER_REQUEST = 8
+
+# main.py --serve runs an HTTP extraction service (utils/extraction_service.py): POST /extract takes a base64
+# api_request (as in the exports base64_decoder.py reads) or a multipart upload and returns the JSON. Requests
+# run on SERVICE_WORKERS warm worker processes, one at a time each; up to SERVICE_QUEUE_SIZE more wait, and
+# beyond that the service answers 429 so latency stays bounded. Provider rate limits are split between workers.
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8080
+SERVICE_WORKERS = 4
+SERVICE_QUEUE_SIZE = 16
+SERVICE_REQUEST_TIMEOUT = 300
+SERVICE_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# main.py --watch keeps running and processes files as they are written to input_files (utils/watcher.py), using
+# inotify on Linux, the watchdog package elsewhere if installed, and otherwise a rescan every WATCH_POLL_INTERVAL
+# seconds. A file is picked up once it has had no writes for WATCH_SETTLE_SECONDS with an unchanged size and mtime;
+# up to WATCH_MAX_BATCH files that become ready together go through the pipeline as one batch.
+WATCH_SETTLE_SECONDS = 1.0
+WATCH_MAX_BATCH = 256
+WATCH_POLL_INTERVAL = 5.0
+
+# Per-stage spans (utils/tracing.py): extract, convert, vision, llm, validate and write, plus one "file" span per
+# input, with bytes, pages, images and prompt/completion tokens. Histograms per stage and file type are logged as
+# p50/p95/p99 and written to TRACE_REPORT_PATH at the end of a run (with the slowest files and where their time
+# went); with METRICS_PORT (or main.py --metrics-port) set they are served at http://METRICS_HOST:port/metrics in
+# the Prometheus text format while the run or --watch lasts. main.py --no-trace turns the spans into no-ops.
+TRACING_ENABLED = True
+TRACE_REPORT_PATH = "logs/stage_report.json"
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = None
+
+# Where results are written (utils/output_sink.py, main.py --output-sink). "files": one *_extracted_info.json per
+# input in extracted_json, written to a temporary name and renamed into place (OUTPUT_FILE_FSYNC also flushes
+# each file to disk). "jsonl": records appended to extracted_json/results-NNNNNN.jsonl segments of up to
+# OUTPUT_SEGMENT_MAX_BYTES, fsynced every OUTPUT_FSYNC_BATCH records or OUTPUT_FSYNC_INTERVAL seconds, with an
+# offset index by input file name in extracted_json/index.sqlite3.
+OUTPUT_SINK = "files"
+OUTPUT_FILE_FSYNC = False
+OUTPUT_SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+OUTPUT_FSYNC_BATCH = 256
+OUTPUT_FSYNC_INTERVAL = 1.0
+
+# Resubmitted CVs (utils/near_duplicates.py): every extracted resume is indexed by a MinHash signature of its
+# text in NEAR_DUP_PATH. A new resume whose estimated similarity to an earlier one reaches NEAR_DUP_THRESHOLD
+# reuses that extraction if no line changed (or its similarity reaches NEAR_DUP_REUSE_THRESHOLD, if set); otherwise,
+# with at most NEAR_DUP_MAX_DIFF_LINES lines removed or added, only the changed lines and the earlier JSON are
+# sent in a small update request. Disabled by --no-near-dup and --no-cache.
+NEAR_DUP_ENABLED = True
+NEAR_DUP_PATH = "cache/near_duplicates.sqlite3"
+NEAR_DUP_THRESHOLD = 0.75
+NEAR_DUP_REUSE_THRESHOLD = None
+NEAR_DUP_MAX_DIFF_LINES = 40
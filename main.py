@@ -1,20 +1,244 @@
 import os
 import argparse
+import functools
+import logging
 from utils.functions import OpenAIClient, FileProcessor
+from utils.extraction_cache import ExtractionCache
+from utils.manifest import ProcessingManifest
+from utils.page_images import PageImageBudget
+from utils.image_optimizer import ImageOptimizer
+from utils.office_pool import OfficeConversionPool
+from utils.prompt_compaction import PromptCompactor
+from utils.json_repair import OutputValidator
+from utils.resilience import RetryPolicy
+from utils.router import AdaptiveRouter
+from utils.batch_runner import BatchRunner
+from utils.packing import ResumePacker
+from utils.extraction_service import ExtractionService
+from utils.watcher import DirectoryWatcher
+from utils.tracing import Tracer, start_metrics_server
+from utils.output_sink import SINKS, open_sink
+from utils.near_duplicates import NearDuplicateIndex
 from log_helper import setup_logging
-from config import system_prompt, user_prompt, json_template, OPENAI_API_KEY, IMAGE_API_KEY
+from config import system_prompt, user_prompt, json_template, OPENAI_API_KEY, IMAGE_API_KEY, PROVIDER_RATE_LIMITS, EXTRACTION_WORKERS, \
+    HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP2_ENABLED, CACHE_ENABLED, CACHE_PATH, CACHE_MAX_BYTES, \
+    MANIFEST_PATH, PDF_TEXT_BACKEND, PDF_TEXT_WORKERS, VISION_MAX_LONG_EDGE, VISION_MAX_SHORT_EDGE, VISION_JPEG_QUALITY, \
+    VISION_MAX_IMAGES, VISION_MAX_PAYLOAD_BYTES, VISION_GRAYSCALE, IMAGE_CACHE_DIR, \
+    OFFICE_INSTANCES, OFFICE_SCRATCH_DIR, OFFICE_TIMEOUT, PROMPT_COMPACTION_ENABLED, PROMPT_TOKEN_BUDGET, \
+    LLM_STREAMING, LLM_MAX_RESPONSE_CHARS, OUTPUT_VALIDATION_ENABLED, OUTPUT_FIX_REQUESTS, \
+    LLM_PROVIDER_ORDER, RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, BREAKER_FAILURE_THRESHOLD, \
+    BREAKER_RESET_TIMEOUT, HEDGE_ENABLED, HEDGE_QUANTILE, HEDGE_INITIAL_DELAY, LLM_PROVIDERS, ROUTER_ENABLED, \
+    ROUTER_STATS_INTERVAL, ROUTER_STATS_PATH, BATCH_PROVIDER, BATCH_STATE_PATH, BATCH_WORK_DIR, BATCH_POLL_INTERVAL, \
+    BATCH_MAX_REQUESTS, BATCH_MAX_BYTES, BATCH_MAX_ATTEMPTS, PACKING_ENABLED, PACK_TOKEN_BUDGET, PACK_MAX_RESUME_TOKENS, \
+    PACK_MAX_PER_REQUEST, SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_QUEUE_SIZE, SERVICE_REQUEST_TIMEOUT, \
+    SERVICE_MAX_UPLOAD_BYTES, WATCH_SETTLE_SECONDS, WATCH_MAX_BATCH, WATCH_POLL_INTERVAL, TRACING_ENABLED, \
+    TRACE_REPORT_PATH, METRICS_HOST, METRICS_PORT, OUTPUT_SINK, OUTPUT_FILE_FSYNC, OUTPUT_SEGMENT_MAX_BYTES, \
+    OUTPUT_FSYNC_BATCH, OUTPUT_FSYNC_INTERVAL, NEAR_DUP_ENABLED, NEAR_DUP_PATH, NEAR_DUP_THRESHOLD, \
+    NEAR_DUP_REUSE_THRESHOLD, NEAR_DUP_MAX_DIFF_LINES
 
 # Set up logging
 setup_logging()
 
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.jpg', '.jpeg', '.png', '.doc')
+
+def build_client(args, cache, rate_limits=PROVIDER_RATE_LIMITS, tracer=None):
+    """OpenAIClient with the configured providers, routing, retries, circuit breakers and hedging."""
+    client = OpenAIClient(
+        OPENAI_API_KEY,
+        IMAGE_API_KEY,
+        rate_limits=rate_limits,
+        tracer=tracer,
+        pool_size=max(HTTP_POOL_SIZE, args.workers),
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        http2=HTTP2_ENABLED,
+        cache=cache,
+        streaming=LLM_STREAMING and not args.no_stream,
+        max_response_chars=LLM_MAX_RESPONSE_CHARS,
+        providers=LLM_PROVIDERS
+    )
+
+    # Splits extraction traffic between providers by their live latency, throughput and error rate
+    router = None
+    if ROUTER_ENABLED or args.router:
+        router = AdaptiveRouter([client.providers[name] for name in LLM_PROVIDER_ORDER],
+                                stats_interval=ROUTER_STATS_INTERVAL, stats_path=ROUTER_STATS_PATH)
+
+    # Retries, circuit breakers and hedging across providers for every extraction call
+    client.enable_resilience(
+        LLM_PROVIDER_ORDER,
+        router=router,
+        policy=RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY),
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=BREAKER_RESET_TIMEOUT,
+        hedge=HEDGE_ENABLED or args.hedge,
+        hedge_quantile=HEDGE_QUANTILE,
+        hedge_initial_delay=HEDGE_INITIAL_DELAY,
+        max_workers=2 * max(1, args.workers)
+    )
+    return client
+
+
+def build_output_sink(args, output_directory):
+    """Per-file or JSONL output sink for output_directory; None (nothing is written) without a directory."""
+    if output_directory is None:
+        return None
+    if args.output_sink == "jsonl":
+        return open_sink("jsonl", output_directory, segment_max_bytes=OUTPUT_SEGMENT_MAX_BYTES,
+                         fsync_batch=OUTPUT_FSYNC_BATCH, fsync_interval=OUTPUT_FSYNC_INTERVAL)
+    return open_sink("files", output_directory, fsync=OUTPUT_FILE_FSYNC)
+
+
+def build_file_processor(args, client, input_directory, output_directory, manifest=None):
+    """FileProcessor wired with the configured vision budget, office pool, compaction, validation and packing."""
+    # Vision inputs are downscaled to the model's resolution before upload
+    image_budget = PageImageBudget(VISION_MAX_LONG_EDGE, VISION_MAX_SHORT_EDGE, VISION_JPEG_QUALITY,
+                                   VISION_MAX_IMAGES, VISION_MAX_PAYLOAD_BYTES)
+    image_optimizer = ImageOptimizer(image_budget, grayscale=VISION_GRAYSCALE,
+                                     cache_dir=None if args.no_cache else IMAGE_CACHE_DIR)
+
+    # Started lazily, on the first .doc file
+    office_pool = None
+    if os.name == "posix":
+        office_pool = OfficeConversionPool(args.office_instances, scratch_dir=OFFICE_SCRATCH_DIR, timeout=OFFICE_TIMEOUT)
+
+    # Answers are checked against json_template and repaired locally; only unfixable ones cost a (small) request
+    fix_request = None
+    if OUTPUT_FIX_REQUESTS:
+        fix_request = lambda instruction, payload: client.fix_output(system_prompt, instruction, payload)
+    output_validator = OutputValidator(json_template, fix_request, enabled=OUTPUT_VALIDATION_ENABLED)
+
+    # Resubmitted CVs reuse their earlier extraction, or send only the changed lines; scoped to the prompts and template
+    near_duplicates = NearDuplicateIndex(
+        NEAR_DUP_PATH, namespace="\0".join((system_prompt, user_prompt, str(json_template))),
+        update_request=lambda instruction, payload: client.fix_output(system_prompt, instruction, payload),
+        threshold=NEAR_DUP_THRESHOLD, reuse_threshold=NEAR_DUP_REUSE_THRESHOLD, max_diff_lines=NEAR_DUP_MAX_DIFF_LINES,
+        enabled=NEAR_DUP_ENABLED and not args.no_cache and not args.no_near_dup)
+
+    # Initialize file processor with prompts
+    file_processor = FileProcessor(
+        input_directory, 
+        output_directory, 
+        client, 
+        args, 
+        system_prompt, 
+        user_prompt, 
+        json_template,
+        manifest=manifest,
+        image_budget=image_budget,
+        image_optimizer=image_optimizer,
+        office_pool=office_pool,
+        prompt_compactor=PromptCompactor(PROMPT_TOKEN_BUDGET, enabled=PROMPT_COMPACTION_ENABLED),
+        output_validator=output_validator,
+        output_sink=build_output_sink(args, output_directory),
+        near_duplicates=near_duplicates
+    )
+    # Short resumes share a request (opt-in); only used when processing a directory
+    file_processor.resume_packer = ResumePacker(file_processor, PACK_TOKEN_BUDGET, PACK_MAX_RESUME_TOKENS,
+                                                PACK_MAX_PER_REQUEST, enabled=PACKING_ENABLED or args.pack)
+    return file_processor, output_validator
+
+
+def build_service_worker(args):
+    """Client and FileProcessor of one service worker process (see utils/extraction_service.py)."""
+    # Each worker is one request at a time and gets an equal share of the provider quotas
+    worker_args = argparse.Namespace(**dict(vars(args), workers=1, pdf_workers=1, office_instances=1))
+    share = max(1, args.service_workers)
+    rate_limits = {provider: max(1, rpm // share) for provider, rpm in PROVIDER_RATE_LIMITS.items()}
+    cache = ExtractionCache(CACHE_PATH, max_bytes=CACHE_MAX_BYTES, enabled=CACHE_ENABLED and not args.no_cache)
+    client = build_client(worker_args, cache, rate_limits)
+    file_processor, _ = build_file_processor(worker_args, client, None, None)
+    return file_processor
+
+
+def serve(args):
+    """Run the HTTP extraction service until interrupted."""
+    service = ExtractionService(functools.partial(build_service_worker, args), workers=args.service_workers,
+                                queue_size=args.queue_size, request_timeout=SERVICE_REQUEST_TIMEOUT,
+                                max_upload_bytes=SERVICE_MAX_UPLOAD_BYTES)
+    try:
+        service.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        logging.info("Extraction service stopped.")
+    finally:
+        service.close()
+
+
+def split_by_type(names):
+    """(pdf, docx, image, doc) file names, in the argument order of FileProcessor.process_all_files."""
+    pdf_files = [f for f in names if f.endswith('.pdf')]
+    docx_files = [f for f in names if f.endswith('.docx')]
+    image_files = [f for f in names if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    doc_files = [f for f in names if f.lower().endswith('.doc')]
+    return pdf_files, docx_files, image_files, doc_files
+
+
+def pending_names(args, manifest, file_processor, input_directory, entries):
+    """Names of the entries that still need processing; unchanged, processed files are dropped."""
+    if not args.write_all:
+        if manifest.is_empty():
+            manifest.bootstrap(input_directory, entries,
+                               file_processor.output_sink.locations([entry.name for entry in entries]))
+        entries, changed = manifest.pending(input_directory, entries)
+        file_processor.changed_inputs = set(changed)
+    return [entry.name for entry in entries]
+
+
+def watch(args, file_processor, manifest, input_directory):
+    """Process what is waiting in input_directory, then every file written to it, until interrupted."""
+    def handle(entries):
+        names = pending_names(args, manifest, file_processor, input_directory, entries)
+        file_processor.process_all_files(*split_by_type(names))
+
+    watcher = DirectoryWatcher(input_directory, SUPPORTED_EXTENSIONS, handle, settle=WATCH_SETTLE_SECONDS,
+                               max_batch=WATCH_MAX_BATCH, poll_interval=WATCH_POLL_INTERVAL)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logging.info("Watch mode stopped.")
+    finally:
+        watcher.close()
+
+
+def report_stages(tracer, metrics_server):
+    """End-of-run stage timings: a log line per stage and the JSON report."""
+    tracer.log_summary()
+    tracer.write_report(TRACE_REPORT_PATH)
+    if metrics_server is not None:
+        metrics_server.shutdown()
+
+
 def main():
     # Set up argument parsing
     parser = argparse.ArgumentParser(description='Process files and extract text.')
     parser.add_argument('--write-all', action='store_true', help='Overwrite all files')
     parser.add_argument('--write-new', action='store_true', help='Skips already processed files.')
     parser.add_argument('--process', type=str, help='Process a single file (provide file name with extension)')
+    parser.add_argument('--workers', type=int, default=EXTRACTION_WORKERS, help='Number of files processed concurrently (LLM requests in flight)')
+    parser.add_argument('--batch', action='store_true', help='Submit the extraction requests through the Batch API (resumable)')
+    parser.add_argument('--pack', action='store_true', help='Send several short resumes per extraction request')
+    parser.add_argument('--watch', action='store_true', help='Keep running and process files as they are written to input_files')
+    parser.add_argument('--serve', action='store_true', help='Run the HTTP extraction service instead of processing input_files')
+    parser.add_argument('--host', default=SERVICE_HOST, help='Address the extraction service listens on')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='Port the extraction service listens on')
+    parser.add_argument('--service-workers', type=int, default=SERVICE_WORKERS, help='Warm worker processes of the extraction service')
+    parser.add_argument('--queue-size', type=int, default=SERVICE_QUEUE_SIZE, help='Requests the extraction service queues before answering 429')
+    parser.add_argument('--no-trace', action='store_true', help='Do not record per-stage timings')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help='Serve Prometheus metrics on this port while running')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the extraction result cache')
+    parser.add_argument('--no-near-dup', action='store_true', help='Extract resubmitted CVs in full instead of from their earlier extraction')
+    parser.add_argument('--router', action='store_true', help='Split traffic between the providers in LLM_PROVIDER_ORDER by measured speed')
+    parser.add_argument('--hedge', action='store_true', help='Also send slow extraction requests to a second provider (costs extra requests)')
+    parser.add_argument('--no-stream', action='store_true', help='Wait for complete LLM responses instead of streaming them')
+    parser.add_argument('--pdf-backend', choices=['pymupdf', 'pypdf', 'langchain'], default=PDF_TEXT_BACKEND, help='PDF text extraction backend')
+    parser.add_argument('--no-native-doc', dest='native_doc', action='store_false', help='Always convert .doc files with an office suite instead of reading them directly')
+    parser.add_argument('--office-instances', type=int, default=OFFICE_INSTANCES, help='LibreOffice instances converting .doc files in parallel')
+    parser.add_argument('--output-sink', choices=SINKS, default=OUTPUT_SINK, help='One JSON file per input, or appended JSONL segments with an index')
+    parser.add_argument('--pdf-workers', type=int, default=PDF_TEXT_WORKERS, help='Processes used to extract pages of long PDFs in parallel')
     
     args = parser.parse_args()
+    if args.watch and (args.batch or args.process):
+        parser.error('--watch cannot be combined with --batch or --process')
 
     # Define input and output directories
     input_directory = "input_files"
@@ -24,26 +248,37 @@ def main():
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
-    # Initialize OpenAI Client
-    client = OpenAIClient(OPENAI_API_KEY,IMAGE_API_KEY)
+    if args.serve:
+        serve(args)
+        return
 
-    # Initialize file processor with prompts
-    file_processor = FileProcessor(
-        input_directory, 
-        output_directory, 
-        client, 
-        args, 
-        system_prompt, 
-        user_prompt, 
-        json_template
-    )
+    # Cache of previous LLM results, shared by all workers (and safe across processes)
+    cache = ExtractionCache(CACHE_PATH, max_bytes=CACHE_MAX_BYTES, enabled=CACHE_ENABLED and not args.no_cache)
+    # Per-stage spans and histograms; reported at the end of the run and, with --metrics-port, scraped live
+    tracer = Tracer(enabled=TRACING_ENABLED and not args.no_trace)
+    metrics_server = start_metrics_server(tracer, METRICS_HOST, args.metrics_port) if args.metrics_port else None
+    client = build_client(args, cache, tracer=tracer)
+
+    # Index of already processed inputs, consulted before any extraction work
+    manifest = ProcessingManifest(MANIFEST_PATH)
+    file_processor, output_validator = build_file_processor(args, client, input_directory, output_directory, manifest)
 
     # Process a single file if --process argument is given
     if args.process:
         file_path = os.path.join(input_directory, args.process)
         if not os.path.exists(file_path):
             print(f"ERROR: File '{args.process}' not found in '{input_directory}'")
+            client.close()
             return
+
+        if not args.write_all:
+            state = manifest.classify(file_path)
+            if state == "unchanged":
+                logging.info(f"Skipping {args.process}: unchanged since it was last processed.")
+                client.close()
+                return
+            if state == "changed":
+                file_processor.changed_inputs = {args.process}
         
         # Determine file type and process accordingly
         if args.process.endswith('.pdf'):
@@ -56,19 +291,56 @@ def main():
             file_processor.process_doc_files([args.process])
         else:
             print(f"ERROR: Unsupported file type '{args.process}'")
+        cache.log_stats()
+        file_processor.near_duplicates.log_stats()
+        output_validator.log_stats()
+        report_stages(tracer, metrics_server)
+        file_processor.close()
+        manifest.close()
+        client.close()
         return  # Exit after processing single file
 
-    # Get list of files from the input directory (if --process is not used)
-    pdf_files = [f for f in os.listdir(input_directory) if f.endswith('.pdf')]
-    docx_files = [f for f in os.listdir(input_directory) if f.endswith('.docx')]
-    image_files = [f for f in os.listdir(input_directory) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    doc_files = [f for f in os.listdir(input_directory) if f.lower().endswith('.doc')]
-
-    # Process all files
-    file_processor.process_pdf_files(pdf_files)
-    file_processor.process_docx_files(docx_files)
-    file_processor.process_image_files(image_files)
-    file_processor.process_doc_files(doc_files)
+    if args.watch:
+        # Catch-up listing once, then filesystem events only
+        watch(args, file_processor, manifest, input_directory)
+        file_processor.resume_packer.log_stats()
+        cache.log_stats()
+        file_processor.near_duplicates.log_stats()
+        output_validator.log_stats()
+        report_stages(tracer, metrics_server)
+        file_processor.close()
+        manifest.close()
+        client.close()
+        return
+
+    # List the input directory once (if --process is not used)
+    with os.scandir(input_directory) as it:
+        entries = [entry for entry in it if entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS)]
+
+    # Drop files the manifest knows are processed and unchanged, before any extraction or LLM call
+    names = pending_names(args, manifest, file_processor, input_directory, entries)
+    pdf_files, docx_files, image_files, doc_files = split_by_type(names)
+
+    if args.batch:
+        # One Batch API request per file instead of a synchronous call; rerun with --batch to resume
+        batch_runner = BatchRunner(client, file_processor, BATCH_PROVIDER, BATCH_STATE_PATH, BATCH_WORK_DIR,
+                                   poll_interval=BATCH_POLL_INTERVAL, max_requests=BATCH_MAX_REQUESTS,
+                                   max_bytes=BATCH_MAX_BYTES, max_attempts=BATCH_MAX_ATTEMPTS)
+        try:
+            batch_runner.run(names)
+        finally:
+            batch_runner.close()
+    else:
+        # Process all files
+        file_processor.process_all_files(pdf_files, docx_files, image_files, doc_files)
+        file_processor.resume_packer.log_stats()
+    cache.log_stats()
+    file_processor.near_duplicates.log_stats()
+    output_validator.log_stats()
+    report_stages(tracer, metrics_server)
+    file_processor.close()
+    manifest.close()
+    client.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,367 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from utils.manifest import STATUS_FAILED
+
+# Limits of one batch input file (the OpenAI Batch API allows 50,000 requests and 200 MB)
+DEFAULT_MAX_REQUESTS = 50000
+DEFAULT_MAX_BYTES = 190 * 1024 * 1024
+
+# Attempts per resume before it is given up (requests that errored or were left over by an expired batch)
+DEFAULT_MAX_ATTEMPTS = 3
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Job and shard states kept in the state database
+JOB_QUEUED, JOB_SUBMITTED, JOB_DONE, JOB_FAILED = "queued", "submitted", "done", "failed"
+SHARD_WRITTEN, SHARD_UPLOADED, SHARD_SUBMITTED, SHARD_COLLECTED = "written", "uploaded", "submitted", "collected"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class BatchAPI:
+    """Client for an OpenAI-compatible Batch API: upload a JSONL file, create a batch, poll it, download results."""
+
+    def __init__(self, base_url, api_key, timeout=(10, 600), verify=True):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self.timeout = timeout
+        self.verify = verify
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, self.base_url + path, timeout=self.timeout, verify=self.verify, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"Batch API {method} {path} failed: {response.status_code} {response.text[:300]}")
+        return response
+
+    def upload(self, path):
+        with open(path, "rb") as f:
+            response = self._request("POST", "/files", data={"purpose": "batch"},
+                                     files={"file": (os.path.basename(path), f, "application/jsonl")})
+        return response.json()["id"]
+
+    def create(self, input_file_id, endpoint, metadata=None):
+        return self._request("POST", "/batches", json={
+            "input_file_id": input_file_id,
+            "endpoint": endpoint,
+            "completion_window": "24h",
+            "metadata": metadata or {},
+        }).json()
+
+    def get(self, batch_id):
+        return self._request("GET", f"/batches/{batch_id}").json()
+
+    def find(self, key, value):
+        """Most recent batch whose metadata[key] == value, or None."""
+        after = None
+        while True:
+            params = {"limit": 100}
+            if after:
+                params["after"] = after
+            page = self._request("GET", "/batches", params=params).json()
+            for batch in page.get("data", []):
+                if (batch.get("metadata") or {}).get(key) == value:
+                    return batch
+            if not page.get("has_more") or not page.get("data"):
+                return None
+            after = page["data"][-1]["id"]
+
+    def download(self, file_id, path):
+        """Stream a result file to disk; returns path."""
+        response = self._request("GET", f"/files/{file_id}/content", stream=True)
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(1024 * 1024):
+                f.write(chunk)
+        return path
+
+    def close(self):
+        self.session.close()
+
+
+class BatchState:
+    """SQLite record of every queued request and submitted batch, so an interrupted run resumes where it stopped."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL,
+                body TEXT NOT NULL,
+                cache_key TEXT,
+                shard TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS shards (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                input_file_id TEXT,
+                batch_id TEXT,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+        self.conn.commit()
+
+    def execute(self, sql, params=()):
+        with self.lock, self.conn:
+            return self.conn.execute(sql, params).fetchall()
+
+    def active_files(self):
+        rows = self.execute("SELECT filename FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_SUBMITTED))
+        return {row[0] for row in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+class BatchRunner:
+    """Offline extraction through a provider's Batch API (main.py --batch).
+
+    run(filenames) performs every local step first (text extraction, compaction, cache lookups),
+    stores one request body per resume in the state database, writes them into JSONL shards,
+    uploads and submits each shard, polls until the batches finish and fans the answers out
+    through FileProcessor.write_output_file. All progress lives in the state database, so
+    running again after an interruption resumes uploads, finds batches that were created but
+    not recorded (by their metadata), collects finished batches and resubmits failed requests.
+    """
+
+    def __init__(self, client, processor, provider, state_path, work_dir, poll_interval=60.0,
+                 max_requests=DEFAULT_MAX_REQUESTS, max_bytes=DEFAULT_MAX_BYTES, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 api=None):
+        self.client = client
+        self.processor = processor
+        self.provider = provider
+        self.state = BatchState(state_path)
+        self.work_dir = work_dir
+        os.makedirs(work_dir, exist_ok=True)
+        self.poll_interval = poll_interval
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_attempts = max_attempts
+        spec = client.providers[provider]
+        # Batch lines name the endpoint path; the Batch API lives next to chat/completions
+        self.endpoint = urlparse(spec.url).path
+        base_url = spec.url[:-len("/chat/completions")] if spec.url.endswith("/chat/completions") else spec.url
+        self.api = api or BatchAPI(base_url, spec.key(client.api_key))
+        self.counters = {"prepared": 0, "cache_hits": 0, "written": 0, "failed": 0, "shards": 0}
+        self.counter_lock = threading.Lock()
+
+    def _count(self, name, increment=1):
+        with self.counter_lock:
+            self.counters[name] += increment
+
+    # --- prepare -------------------------------------------------------------------------------
+
+    def _prepare_one(self, filename):
+        processor = self.processor
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            image = processor.encode_optimized_image(os.path.join(processor.input_directory, filename))
+            if not image:
+                return
+            body, cache_key, cached = self.client.prepare_vision_request(
+                image, "Extract text from this image", processor.json_template, processor.system_prompt)
+        else:
+            text = processor.resume_text(filename)
+            if text is None:
+                return
+            body, cache_key, cached = self.client.prepare_request(
+                self.provider, processor.system_prompt, processor.user_prompt, processor.json_template, text)
+        if cached is not None:
+            self._count("cache_hits")
+            processor.write_output_file(filename, cached)
+            return
+        body.pop("stream", None)
+        self.state.execute("INSERT INTO jobs (filename, body, cache_key, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                           (filename, json.dumps(body, ensure_ascii=False), cache_key, JOB_QUEUED, time.time()))
+        self._count("prepared")
+
+    def prepare(self, filenames):
+        """Run all local work for files that are not already queued or in a submitted batch."""
+        active = self.state.active_files()
+        pending = [f for f in filenames if f not in active]
+        if len(pending) < len(filenames):
+            logging.info(f"Batch: {len(filenames) - len(pending)} files are already queued or submitted.")
+        start_time = time.time()
+        self.processor.warm_pdf_workers(pending)
+
+        def prepare_safely(filename):
+            try:
+                self._prepare_one(filename)
+            except Exception as e:
+                logging.error(f"Batch: could not prepare {filename}: {e}")
+
+        with ThreadPoolExecutor(max_workers=self.processor.workers) as executor:
+            list(executor.map(prepare_safely, pending))
+        logging.info(f"Batch: prepared {self.counters['prepared']} requests ({self.counters['cache_hits']} answered "
+                     f"from cache) in {time.time() - start_time:.2f} seconds.")
+
+    # --- submit --------------------------------------------------------------------------------
+
+    def _write_shard(self):
+        """Move the next queued jobs into a new JSONL shard; returns its name, or None if nothing is queued."""
+        name = f"shard-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.work_dir, f"{name}.jsonl")
+        taken = []
+        size = 0
+        with self.state.lock:
+            rows = self.state.conn.execute("SELECT id, body FROM jobs WHERE status = ? ORDER BY id LIMIT ?",
+                                           (JOB_QUEUED, self.max_requests)).fetchall()
+        if not rows:
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            for job_id, body in rows:
+                line = json.dumps({"custom_id": f"job-{job_id}", "method": "POST", "url": self.endpoint,
+                                   "body": json.loads(body)}, ensure_ascii=False) + "\n"
+                if taken and size + len(line.encode("utf-8")) > self.max_bytes:
+                    break
+                f.write(line)
+                size += len(line.encode("utf-8"))
+                taken.append(job_id)
+        with self.state.lock, self.state.conn:
+            self.state.conn.execute("INSERT INTO shards (name, path, status, updated_at) VALUES (?, ?, ?, ?)",
+                                    (name, path, SHARD_WRITTEN, time.time()))
+            self.state.conn.executemany("UPDATE jobs SET shard = ?, status = ?, attempts = attempts + 1, updated_at = ? "
+                                        "WHERE id = ?", [(name, JOB_SUBMITTED, time.time(), job_id) for job_id in taken])
+        logging.info(f"Batch: wrote {len(taken)} requests ({size / 1e6:.1f} MB) to {path}")
+        return name
+
+    def _submit_shard(self, name):
+        """Upload and submit a written shard, picking up wherever an earlier run stopped."""
+        path, input_file_id, status = self.state.execute(
+            "SELECT path, input_file_id, status FROM shards WHERE name = ?", (name,))[0]
+        if status == SHARD_WRITTEN:
+            input_file_id = self.api.upload(path)
+            self.state.execute("UPDATE shards SET input_file_id = ?, status = ?, updated_at = ? WHERE name = ?",
+                               (input_file_id, SHARD_UPLOADED, time.time(), name))
+        # A batch created just before an interruption is found by its metadata instead of created twice
+        batch = self.api.find("shard", name) if status == SHARD_UPLOADED else None
+        if batch is None:
+            batch = self.api.create(input_file_id, self.endpoint, {"shard": name})
+        self.state.execute("UPDATE shards SET batch_id = ?, status = ?, updated_at = ? WHERE name = ?",
+                           (batch["id"], SHARD_SUBMITTED, time.time(), name))
+        self._count("shards")
+        logging.info(f"Batch: submitted {name} as {batch['id']}")
+
+    def submit(self):
+        for (name,) in self.state.execute("SELECT name FROM shards WHERE status IN (?, ?)", (SHARD_WRITTEN, SHARD_UPLOADED)):
+            self._submit_shard(name)
+        while True:
+            name = self._write_shard()
+            if name is None:
+                return
+            self._submit_shard(name)
+
+    # --- collect -------------------------------------------------------------------------------
+
+    def _handle_line(self, line, jobs):
+        record = json.loads(line)
+        job = jobs.get(record.get("custom_id"))
+        if job is None:
+            return None
+        job_id, filename, cache_key = job
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            error = record.get("error") or response.get("body", {}).get("error")
+            logging.warning(f"Batch: request for {filename} failed: {error}")
+            return None
+        content = response["body"]["choices"][0]["message"]["content"]
+        if cache_key:
+            self.client.store_answer(cache_key, content)
+        output_path = self.processor.write_output_file(filename, content)
+        self.state.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                           (JOB_DONE if output_path else JOB_FAILED, time.time(), job_id))
+        self._count("written" if output_path else "failed")
+        return job_id
+
+    def _collect(self, name, batch):
+        rows = self.state.execute("SELECT id, filename, cache_key FROM jobs WHERE shard = ? AND status = ?",
+                                  (name, JOB_SUBMITTED))
+        jobs = {f"job-{row[0]}": row for row in rows}
+        answered = set()
+        for key in ("output_file_id", "error_file_id"):
+            if not batch.get(key):
+                continue
+            path = self.api.download(batch[key], os.path.join(self.work_dir, f"{name}.{key.split('_')[0]}.jsonl"))
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        answered.add(self._handle_line(line, jobs))
+
+        # Errored requests and those an expired/failed batch never ran go back in the queue
+        retry, give_up = [], []
+        for custom_id, (job_id, filename, _) in jobs.items():
+            if job_id in answered:
+                continue
+            attempts = self.state.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,))[0][0]
+            (retry if attempts < self.max_attempts else give_up).append((job_id, filename))
+        with self.state.lock, self.state.conn:
+            self.state.conn.executemany("UPDATE jobs SET status = ?, shard = NULL, updated_at = ? WHERE id = ?",
+                                        [(JOB_QUEUED, time.time(), job_id) for job_id, _ in retry])
+            self.state.conn.executemany("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                                        [(JOB_FAILED, time.time(), job_id) for job_id, _ in give_up])
+            self.state.conn.execute("UPDATE shards SET status = ?, updated_at = ? WHERE name = ?",
+                                    (SHARD_COLLECTED, time.time(), name))
+        manifest = self.processor.manifest
+        for _, filename in give_up:
+            logging.error(f"Batch: giving up on {filename} after {self.max_attempts} attempts")
+            if manifest is not None:
+                manifest.record(os.path.join(self.processor.input_directory, filename), None, STATUS_FAILED)
+        self._count("failed", len(give_up))
+        logging.info(f"Batch: collected {name} ({batch['status']}): {len(answered - {None})} answers, "
+                     f"{len(retry)} requeued, {len(give_up)} failed")
+        return len(retry)
+
+    def wait(self):
+        """Poll submitted batches until all are collected; returns the number of requests requeued."""
+        requeued = 0
+        while True:
+            shards = self.state.execute("SELECT name, batch_id FROM shards WHERE status = ?", (SHARD_SUBMITTED,))
+            if not shards:
+                return requeued
+            for name, batch_id in shards:
+                batch = self.api.get(batch_id)
+                if batch["status"] in TERMINAL_STATUSES:
+                    requeued += self._collect(name, batch)
+                else:
+                    counts = batch.get("request_counts") or {}
+                    logging.info(f"Batch: {batch_id} {batch['status']} "
+                                 f"({counts.get('completed', 0)}/{counts.get('total', '?')} done)")
+            if self.state.execute("SELECT 1 FROM shards WHERE status = ? LIMIT 1", (SHARD_SUBMITTED,)):
+                time.sleep(self.poll_interval)
+
+    def run(self, filenames):
+        start_time = time.time()
+        try:
+            self.prepare(filenames)
+            while True:
+                self.submit()
+                if not self.wait():
+                    break
+        except KeyboardInterrupt:
+            logging.warning("Batch: interrupted; run again with --batch to resume.")
+            raise
+        finally:
+            logging.info(f"Batch: {self.counters} in {time.time() - start_time:.2f} seconds.")
+
+    def close(self):
+        self.api.close()
+        self.state.close()
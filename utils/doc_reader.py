@@ -0,0 +1,287 @@
+import re
+import struct
+
+# Reads the text of Word 97-2003 .doc files straight from the compound file (OLE2/CFB)
+# container: FIB -> CLX -> piece table -> text runs in the WordDocument stream.
+# References: [MS-CFB] and [MS-DOC].
+
+CFB_SIGNATURE = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"
+FREE_SECTOR = 0xFFFFFFFF
+END_OF_CHAIN = 0xFFFFFFFE
+
+WORD_IDENT = 0xA5EC
+# Word 97 and later write nFib >= 0x00C0; Word 6/95 files (0x0065-0x0069) use a different FIB layout
+MIN_NFIB = 0x00C0
+
+# FIB.flags bits
+F_ENCRYPTED = 0x0100
+F_WHICH_TBL_STM = 0x0200
+
+# Index of fcClx/lcbClx within FibRgFcLcb97 (pairs of uint32)
+CLX_PAIR_INDEX = 33
+
+# FibRgLw97 text lengths (in characters), in the order their text is laid out in CP space
+CCP_FIELDS = ("ccpText", "ccpFtn", "ccpHdd", "ccpMcr", "ccpAtn", "ccpEdn", "ccpTxbx", "ccpHdrTxbx")
+# Main text, headers/footers, endnotes and text boxes; footnote markers and comments are left out
+EXTRACTED_PARTS = ("ccpText", "ccpHdd", "ccpEdn", "ccpTxbx", "ccpHdrTxbx")
+
+# Word special characters that stand for a picture or drawn object in the text stream
+OBJECT_CHARS = "\x01\x08"
+
+_TRANSLATE = {
+    ord("\r"): "\n",     # paragraph mark
+    ord("\x0b"): "\n",   # manual line break
+    ord("\x0c"): "\n",   # page / section break
+    ord("\x0e"): "\n",   # column break
+    ord("\x07"): "\t",   # table cell / row mark
+    ord("\x1e"): "-",    # non-breaking hyphen
+    ord("\x1f"): None,   # optional hyphen
+    ord("\x01"): None,
+    ord("\x02"): None,   # auto-numbered footnote reference
+    ord("\x05"): None,   # annotation reference
+    ord("\x08"): None,
+}
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class DocFormatError(ValueError):
+    """The file is not a .doc this reader can handle (not CFB, encrypted, pre-Word 97, damaged)."""
+
+
+class CompoundFile:
+    """Minimal read-only [MS-CFB] reader: enough to fetch named streams from the root storage."""
+
+    def __init__(self, data):
+        if data[:8] != CFB_SIGNATURE:
+            raise DocFormatError("not an OLE2 compound file")
+        self.data = data
+        (self.sector_shift, self.mini_sector_shift) = struct.unpack_from("<HH", data, 0x1E)
+        self.sector_size = 1 << self.sector_shift
+        self.mini_sector_size = 1 << self.mini_sector_shift
+        (fat_sectors, first_dir, _, self.mini_cutoff, first_minifat, minifat_sectors,
+         first_difat, difat_sectors) = struct.unpack_from("<IIIIIIII", data, 0x2C)
+
+        # The FAT's own sector ids: 109 in the header, the rest in a chain of DIFAT sectors
+        fat_ids = list(struct.unpack_from("<109I", data, 0x4C))
+        per_difat = self.sector_size // 4 - 1
+        sid = first_difat
+        for _ in range(difat_sectors):
+            if sid in (FREE_SECTOR, END_OF_CHAIN):
+                break
+            entries = struct.unpack_from(f"<{per_difat + 1}I", data, self._offset(sid))
+            fat_ids.extend(entries[:-1])
+            sid = entries[-1]
+        fat_ids = [s for s in fat_ids[:fat_sectors] if s not in (FREE_SECTOR, END_OF_CHAIN)]
+        per_sector = self.sector_size // 4
+        fat = []
+        for sid in fat_ids:
+            fat.extend(struct.unpack_from(f"<{per_sector}I", data, self._offset(sid)))
+        self.fat = fat
+
+        # Only streams directly under the root storage; embedded objects carry their own CompObj etc.
+        directory = self._read_chain(first_dir, self.fat, self.sector_size, self._sector)
+        records = []
+        for offset in range(0, len(directory) - 127, 128):
+            entry = directory[offset:offset + 128]
+            name_length, entry_type = struct.unpack_from("<HB", entry, 64)
+            left, right, child = struct.unpack_from("<III", entry, 68)
+            start, size = struct.unpack_from("<IQ", entry, 116)
+            if self.sector_size == 512:
+                size &= 0xFFFFFFFF  # version 3 files may leave garbage in the high dword
+            name = entry[:max(0, min(name_length, 64) - 2)].decode("utf-16-le", "replace")
+            records.append((name, entry_type, left, right, child, start, size))
+        root = records[0] if records and records[0][1] == 5 else None
+        self.entries = {}
+        if root is not None:
+            pending = [root[4]]
+            visited = set()
+            while pending:
+                index = pending.pop()
+                if index >= len(records) or index in visited or records[index][1] == 0:
+                    continue
+                visited.add(index)
+                name, entry_type, left, right, _, start, size = records[index]
+                if entry_type == 2:
+                    self.entries[name] = (start, size)
+                pending.extend((left, right))
+        if root is None:
+            raise DocFormatError("compound file has no root entry")
+
+        self.minifat = []
+        if minifat_sectors and first_minifat != END_OF_CHAIN:
+            raw = self._read_chain(first_minifat, self.fat, self.sector_size, self._sector)
+            self.minifat = list(struct.unpack(f"<{len(raw) // 4}I", raw[:len(raw) // 4 * 4]))
+        self.mini_stream = self._read_chain(root[5], self.fat, self.sector_size, self._sector)[:root[6]]
+
+    def _offset(self, sid):
+        return (sid + 1) << self.sector_shift
+
+    def _sector(self, sid):
+        offset = self._offset(sid)
+        return self.data[offset:offset + self.sector_size]
+
+    def _mini_sector(self, sid):
+        offset = sid * self.mini_sector_size
+        return self.mini_stream[offset:offset + self.mini_sector_size]
+
+    @staticmethod
+    def _read_chain(start, table, sector_size, read_sector):
+        chunks = []
+        sid = start
+        seen = 0
+        while sid not in (END_OF_CHAIN, FREE_SECTOR):
+            if sid >= len(table) or seen > len(table):
+                raise DocFormatError("broken sector chain")
+            chunks.append(read_sector(sid))
+            sid = table[sid]
+            seen += 1
+        return b"".join(chunks)
+
+    def stream(self, name):
+        if name not in self.entries:
+            raise DocFormatError(f"missing stream {name}")
+        start, size = self.entries[name]
+        if size < self.mini_cutoff:
+            data = self._read_chain(start, self.minifat, self.mini_sector_size, self._mini_sector)
+        else:
+            data = self._read_chain(start, self.fat, self.sector_size, self._sector)
+        return data[:size]
+
+
+class DocText:
+    def __init__(self, text, object_count):
+        self.text = text
+        # Pictures / drawn objects anchored in the text; an image-only resume has these and no text
+        self.object_count = object_count
+
+
+def _read_fib(word):
+    ident, nfib = struct.unpack_from("<HH", word, 0)
+    if ident != WORD_IDENT:
+        raise DocFormatError("WordDocument stream has no Word FIB")
+    if nfib < MIN_NFIB:
+        raise DocFormatError(f"pre-Word 97 file (nFib {nfib:#x})")
+    flags = struct.unpack_from("<H", word, 0x0A)[0]
+    if flags & F_ENCRYPTED:
+        raise DocFormatError("document is encrypted")
+
+    offset = 32
+    csw = struct.unpack_from("<H", word, offset)[0]
+    offset += 2 + csw * 2
+    cslw = struct.unpack_from("<H", word, offset)[0]
+    lw = struct.unpack_from(f"<{cslw}i", word, offset + 2)
+    if len(lw) < 3 + len(CCP_FIELDS):
+        raise DocFormatError("FIB has no text lengths")
+    offset += 2 + cslw * 4
+    cb_rg_fc_lcb = struct.unpack_from("<H", word, offset)[0]
+    if cb_rg_fc_lcb <= CLX_PAIR_INDEX:
+        raise DocFormatError("FIB too short")
+    fc_clx, lcb_clx = struct.unpack_from("<II", word, offset + 2 + CLX_PAIR_INDEX * 8)
+    # FibRgLw97: cbMac, lProductCreated, lProductRevised, then the ccp* fields
+    ccps = dict(zip(CCP_FIELDS, (max(0, n) for n in lw[3:3 + len(CCP_FIELDS)])))
+    table_name = "1Table" if flags & F_WHICH_TBL_STM else "0Table"
+    return table_name, fc_clx, lcb_clx, ccps
+
+
+def _piece_table(clx):
+    """Return [(cp_start, cp_end, fc, compressed)] from a Clx structure."""
+    pos = 0
+    while pos < len(clx) and clx[pos] == 0x01:  # Prc: skip property modifiers
+        pos += 3 + struct.unpack_from("<h", clx, pos + 1)[0]
+    if pos >= len(clx) or clx[pos] != 0x02:
+        raise DocFormatError("CLX has no piece table")
+    lcb = struct.unpack_from("<I", clx, pos + 1)[0]
+    plc = clx[pos + 5:pos + 5 + lcb]
+    count = (lcb - 4) // 12
+    if count <= 0 or len(plc) < lcb:
+        raise DocFormatError("empty or truncated piece table")
+    cps = struct.unpack_from(f"<{count + 1}I", plc, 0)
+    pieces = []
+    for i in range(count):
+        fc_raw = struct.unpack_from("<I", plc, (count + 1) * 4 + i * 8 + 2)[0]
+        compressed = bool(fc_raw & 0x40000000)
+        fc = fc_raw & 0x3FFFFFFF
+        pieces.append((cps[i], cps[i + 1], fc // 2 if compressed else fc, compressed))
+    return pieces
+
+
+def _text_for_range(word, pieces, cp_start, cp_end):
+    out = []
+    for piece_start, piece_end, fc, compressed in pieces:
+        start, end = max(cp_start, piece_start), min(cp_end, piece_end)
+        if start >= end:
+            continue
+        if compressed:
+            offset = fc + (start - piece_start)
+            out.append(word[offset:offset + end - start].decode("cp1252", "replace"))
+        else:
+            offset = fc + (start - piece_start) * 2
+            out.append(word[offset:offset + (end - start) * 2].decode("utf-16-le", "replace"))
+    return "".join(out)
+
+
+def _strip_fields(text):
+    """Keep field results, drop field instructions: {0x13 instr 0x14 result 0x15} -> result."""
+    if "\x13" not in text:
+        return text
+    out = []
+    # One flag per open field: True while still inside its instruction part
+    stack = []
+    for ch in text:
+        if ch == "\x13":
+            stack.append(True)
+        elif ch == "\x14":
+            if stack:
+                stack[-1] = False
+        elif ch == "\x15":
+            if stack:
+                stack.pop()
+        elif not any(stack):
+            out.append(ch)
+    return "".join(out)
+
+
+def _clean(text):
+    text = _strip_fields(text).translate(_TRANSLATE)
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def extract_doc_text(source):
+    """Extract the text of a Word 97-2003 .doc given its path or bytes.
+
+    Raises DocFormatError for files this reader cannot handle, so the caller can fall back
+    to converting the file with an office suite.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    try:
+        return _extract(data)
+    except DocFormatError:
+        raise
+    except Exception as e:
+        # Whatever a damaged or unusual file trips over, the caller falls back to conversion
+        raise DocFormatError(f"damaged document: {type(e).__name__}: {e}") from e
+
+
+def _extract(data):
+    cfb = CompoundFile(data)
+    word = cfb.stream("WordDocument")
+    table_name, fc_clx, lcb_clx, ccps = _read_fib(word)
+    table = cfb.stream(table_name)
+    pieces = _piece_table(table[fc_clx:fc_clx + lcb_clx])
+
+    parts = []
+    objects = 0
+    cp = 0
+    for field in CCP_FIELDS:
+        length = ccps[field]
+        if length and field in EXTRACTED_PARTS:
+            raw = _text_for_range(word, pieces, cp, cp + length)
+            objects += sum(raw.count(ch) for ch in OBJECT_CHARS)
+            parts.append(_clean(raw))
+        cp += length
+    return DocText("\n\n".join(part for part in parts if part), objects)
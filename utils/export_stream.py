@@ -0,0 +1,231 @@
+import binascii
+import json
+import os
+import uuid
+from base64 import b64decode
+
+# Characters read from the export per refill; together with one pending base64 quantum
+# this is the peak working set of the streaming decoder, independent of export size.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_WHITESPACE = " \t\n\r"
+
+
+class ExportFormatError(ValueError):
+    pass
+
+
+class _ListSink:
+    def __init__(self, parts):
+        self.write = parts.append
+
+
+class _JsonStream:
+    """Minimal pull parser over a JSON text file that never materializes the whole document."""
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ExportFormatError(f"Expected {char!r} but found {found!r}")
+        self.pos += 1
+
+    def read_value(self):
+        """Decode one complete JSON value: id fields, numbers, nested metadata, whole strings."""
+        if self.peek() == '"':
+            # Strings are scanned incrementally; raw_decode would rescan them on every refill
+            parts = []
+            self.stream_string(_ListSink(parts))
+            return "".join(parts)
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number running into the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def stream_string(self, sink):
+        """Feed the contents of a JSON string to sink.write() in chunks, unescaping as it goes."""
+        self.expect('"')
+        while True:
+            if self.pos >= len(self.buffer) and not self._fill():
+                raise ExportFormatError("Unterminated string")
+            buffer = self.buffer
+            quote = buffer.find('"', self.pos)
+            backslash = buffer.find('\\', self.pos)
+            stop = min(i for i in (quote, backslash, len(buffer)) if i != -1)
+            if stop > self.pos:
+                sink.write(buffer[self.pos:stop])
+                self.pos = stop
+            if stop == len(buffer):
+                continue
+            if stop == quote:
+                self.pos += 1
+                return
+            # Escape sequence: make sure all of it is buffered
+            while len(self.buffer) - self.pos < 6 and self._fill():
+                pass
+            escape = self.buffer[self.pos + 1:self.pos + 2]
+            if escape == "u":
+                sink.write(chr(int(self.buffer[self.pos + 2:self.pos + 6], 16)))
+                self.pos += 6
+            elif escape in _ESCAPES:
+                sink.write(_ESCAPES[escape])
+                self.pos += 2
+            else:
+                raise ExportFormatError(f"Invalid escape {escape!r}")
+
+
+def iter_export_items(path, stream_field="api_request", sink_factory=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the objects of a top-level JSON array one at a time.
+
+    When sink_factory is given, the string value of stream_field is never held in memory:
+    sink_factory(fields_seen_so_far) returns an object whose write() receives the value in
+    chunks, and that object is stored in the yielded dict in place of the string.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        stream = _JsonStream(file, chunk_size)
+        stream.expect("[")
+        if stream.peek() == "]":
+            return
+        while True:
+            stream.expect("{")
+            item = {}
+            if stream.peek() != "}":
+                while True:
+                    key = stream.read_value()
+                    stream.expect(":")
+                    if key == stream_field and sink_factory is not None and stream.peek() == '"':
+                        sink = sink_factory(item)
+                        stream.stream_string(sink)
+                        item[key] = sink
+                    else:
+                        item[key] = stream.read_value()
+                    if stream.peek() == ",":
+                        stream.pos += 1
+                        continue
+                    break
+            stream.expect("}")
+            yield item
+            separator = stream.peek()
+            if separator == ",":
+                stream.pos += 1
+                continue
+            stream.expect("]")
+            return
+
+
+class Base64FileSink:
+    """Decode base64 text written in arbitrary chunks straight to a temporary file.
+
+    on_head(head_bytes) is called once the first bytes are decoded (enough for magic-number
+    detection); returning False skips the rest of the item without decoding or writing it.
+    Decoding errors are recorded in .error instead of raised, so parsing can continue with
+    the next item.
+    """
+
+    HEAD_SIZE = 16
+
+    def __init__(self, directory, on_head=None):
+        self.directory = directory
+        self.on_head = on_head
+        self.pending = ""
+        self.head = b""
+        self.head_checked = False
+        self.skipped = False
+        self.error = None
+        self.size = 0
+        # Plain open() rather than tempfile, so committed files get the usual umask permissions
+        self.path = os.path.join(directory, f".partial_{uuid.uuid4().hex}")
+        self.file = open(self.path, "wb")
+
+    def _emit(self, data):
+        if not self.head_checked:
+            self.head += data[:self.HEAD_SIZE - len(self.head)]
+            if len(self.head) >= self.HEAD_SIZE:
+                self._check_head()
+            if self.skipped:
+                return
+        self.file.write(data)
+        self.size += len(data)
+
+    def _check_head(self):
+        self.head_checked = True
+        if self.on_head is not None and self.on_head(self.head) is False:
+            self.skipped = True
+            self.discard()
+
+    def write(self, text):
+        if self.skipped or self.error is not None:
+            return
+        self.pending += text
+        usable = len(self.pending) - len(self.pending) % 4
+        if not usable:
+            return
+        try:
+            self._emit(b64decode(self.pending[:usable], validate=True))
+        except (binascii.Error, ValueError) as e:
+            self.error = e
+            self.discard()
+            return
+        self.pending = self.pending[usable:]
+
+    def close(self):
+        """Flush the final quantum; after this the sink is either committed, skipped or failed."""
+        if self.skipped or self.error is not None:
+            return
+        try:
+            if self.pending:
+                self._emit(b64decode(self.pending, validate=True))
+                self.pending = ""
+            if not self.head_checked:
+                self._check_head()
+        except (binascii.Error, ValueError) as e:
+            self.error = e
+            self.discard()
+            return
+        if not self.skipped:
+            self.file.close()
+
+    def commit(self, output_path):
+        os.replace(self.path, output_path)
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
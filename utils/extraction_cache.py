@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Bump when the key layout changes so stale entries can never be returned
+CACHE_KEY_VERSION = 4
+
+# Hits whose last_access update is collected before it is written in one short transaction
+TOUCH_BATCH = 64
+
+
+def normalize_text(text):
+    """Whitespace-insensitive form of resume text, so re-exports of the same CV hash alike."""
+    return " ".join((text or "").split())
+
+
+class ExtractionCache:
+    """Persistent, size-bounded LRU cache for LLM extraction results.
+
+    Entries are keyed on a SHA-256 of everything that determines the model's answer:
+    the normalized resume text (or image bytes), system prompt, user prompt, JSON
+    template, provider, model and sampling parameters. Editing a prompt, the template or
+    a provider's model in config.py therefore produces new keys, and the old entries age
+    out through LRU eviction. The store is SQLite in WAL mode, which is safe to share between threads
+    (one connection each) and between worker processes.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        # key -> time of hits not yet written to last_access (see TOUCH_BATCH)
+        self._touched = {}
+        if self.enabled:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS entries (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )""")
+                conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                conn.execute("INSERT OR IGNORE INTO meta VALUES ('total_bytes', 0)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = _Transaction(conn)
+            conn = self._local.conn
+        return conn
+
+    @staticmethod
+    def make_key(provider, params, system_prompt, user_prompt, json_template, content):
+        """Content address for one request. content is resume text or base64 image data."""
+        digest = hashlib.sha256()
+        header = json.dumps({
+            "version": CACHE_KEY_VERSION,
+            "provider": provider,
+            "params": params,
+            "system_prompt": system_prompt,
+            "user_prompt": user_prompt,
+            "json_template": json_template,
+        }, sort_keys=True, default=str)
+        digest.update(header.encode("utf-8"))
+        digest.update(b"\0")
+        if isinstance(content, bytes):
+            digest.update(content)
+        else:
+            digest.update(normalize_text(content).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        if not self.enabled or key is None:
+            return None
+        try:
+            # A plain read (autocommit): lookups never take the write lock, so readers in every worker and
+            # process run concurrently
+            row = self._connection().conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Extraction cache read failed: {e}")
+            row = None
+        touched = None
+        with self._counter_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._touched[key] = time.time()
+                if len(self._touched) >= TOUCH_BATCH:
+                    touched, self._touched = self._touched, {}
+        if touched:
+            try:
+                with self._connection() as conn:
+                    self._touch(conn, touched)
+            except sqlite3.Error as e:
+                logging.error(f"Extraction cache write failed: {e}")
+        return row[0] if row is not None else None
+
+    def _touch(self, conn, touched):
+        """Record the last access time of recent hits, for LRU eviction."""
+        conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                         [(when, key) for key, when in touched.items()])
+
+    def _take_touched(self):
+        with self._counter_lock:
+            touched, self._touched = self._touched, {}
+        return touched
+
+    def put(self, key, value):
+        if not self.enabled or key is None or value is None:
+            return
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                # Pending hits are written first, so eviction sees them
+                self._touch(conn, self._take_touched())
+                old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+                conn.execute("UPDATE meta SET value = value + ? WHERE name = 'total_bytes'", (size - (old[0] if old else 0),))
+                evicted = self._evict(conn)
+        except sqlite3.Error as e:
+            logging.error(f"Extraction cache write failed: {e}")
+            return
+        with self._counter_lock:
+            self.stores += 1
+            self.evictions += evicted
+
+    def delete(self, key):
+        """Drop one entry (an answer found to be unusable), so it is never served again."""
+        if not self.enabled or key is None:
+            return
+        try:
+            with self._connection() as conn:
+                row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.execute("UPDATE meta SET value = value - ? WHERE name = 'total_bytes'", (row[0],))
+        except sqlite3.Error as e:
+            logging.error(f"Extraction cache delete failed: {e}")
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        total = conn.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while total > target:
+            rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT 256").fetchall()
+            if not rows:
+                break
+            victims, freed = [], 0
+            for key, size in rows:
+                if total - freed <= target:
+                    break
+                victims.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+            conn.execute("UPDATE meta SET value = value - ? WHERE name = 'total_bytes'", (freed,))
+            total -= freed
+            evicted += len(victims)
+        return evicted
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+    def flush(self):
+        """Write the last access time of hits still held in memory."""
+        touched = self._take_touched()
+        if not self.enabled or not touched:
+            return
+        try:
+            with self._connection() as conn:
+                self._touch(conn, touched)
+        except sqlite3.Error as e:
+            logging.error(f"Extraction cache write failed: {e}")
+
+    def log_stats(self):
+        self.flush()
+        if self.enabled:
+            logging.info(f"Extraction cache stats: {self.stats()}")
+
+
+class _Transaction:
+    """Wrap a sqlite3 connection so `with` runs an IMMEDIATE transaction (writer lock up front)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
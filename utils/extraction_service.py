@@ -0,0 +1,426 @@
+import binascii
+import collections
+import email.parser
+import email.policy
+import importlib
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from base64 import b64decode
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.util import Finalize
+from urllib.parse import urlparse
+
+from base64_decoder import determine_file_type
+
+# Warm worker processes; each handles one upload at a time
+DEFAULT_WORKERS = 4
+
+# Uploads accepted beyond the ones being processed; further uploads are answered 429 at once
+DEFAULT_QUEUE_SIZE = 16
+
+# Seconds a request waits for its result before it is answered 504
+DEFAULT_REQUEST_TIMEOUT = 300
+
+DEFAULT_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Suggested by Retry-After on 429 answers
+RETRY_AFTER_SECONDS = 1
+
+# Connections handled at once beyond the upload capacity (health checks, quick 429s); further connections
+# are answered 429 by the accepting thread without starting a handler
+CONNECTION_HEADROOM = 16
+
+# Bodies of refused requests up to this size are read and dropped, keeping the connection open; larger
+# ones are never read and the connection is closed
+DRAIN_LIMIT = 64 * 1024
+
+# Seconds a connection may sit idle (keep-alive, or a stalled upload) before its handler thread gives up
+CONNECTION_TIMEOUT = 30
+
+# Latencies kept for the /health percentiles
+LATENCY_WINDOW = 1000
+
+# Imported by every worker before it takes requests, so no request pays for them
+PRELOAD_MODULES = ("fitz", "docx2txt", "PIL.Image", "openai")
+
+SUPPORTED_TYPES = ("pdf", "docx", "doc", "jpg", "png")
+
+# FileProcessor of this worker process, built by _init_worker
+_processor = None
+
+
+def _init_worker(worker_factory):
+    global _processor
+    # Ctrl+C is handled by the service, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    _processor = worker_factory()
+    # Open the provider client (and its connection pool) now instead of on the first upload
+    try:
+        _processor.client.client
+    except Exception as e:
+        logging.warning(f"Could not start the LLM client in worker {os.getpid()}: {str(e)}")
+    # Pool workers leave through os._exit, so atexit would never stop the office instances
+    Finalize(_processor, _processor.close, exitpriority=10)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _extract(name, data, file_type):
+    return _processor.extract_bytes(name, data, file_type)
+
+
+class UploadError(Exception):
+    """An upload the service refuses; status is the HTTP status it is answered with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_upload(content_type, body):
+    """(id, bytes, filename or None) from a JSON {"id", "api_request"} body or a multipart "file" field."""
+    if (content_type or "").startswith("multipart/form-data"):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+        if not message.is_multipart():
+            raise UploadError(400, "malformed multipart body")
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        if "file" not in fields:
+            raise UploadError(400, "multipart body has no 'file' field")
+        upload = fields["file"]
+        upload_id = fields["id"].get_content().strip() if "id" in fields else None
+        return upload_id, upload.get_payload(decode=True) or b"", upload.get_filename()
+    try:
+        request = json.loads(body)
+    except ValueError:
+        raise UploadError(400, "body is neither JSON nor multipart/form-data")
+    if not isinstance(request, dict) or not isinstance(request.get("api_request"), str):
+        raise UploadError(400, "JSON body needs an 'api_request' Base64 string")
+    try:
+        data = b64decode(request["api_request"].encode("utf-8"), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise UploadError(400, f"invalid Base64 in 'api_request': {e}")
+    upload_id = request.get("id")
+    return None if upload_id is None else str(upload_id), data, None
+
+
+class ExtractionService:
+    """Resident extraction service (main.py --serve): uploads in, resume JSON out, nothing written to disk.
+
+    worker_factory() runs once in each of the worker processes and returns the FileProcessor that
+    handles that worker's uploads, so parsers, the LLM client and its connection pool stay warm
+    between requests. At most workers + queue_size uploads are accepted at a time; the rest are
+    answered 429 straight away instead of waiting in an unbounded queue, which keeps the latency
+    of accepted requests at what the workers can sustain. The slot is taken before the body is
+    read, so rejected uploads never occupy memory, and at most max_connections connections get a
+    handler thread at once.
+
+        POST /extract   {"id": ..., "api_request": "<Base64>"} or multipart/form-data with a "file" field
+        GET  /health    capacity, counters and latency percentiles
+    """
+
+    def __init__(self, worker_factory, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT, max_upload_bytes=DEFAULT_MAX_UPLOAD_BYTES,
+                 max_connections=None):
+        self.worker_factory = worker_factory
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.max_connections = max_connections or self.capacity + CONNECTION_HEADROOM
+        self.request_timeout = request_timeout
+        self.max_upload_bytes = max_upload_bytes
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self.executor = None
+        self.executor_lock = threading.Lock()
+        self.httpd = None
+        self.counters = {"in_flight": 0, "completed": 0, "rejected": 0, "failed": 0}
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+
+    def _count(self, **counters):
+        with self.lock:
+            for name, increment in counters.items():
+                self.counters[name] += increment
+
+    def start(self):
+        """Start the workers and wait until every one of them is ready."""
+        with self.executor_lock:
+            self._start_workers()
+
+    def _start_workers(self):
+        start_time = time.time()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.worker_factory,))
+        # One ping per worker forces all of them to start (and finish their initializer) up front
+        pids = {future.result() for future in [self.executor.submit(_ping) for _ in range(self.workers)]}
+        logging.info(f"Started {len(pids)} extraction workers in {time.time() - start_time:.2f} seconds.")
+
+    def _submit(self, *args):
+        executor = self.executor
+        try:
+            return executor.submit(*args)
+        except BrokenProcessPool:
+            with self.executor_lock:
+                if self.executor is executor:
+                    logging.error("An extraction worker died, restarting the worker pool.")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._start_workers()
+            return self.executor.submit(*args)
+
+    def reserve(self):
+        """Take an upload slot; False (counted as rejected) if the service is at capacity."""
+        if not self.slots.acquire(blocking=False):
+            self._count(rejected=1)
+            return False
+        self._count(in_flight=1)
+        return True
+
+    def submit(self, name, data, file_type):
+        """Future of the validated JSON text; takes over a slot taken with reserve()."""
+        try:
+            future = self._submit(_extract, name, data, file_type)
+        except BaseException:
+            self._release(None)
+            raise
+        # A slot is held until the worker is done, even if the client stopped waiting
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        self._count(in_flight=-1)
+        self.slots.release()
+
+    def extract(self, upload_id, data, filename=None, reserved=False):
+        """(HTTP status, response body) for one upload; reserved: the caller already holds a slot (reserve())."""
+        start = time.perf_counter()
+        if not reserved and not self.reserve():
+            return 429, {"error": "extraction queue is full, retry later"}
+        if len(data) > self.max_upload_bytes:
+            self._release(None)
+            return 413, {"error": f"upload larger than {self.max_upload_bytes} bytes"}
+        try:
+            file_type = determine_file_type(data)
+        except BaseException:
+            self._release(None)
+            raise
+        if file_type not in SUPPORTED_TYPES:
+            self._release(None)
+            return 415, {"error": "unsupported file type, expected PDF, DOCX, DOC, JPEG or PNG"}
+        if upload_id is None and filename:
+            upload_id = os.path.splitext(os.path.basename(filename))[0]
+        name = f"file_{upload_id or 'upload'}.{file_type}"
+
+        try:
+            # The slot is released by submit() if queueing fails, else when the worker is done
+            future = self.submit(name, data, file_type)
+        except Exception as e:
+            self._count(failed=1)
+            logging.error(f"Could not queue {name}: {str(e)}")
+            return 503, {"error": "extraction workers unavailable, retry later"}
+        try:
+            content = future.result(timeout=self.request_timeout)
+        except FutureTimeoutError:
+            self._count(failed=1)
+            return 504, {"error": f"no result within {self.request_timeout} seconds"}
+        except BrokenProcessPool:
+            # The pool is replaced by the next submit
+            self._count(failed=1)
+            logging.error(f"The worker extracting {name} died.")
+            return 503, {"error": "extraction worker died, retry later"}
+        except Exception as e:
+            self._count(failed=1)
+            logging.error(f"Error extracting {name}: {str(e)}")
+            return 500, {"error": "extraction failed"}
+        if content is None:
+            self._count(failed=1)
+            return 422, {"error": "no resume information could be extracted"}
+
+        seconds = time.perf_counter() - start
+        with self.lock:
+            self.counters["completed"] += 1
+            self.latencies.append(seconds)
+        try:
+            content = json.loads(content)
+        except ValueError:
+            pass
+        return 200, {"id": upload_id, "file_type": file_type, "data": content, "seconds": round(seconds, 3)}
+
+    def health(self):
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = sorted(self.latencies)
+        stats.update(workers=self.workers, capacity=self.capacity, max_connections=self.max_connections)
+        if latencies:
+            stats["p50_seconds"] = round(latencies[len(latencies) // 2], 3)
+            stats["p99_seconds"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3)
+        return stats
+
+    def serve(self, host, port):
+        """Serve until interrupted; workers are started before the first connection is accepted."""
+        self.start()
+        self.httpd = BoundedHTTPServer((host, port), ServiceHandler, self.max_connections)
+        self.httpd.service = self
+        logging.info(f"Extraction service listening on http://{host}:{self.httpd.server_address[1]}")
+        self.httpd.serve_forever()
+
+    def close(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+        logging.info(f"Extraction service: {self.health()}")
+
+
+class BoundedHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with at most max_connections handler threads.
+
+    A connection beyond that is answered 429 by the accepting thread and closed, so a burst never
+    starts an unbounded number of threads, and the accept loop never blocks (shutdown stays prompt).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, max_connections):
+        self.connection_slots = threading.BoundedSemaphore(max(1, max_connections))
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        if not self.connection_slots.acquire(blocking=False):
+            self._reject(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self.connection_slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connection_slots.release()
+
+    def _reject(self, request):
+        service = getattr(self, "service", None)
+        if service is not None:
+            service._count(rejected=1)
+        payload = b'{"error": "too many connections, retry later"}'
+        try:
+            request.settimeout(1)
+            request.sendall(b"HTTP/1.1 429 Too Many Requests\r\nContent-Type: application/json\r\n"
+                            b"Content-Length: %d\r\nRetry-After: %d\r\nConnection: close\r\n\r\n"
+                            % (len(payload), RETRY_AFTER_SECONDS) + payload)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections and stalled uploads give their thread back
+    timeout = CONNECTION_TIMEOUT
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, self.server.service.health())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _refuse(self, status, message, length=None, headers=None):
+        """Answer without taking the upload: a small body is read and dropped so the connection stays usable,
+        a large one is never read and the connection is closed instead."""
+        if length is not None and 0 <= length <= DRAIN_LIMIT and not self.expect_continue:
+            self.rfile.read(length)
+        else:
+            self.close_connection = True
+        self._send_json(status, {"error": message}, headers)
+
+    def _admit(self):
+        """Check path, size and capacity before any of the body is read; returns its length with an upload
+        slot reserved, or None once the request has been refused."""
+        if self.reserved is not None:
+            return self.reserved
+        service = self.server.service
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            self._refuse(411, "Content-Length required")
+            return None
+        if urlparse(self.path).path != "/extract":
+            self._refuse(404, "not found", length)
+            return None
+        # Base64 is a third larger than the file it carries, multipart adds a little framing
+        if length < 0 or length > service.max_upload_bytes * 4 // 3 + 64 * 1024:
+            self._refuse(413, f"upload larger than {service.max_upload_bytes} bytes")
+            return None
+        if not service.reserve():
+            self._refuse(429, "extraction queue is full, retry later", length,
+                         {"Retry-After": str(RETRY_AFTER_SECONDS)})
+            return None
+        self.reserved = length
+        return length
+
+    def handle_expect_100(self):
+        # Clients sending "Expect: 100-continue" (curl does for large uploads) are refused before they send the body
+        self.expect_continue = True
+        if self._admit() is None:
+            return False
+        try:
+            return super().handle_expect_100()
+        except BaseException:
+            self.server.service._release(None)
+            raise
+
+    def handle_one_request(self):
+        self.reserved = None
+        self.expect_continue = False
+        super().handle_one_request()
+
+    def do_POST(self):
+        service = self.server.service
+        length = self._admit()
+        if length is None:
+            return
+        try:
+            body = self.rfile.read(length)
+            upload_id, data, filename = parse_upload(self.headers.get("Content-Type"), body)
+        except UploadError as e:
+            service._release(None)
+            self._send_json(e.status, {"error": str(e)})
+            return
+        except BaseException:
+            service._release(None)
+            raise
+        del body
+        self.reserved = None
+        status, response = service.extract(upload_id, data, filename, reserved=True)
+        self._send_json(status, response)
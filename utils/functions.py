@@ -1,18 +1,33 @@
 import os
 import logging
-import requests
-import pdfplumber
 import base64
-import openai
 import time
-from PIL import Image
 from io import BytesIO
-import fitz  # PyMuPDF
 import io
-import subprocess
+import shutil
+import tempfile
 from zipfile import ZipFile
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 import platform
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from utils.rate_limiter import TokenBucket
+from utils.extraction_cache import ExtractionCache
+from utils.manifest import STATUS_DONE, STATUS_FAILED
+from utils import pdf_text
+from utils.page_images import PageImageBudget, pdf_page_images, pdf_pages_with_graphics, docx_images
+from utils.image_optimizer import ImageOptimizer
+from utils.office_pool import OfficeConversionPool
+from utils.doc_reader import extract_doc_text, DocFormatError
+from utils.prompt_compaction import PromptCompactor, build_user_message, compact_template, estimate_tokens, RESPONSE_INSTRUCTION
+from utils.http_pool import PooledTransport, build_httpx_client, response_text, DEFAULT_POOL_SIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from utils.json_repair import OutputValidator, parse_lenient
+from utils.resilience import ResilientCaller, ProviderError, check_cancelled, until_cancelled
+from utils.providers import build_registry
+from utils.packing import build_packed_message
+from utils.streaming import JsonStreamGuard, iter_sse_deltas, consume_stream, DEFAULT_MAX_RESPONSE_CHARS
+from utils.tracing import NULL_TRACER
+from utils.output_sink import FileSink
 
 if platform.system() == "Windows":
     try:
@@ -20,8 +35,28 @@ if platform.system() == "Windows":
     except ImportError:
         print("pywin32 is not installed. Install it using: pip install pywin32")
 
+
+# Requests per minute used when no explicit limit is configured for a provider
+DEFAULT_RATE_LIMIT_RPM = 60
+
+# Scanned pages inside a digital PDF are transcribed, not extracted: their plain text joins the text layer
+# of the other pages before the one extraction request
+SCANNED_PAGES_SYSTEM_PROMPT = "You transcribe images of document pages to plain text."
+SCANNED_PAGES_PROMPT = ("Transcribe all text on these resume pages in reading order, one line per line of text. "
+                        "Do not summarise or restructure it.")
+SCANNED_PAGES_TEMPLATE = {"text": ""}
+
+
+def cacheable(content):
+    """True if an answer may be cached: it parses (leniently) to a JSON object, or an array for packed answers."""
+    return content is not None and isinstance(parse_lenient(content)[0], (dict, list))
+
+
 class OpenAIClient:
-    def __init__(self, api_key, image_api_key):
+    def __init__(self, api_key, image_api_key, rate_limits=None, provider_urls=None, max_rate_limit_retries=5,
+                 pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, http2=False, cache=None, streaming=False,
+                 max_response_chars=DEFAULT_MAX_RESPONSE_CHARS, providers=None, tracer=None):
         start_time = time.time()
         if api_key is None:
             raise ValueError("OpenAI API key is not set.")
@@ -29,113 +64,370 @@ class OpenAIClient:
             raise ValueError("image_api_key is not set.")
         self.api_key = api_key
         self.image_api_key = image_api_key
-        self.client = openai.Client(api_key=self.image_api_key)
-        logging.info(f"Initialized OpenAIClient in {time.time() - start_time:.2f} seconds.")
-
+        # The openai SDK is only needed by call_gpt4o and takes longer to import than most runs spend on
+        # text files, so the client is created on first use (see the client property)
+        self._client = None
+        self._client_options = (pool_size, connect_timeout, read_timeout, http2)
+        self._client_lock = threading.Lock()
+        # Provider registry (utils/providers.py): defaults, overridden or extended by providers, endpoints by provider_urls
+        self.providers = build_registry(providers, provider_urls)
+        self.provider_urls = {name: spec.url for name, spec in self.providers.items()}
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.cache = cache
+        # Stream completions and abort generations that are clearly not the requested JSON
+        self.streaming = streaming
+        self.max_response_chars = max_response_chars
+        # Set by enable_resilience(): provider failures raise ProviderError instead of returning None
+        self.resilience = None
+        self.raise_errors = False
+        # Per-stage spans and histograms (utils/tracing.py); every completion is an "llm" span
+        self.tracer = tracer or NULL_TRACER
 
-    def extract_resume_info_old(self, system_prompt, user_prompt, json_template, resume_text):
-        start_time = time.time()
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
+        # One keep-alive pool per provider, shared by every worker thread using this client
+        self.transports = {
+            provider: PooledTransport(provider, pool_size=pool_size, connect_timeout=connect_timeout,
+                                      read_timeout=read_timeout, http2=http2)
+            for provider in self.provider_urls
         }
-        data = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"{user_prompt}\n{json_template}\n{resume_text}\nPlease respond in valid JSON format according to the given template."}
-            ]
+
+        # One limiter per provider, shared by every worker thread using this client
+        rate_limits = rate_limits or {}
+        self.rate_limiters = {
+            provider: TokenBucket(provider, rate_limits.get(provider, DEFAULT_RATE_LIMIT_RPM))
+            for provider in self.provider_urls
         }
+        logging.info(f"Initialized OpenAIClient in {time.time() - start_time:.2f} seconds.")
 
-        response = requests.post(url, headers=headers, json=data, verify=False)
-        logging.info(f"Extracted resume info in {time.time() - start_time:.2f} seconds.")
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        else:
-            logging.error(f"Error extracting resume info: {response.status_code}, {response.text}")
+    @property
+    def client(self):
+        """openai.Client for the vision calls, created (and the SDK imported) on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import openai
+                    self._client = openai.Client(api_key=self.image_api_key,
+                                                 http_client=build_httpx_client(*self._client_options))
+        return self._client
+
+    def transport(self, provider):
+        """Pooled transport for a provider; safe to share with concurrent callers."""
+        return self.transports[provider]
+
+    def close(self):
+        if self.resilience is not None:
+            self.resilience.log_stats()
+            self.resilience.close()
+        for transport in self.transports.values():
+            transport.close()
+        if self._client is not None:
+            self._client.close()
+
+    def enable_resilience(self, provider_order=None, router=None, **options):
+        """Route extract() through retries, per-provider circuit breakers and hedging (see utils/resilience.py).
+
+        provider_order lists the registered providers to use, preferred first (default: all); with a
+        router (utils/router.py) traffic is split between them by live measurements instead.
+        options go to ResilientCaller.
+        """
+        provider_order = list(provider_order or self.providers)
+        unknown = [provider for provider in provider_order if provider not in self.providers]
+        if unknown:
+            raise ValueError(f"Unknown providers: {', '.join(unknown)}")
+        # Fail at start-up rather than on the first request: every provider needs its own key
+        for provider in provider_order:
+            self.providers[provider].key(self.api_key)
+        self.raise_errors = True
+        self.resilience = ResilientCaller(
+            [(provider, functools.partial(self.extract_with, provider, lookup=False)) for provider in provider_order],
+            is_valid=cacheable,
+            router=router, **options)
+
+    def provider_stats(self):
+        """Live routing, retry and circuit breaker statistics; None without enable_resilience()."""
+        return self.resilience.stats() if self.resilience is not None else None
+
+    def extract(self, system_prompt, user_prompt, json_template, resume_text, label=""):
+        """Extract resume info through the resilient layer if enabled, else from Cerebras directly."""
+        if self.resilience is None:
+            return self.extract_resume_info(system_prompt, user_prompt, json_template, resume_text)
+        # Looked up here, once, rather than in each provider call: a hit is not a provider call, and counting
+        # it as one would skew the router's throughput and the hedging latency percentiles
+        for provider, _ in self.resilience.providers:
+            cached = self.prepare_request(provider, system_prompt, user_prompt, json_template, resume_text)[2]
+            if cached is not None:
+                return cached
+        return self.resilience.call(system_prompt, user_prompt, json_template, resume_text, label=label)
+
+    def _failed(self, provider, status, message):
+        """Report a failed completion: None for direct callers, ProviderError under enable_resilience()."""
+        if self.raise_errors:
+            raise ProviderError(provider, status, message)
+        return None
+
+    def _cache_lookup(self, provider, data, system_prompt, user_prompt, json_template, content, lookup=True):
+        """Return (cache_key, cached_content); both None when caching is off. With lookup=False only the
+        key is computed (the caller already looked it up)."""
+        if self.cache is None or not self.cache.enabled:
+            return None, None
+        params = {k: v for k, v in data.items() if k != "messages"}
+        key = ExtractionCache.make_key(provider, params, system_prompt, user_prompt, json_template, content)
+        if not lookup:
+            return key, None
+        cached = self.cache.get(key)
+        if cached is not None and not cacheable(cached):
+            # Stored before answers were checked, or by an older version; ask the provider again
+            logging.warning(f"[{provider}] dropping unusable cached answer ({key[:12]})")
+            self.cache.delete(key)
+            cached = None
+        if cached is not None:
+            logging.info(f"[{provider}] extraction cache hit ({key[:12]})")
+        return key, cached
+
+    def _cache_store(self, key, content):
+        # Prose or broken JSON is never cached: a retry, or the next run, must reach the provider again
+        if key is not None and cacheable(content):
+            self.cache.put(key, content)
+
+    def _post(self, provider, headers, data):
+        """POST to a provider through its rate limiter, retrying on HTTP 429."""
+        limiter = self.rate_limiters[provider]
+        url = self.provider_urls[provider]
+        for attempt in range(self.max_rate_limit_retries + 1):
+            waited = limiter.acquire()
+            if waited > 0.5:
+                logging.info(f"[{provider}] waited {waited:.2f}s for rate limiter")
+            # A hedged request whose twin already answered is never sent
+            check_cancelled(provider)
+            response = self.transports[provider].post(url, headers=headers, json=data)
+            limiter.update_from_headers(response.headers)
+            if response.status_code != 429:
+                if response.status_code == 200:
+                    limiter.on_success()
+                return response
+            limiter.on_rate_limited(response.headers.get("retry-after"))
+        logging.error(f"[{provider}] still rate limited after {self.max_rate_limit_retries} retries")
+        return response
+
+    def _post_stream(self, provider, headers, data, guard, started_at):
+        """Streaming variant of _post: returns (status_code, error_text, StreamResult)."""
+        limiter = self.rate_limiters[provider]
+        url = self.provider_urls[provider]
+        for attempt in range(self.max_rate_limit_retries + 1):
+            waited = limiter.acquire()
+            if waited > 0.5:
+                logging.info(f"[{provider}] waited {waited:.2f}s for rate limiter")
+            check_cancelled(provider)
+            with self.transports[provider].stream(url, headers=headers, json=data) as (response, lines):
+                limiter.update_from_headers(response.headers)
+                if response.status_code == 429:
+                    limiter.on_rate_limited(response.headers.get("retry-after"))
+                    continue
+                if response.status_code != 200:
+                    return response.status_code, response_text(response), None
+                limiter.on_success()
+                # A hedged request that lost stops reading here, which closes its connection
+                return 200, None, consume_stream(until_cancelled(provider, iter_sse_deltas(lines)), guard, started_at)
+        logging.error(f"[{provider}] still rate limited after {self.max_rate_limit_retries} retries")
+        return 429, "rate limited", None
+
+    def _log_stream(self, provider, result):
+        """Log stream timings; returns the content, or None when the generation was aborted."""
+        ttft = f"{result.ttft:.2f}s" if result.ttft is not None else "n/a"
+        logging.info(f"[{provider}] streamed {len(result.content)} chars: first token {ttft}, total {result.total:.2f}s")
+        if result.aborted:
+            logging.error(f"[{provider}] aborted generation after {result.total:.2f}s: {result.aborted}")
             return None
-            
-    def extract_resume_info_together_ai(self, system_prompt, user_prompt, json_template, resume_text):
-        start_time = time.time()
-        url = "https://api.together.xyz/v1/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        return result.content
+
+    def _complete(self, provider, headers, data, json_template, cache_key, answers=1):
+        """Run one chat completion (streamed if enabled) and return its content, or None on failure.
+
+        answers is how many resumes the request asks for (packed requests); the stream guard's
+        length limit scales with it.
+        """
+        with self.tracer.span("llm", provider=provider) as span:
+            if self.streaming:
+                guard = JsonStreamGuard(json_template, self.max_response_chars * answers)
+                status, error_text, result = self._post_stream(provider, headers, dict(data, stream=True), guard,
+                                                               time.perf_counter())
+                if status != 200:
+                    logging.error(f"Error extracting resume info: {status}, {error_text}")
+                    span.set(error=status)
+                    return self._failed(provider, status, error_text)
+                content = self._log_stream(provider, result)
+                if content is None:
+                    span.set(error="aborted")
+                    return self._failed(provider, None, f"generation aborted: {result.aborted}")
+                if not guard.complete:
+                    logging.warning(f"[{provider}] stream ended before the JSON object was closed")
+                # Streams carry no usage block; estimated like utils/packing.py does
+                span.set(prompt_tokens=sum(estimate_tokens(message["content"]) for message in data["messages"]),
+                         completion_tokens=estimate_tokens(content))
+            else:
+                response = self._post(provider, headers, data)
+                if response.status_code != 200:
+                    logging.error(f"Error extracting resume info: {response.status_code}, {response.text}")
+                    span.set(error=response.status_code)
+                    return self._failed(provider, response.status_code, response.text)
+                body = response.json()
+                content = body['choices'][0]['message']['content']
+                usage = body.get("usage") or {}
+                span.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+        self._cache_store(cache_key, content)
+        return content
+
+
+    def prepare_request(self, provider, system_prompt, user_prompt, json_template, resume_text, lookup=True):
+        """(request body, cache key, cached answer) for an extraction with one registered provider, unsent.
+
+        resume_text may also be a list of (resume id, text) pairs, packed into one request (utils/packing.py).
+        """
+        if isinstance(resume_text, list):
+            user_message = build_packed_message(user_prompt, json_template, resume_text)
+            resume_text = user_message
+        else:
+            user_message = build_user_message(user_prompt, json_template, resume_text)
+        data = self.providers[provider].request([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ])
+        cache_key, cached = self._cache_lookup(provider, data, system_prompt, user_prompt, json_template, resume_text,
+                                               lookup)
+        return data, cache_key, cached
+
+    def prepare_vision_request(self, images, user_prompt, json_template, system_prompt):
+        """(request body, cache key, cached answer) for what call_gpt4o would send, unsent."""
+        model, max_tokens = "gpt-4o", 4096
+        images = [images] if isinstance(images, str) else list(images)
+        cache_key, cached = self._cache_lookup("openai", {"model": model, "max_tokens": max_tokens},
+                                               system_prompt, user_prompt, json_template,
+                                               "\n".join(images).encode("ascii"))
         data = {
-            "model": "meta-llama/Llama-3.3-70B-Instruct-Turbo",
+            "model": model,
             "messages": [
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"{user_prompt}\n{json_template}\n{resume_text}\nPlease respond in valid JSON format according to the given template."}
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": f"{user_prompt}\n{compact_template(json_template)}\n{RESPONSE_INSTRUCTION}"},
+                        *({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image}"}} for image in images)
+                    ]
+                }
             ],
-            "max_tokens": None,
-            "temperature": 0.7,
-            "top_p": 0.7,
-            "top_k": 50,
-            "repetition_penalty": 1,
-            "stop": ["<|eot_id|>","<|eom_id|>"]
+            "max_tokens": max_tokens
         }
+        return data, cache_key, cached
 
-        response = requests.post(url, headers=headers, json=data, verify=False)
-        logging.info(f"Extracted resume info in {time.time() - start_time:.2f} seconds.")
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        else:
-            logging.error(f"Error extracting resume info: {response.status_code}, {response.text}")
-            return None
+    def store_answer(self, cache_key, content):
+        """Cache an answer obtained outside this client (batch results) under a prepare_* cache key."""
+        self._cache_store(cache_key, content)
+
+    def extract_with(self, provider, system_prompt, user_prompt, json_template, resume_text, lookup=True):
+        """Extract resume info with one registered provider; returns the answer, or None on failure.
+
+        lookup=False skips the cache lookup (extract() has done it) but still stores the answer.
+        """
+        data, cache_key, cached = self.prepare_request(provider, system_prompt, user_prompt, json_template, resume_text,
+                                                       lookup)
+        if cached is not None:
+            return cached
+
+        if isinstance(resume_text, list):
+            # A packed answer wraps one template object per resume; only its length is guarded
+            return self._complete(provider, self.providers[provider].headers(self.api_key), data, None, cache_key,
+                                  answers=len(resume_text))
+        return self._complete(provider, self.providers[provider].headers(self.api_key), data, json_template, cache_key)
+
+    def extract_resume_info_old(self, system_prompt, user_prompt, json_template, resume_text):
+        return self.extract_with("openai", system_prompt, user_prompt, json_template, resume_text)
+
+    def extract_resume_info_together_ai(self, system_prompt, user_prompt, json_template, resume_text):
+        return self.extract_with("together", system_prompt, user_prompt, json_template, resume_text)
 
     def extract_resume_info(self, system_prompt, user_prompt, json_template, resume_text):
-        start_time = time.time()
-        url = "https://api.cerebras.ai/v1/chat/completions"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        return self.extract_with("cerebras", system_prompt, user_prompt, json_template, resume_text)
+
+    def fix_output(self, system_prompt, instruction, payload):
+        """Small follow-up request that repairs a malformed answer or a few fields; the resume is not resent."""
+        spec = self.providers["cerebras"]
+        headers = spec.headers(self.api_key)
         data = {
-            "model": "llama-3.3-70b",
+            "model": spec.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"{user_prompt}\n Json Template : \n{json_template}\n Resume text : \n{resume_text}\nPlease respond in valid JSON format according to the given template."}
+                {"role": "user", "content": f"{instruction}\n{payload}"}
             ],
-            "max_completion_tokens": -1,
-            "temperature": 0.2,
+            "temperature": 0,
             "top_p": 1,
             "seed": 0,
             "stream": False
         }
 
-        response = requests.post(url, headers=headers, json=data, verify=False)
-        logging.info(f"Extracted resume info in {time.time() - start_time:.2f} seconds.")
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        else:
-            logging.error(f"Error extracting resume info: {response.status_code}, {response.text}")
-            return None
+        cache_key, cached = self._cache_lookup("cerebras", data, system_prompt, instruction, None, payload)
+        if cached is not None:
+            return cached
+
+        return self._complete("cerebras", headers, data, None, cache_key)
 
     def call_gpt4o(self, base64_image, user_prompt, json_template,system_prompt):
-        start_time = time.time()
-        response = self.client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": f"{user_prompt}\n{json_template}\nPlease respond in valid JSON format according to the given template."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                ]
-            }
-        ],
-        max_tokens=4096
-
-    )
-        logging.info(f"Called GPT-4o in {time.time() - start_time:.2f} seconds.")
-        return response.choices[0].message.content
+        """base64_image is one base64 JPEG or a list of them (one image_url part per page)."""
+        model, max_tokens = "gpt-4o", 4096
+        images = [base64_image] if isinstance(base64_image, str) else list(base64_image)
+        cache_key, cached = self._cache_lookup("openai", {"model": model, "max_tokens": max_tokens},
+                                               system_prompt, user_prompt, json_template,
+                                               "\n".join(images).encode("ascii"))
+        if cached is not None:
+            return cached
+
+        with self.tracer.span("llm", provider="openai", images=len(images)) as span:
+            limiter = self.rate_limiters["openai"]
+            limiter.acquire()
+            started_at = time.perf_counter()
+            raw_response = self.client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": f"{user_prompt}\n{compact_template(json_template)}\n{RESPONSE_INSTRUCTION}"},
+                        *({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image}"}} for image in images)
+                    ]
+                }
+            ],
+            max_tokens=max_tokens,
+            stream=self.streaming
+
+        )
+            limiter.update_from_headers(raw_response.headers)
+            limiter.on_success()
+            response = raw_response.parse()
+            if self.streaming:
+                deltas = (chunk.choices[0].delta.content for chunk in response
+                          if chunk.choices and chunk.choices[0].delta.content)
+                try:
+                    result = consume_stream(deltas, JsonStreamGuard(json_template, self.max_response_chars), started_at)
+                finally:
+                    response.close()
+                content = self._log_stream("openai", result)
+                if content is None:
+                    span.set(error="aborted")
+                    return None
+                span.set(completion_tokens=estimate_tokens(content))
+            else:
+                content = response.choices[0].message.content
+                if response.usage is not None:
+                    span.set(prompt_tokens=response.usage.prompt_tokens,
+                             completion_tokens=response.usage.completion_tokens)
+        self._cache_store(cache_key, content)
+        return content
 
 # File Processor Class
 class FileProcessor:
-    def __init__(self, input_directory, output_directory, client, args, system_prompt, user_prompt, json_template):
+    def __init__(self, input_directory, output_directory, client, args, system_prompt, user_prompt, json_template,
+                 manifest=None, image_budget=None, image_optimizer=None, office_pool=None, prompt_compactor=None,
+                 output_validator=None, resume_packer=None, tracer=None, output_sink=None,
+                 near_duplicates=None):
         start_time = time.time()
         self.input_directory = input_directory
         self.output_directory = output_directory
@@ -144,11 +436,93 @@ class FileProcessor:
         self.system_prompt = system_prompt
         self.user_prompt = user_prompt
         self.json_template = json_template
+        self.workers = max(1, getattr(args, "workers", 1) or 1)
+        self.manifest = manifest
+        # Inputs the manifest saw change since they were processed; their output is replaced
+        self.changed_inputs = set()
+        self.pdf_backend = getattr(args, "pdf_backend", None) or "pymupdf"
+        self.pdf_workers = max(1, getattr(args, "pdf_workers", 1) or 1)
+        # Resolution, image-count and payload limits for the scanned-document vision fallback
+        self.image_budget = image_budget or PageImageBudget()
+        # Orients, downscales and recompresses images before they are uploaded
+        self.image_optimizer = image_optimizer or ImageOptimizer(self.image_budget)
+        # Whitespace/header/duplicate cleanup and token budget applied to resume text before the LLM call
+        self.prompt_compactor = prompt_compactor or PromptCompactor()
+        # Checks answers against the template and repairs them before they are written
+        self.output_validator = output_validator or OutputValidator(
+            json_template, lambda instruction, payload: client.fix_output(system_prompt, instruction, payload))
+        # Packs short resumes several to a request (utils/packing.py); set after construction, it needs the processor
+        self.resume_packer = resume_packer
+        # Read .doc text straight from the file before falling back to an office conversion
+        self.native_doc_reader = getattr(args, "native_doc", True)
+        # Warm LibreOffice instances (one profile each) converting .doc files in parallel on Linux/macOS
+        self.office_pool = office_pool
+        if self.office_pool is None and os.name == "posix":
+            self.office_pool = OfficeConversionPool(getattr(args, "office_instances", None) or 1)
+        # MS Word automation is driven one document at a time
+        self._conversion_lock = threading.Lock()
+        # Per-stage spans (utils/tracing.py); shared with the client unless given
+        self.tracer = tracer or getattr(client, "tracer", None) or NULL_TRACER
+        # Where results go (utils/output_sink.py): one JSON file per input unless a JSONL sink is given
+        self.output_sink = output_sink or FileSink(output_directory)
+        # Answers resubmitted CVs from their earlier extraction (utils/near_duplicates.py); None: always extract
+        self.near_duplicates = near_duplicates
         logging.info(f"Initialized FileProcessor in {time.time() - start_time:.2f} seconds.")
 
+    def close(self):
+        """Release helper process pools started by this processor."""
+        pdf_text.shutdown()
+        self.output_sink.close()
+        if self.near_duplicates is not None:
+            self.near_duplicates.close()
+        if self.office_pool is not None:
+            logging.info(f"Office conversion pool: {self.office_pool.stats()}")
+            self.office_pool.close()
+
+    def warm_pdf_workers(self, filenames):
+        """Start the PDF page workers now, before the first PDF, if any of filenames is a PDF.
+
+        Deferred from __init__ so runs without PDFs (a single image or DOCX) never start them.
+        """
+        if any(f.lower().endswith(".pdf") for f in filenames):
+            pdf_text.warm_pool(self.pdf_workers)
+
+    def _dispatch(self, jobs):
+        """Run (handler, filename) jobs, keeping up to --workers LLM calls in flight."""
+        if self.workers <= 1 or len(jobs) <= 1:
+            for handler, filename in jobs:
+                handler(filename)
+            return
+
+        self.warm_pdf_workers([filename for _, filename in jobs])
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract") as executor:
+            futures = [executor.submit(handler, filename) for handler, filename in jobs]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Unhandled error in worker: {str(e)}")
+        elapsed = time.time() - start_time
+        logging.info(f"Processed {len(jobs)} files with {self.workers} workers in {elapsed:.2f} seconds "
+                     f"({len(jobs) / elapsed if elapsed else 0:.2f} files/s).")
+
+    def process_all_files(self, pdf_files, docx_files, image_files, doc_files):
+        """Process every file type through one shared worker pool."""
+        if self.resume_packer is not None and self.resume_packer.enabled:
+            self.resume_packer.process(pdf_files + docx_files + doc_files)
+            self._dispatch([(self.process_single_image, f) for f in image_files])
+            return
+        jobs = [(self.process_pdf_file, f) for f in pdf_files]
+        jobs += [(self.process_docx_file, f) for f in docx_files]
+        jobs += [(self.process_single_image, f) for f in image_files]
+        jobs += [(self.process_doc_file, f) for f in doc_files]
+        self._dispatch(jobs)
+
     # PDF to images conversion
     def convert_pdf_to_images(self, pdf_path):
         start_time = time.time()
+        import pdfplumber
         images = []
         with pdfplumber.open(pdf_path) as pdf:
             for page in pdf.pages:
@@ -170,39 +544,41 @@ class FileProcessor:
             logging.error(f"Error encoding image to base64: {str(e)}")
             return None
 
+    def encode_optimized_image(self, image_path):
+        """Like encode_image_to_base64, but uploads the optimized JPEG rather than the raw file."""
+        try:
+            return base64.b64encode(self.image_optimizer.optimize_file(image_path)).decode("utf-8")
+        except Exception as e:
+            logging.error(f"Error optimizing image {image_path}, sending it unchanged: {str(e)}")
+            return self.encode_image_to_base64(image_path)
+
     # File processing function for images
     def process_image_file(self, image_file_path,json_template):
-        start_time = time.time()
         try:
             if not os.path.exists(image_file_path):
                 logging.error(f"Image file not found: {image_file_path}")
                 return None
 
-            base64_image = self.encode_image_to_base64(image_file_path)
-            if base64_image:
-                extracted_text = self.client.call_gpt4o(base64_image, "Extract text from this image",json_template,self.system_prompt)
-                logging.info(f"Processed image file in {time.time() - start_time:.2f} seconds.")
-                return extracted_text
-            else:
-                logging.error(f"Failed to encode image: {image_file_path}")
-                return None
+            with self.tracer.span("vision", bytes=os.path.getsize(image_file_path), images=1):
+                base64_image = self.encode_optimized_image(image_file_path)
+                if base64_image:
+                    return self.client.call_gpt4o(base64_image, "Extract text from this image",json_template,self.system_prompt)
+            logging.error(f"Failed to encode image: {image_file_path}")
+            return None
         except Exception as e:
             logging.error(f"Error processing image file {image_file_path}: {str(e)}")
             return None
 
     def write_output_file(self, filename, extracted_text):
-        """Writes extracted text to a JSON file, handling --write-all and --write-new flags."""
-        start_time = time.time()
-        
-        # Construct output file path
-        output_filename = os.path.splitext(filename)[0] + "_extracted_info.json"
-        output_filepath = os.path.join(self.output_directory, output_filename)
+        """Writes extracted text to the output sink, handling --write-all and --write-new flags."""
+        output_filepath = self.output_sink.location(filename)
 
-        # Check if file exists
-        file_exists = os.path.exists(output_filepath)
+        # Check if an output exists
+        file_exists = self.output_sink.exists(filename)
 
         # Handle --write-all and --write-new flags
-        if file_exists and not self.args.write_all:
+        if file_exists and not self.args.write_all and filename not in self.changed_inputs:
+            self._record_manifest(filename, output_filepath, STATUS_DONE)
             if self.args.write_new:
                 logging.info(f"Skipping existing file: {output_filepath}")
                 return None  # Skip processing if file already exists and --write-new is set
@@ -210,49 +586,110 @@ class FileProcessor:
                 logging.info(f"File already exists: {output_filepath}")
                 return output_filepath  # Return existing file path
 
-        # Write extracted text to JSON file
-        try:
-            with open(output_filepath, "w", encoding="utf-8") as json_file:
-                #json.dump(extracted_text, f, ensure_ascii=False, indent=4)
-                 json_file.write(extracted_text)
-                 json_file.write("\n")
-            logging.info(f"Successfully written to: {output_filepath}")
-        except Exception as e:
-            logging.error(f"Failed to write file {output_filepath}: {e}")
+        # Validated, repaired and re-serialized; None if the answer was unusable
+        with self.tracer.span("validate", file=filename) as span:
+            extracted_text = self.output_validator.validate(filename, extracted_text)
+            if extracted_text is None:
+                span.set(error="unusable")
+        if extracted_text is None:
+            logging.error(f"No usable output for {filename}, nothing written.")
+            self._record_manifest(filename, output_filepath, STATUS_FAILED)
             return None
 
-        end_time = time.time()
-        logging.info(f"Time taken to write file: {end_time - start_time:.2f} seconds")
+        # Write extracted text to the sink (a complete file or a complete record, never a partial one)
+        with self.tracer.span("write", file=filename, bytes=len(extracted_text)) as span:
+            try:
+                output_filepath = self.output_sink.write(filename, extracted_text)
+                logging.info(f"Successfully written to: {output_filepath}")
+            except Exception as e:
+                logging.error(f"Failed to write file {output_filepath}: {e}")
+                span.set(error=type(e).__name__)
+                self._record_manifest(filename, output_filepath, STATUS_FAILED)
+                return None
+
+            self._record_manifest(filename, output_filepath, STATUS_DONE)
 
         return output_filepath
 
+    def _record_manifest(self, filename, output_filepath, status):
+        if self.manifest is not None:
+            self.manifest.record(os.path.join(self.input_directory, filename), output_filepath, status)
+
     # Process PDF files
     def process_pdf_files(self, pdf_files):
+        self._dispatch([(self.process_pdf_file, f) for f in pdf_files])
+
+    def pdf_resume_text(self, pdf_file, data=None):
+        """Compacted resume text of a PDF; pages without a text layer are read through the vision model.
 
-        for pdf_file in pdf_files:
-            start_time = time.time()
-            pdf_file_path = os.path.join(self.input_directory, pdf_file)
+        data is the file's content for uploads held in memory; pdf_file then only names it.
+        """
+        pdf_file_path = data if data is not None else os.path.join(self.input_directory, pdf_file)
+        with self.tracer.span("extract", file=pdf_file, backend=self.pdf_backend) as span:
+            pdf_result = pdf_text.extract_pdf_text(pdf_file_path, backend=self.pdf_backend, workers=self.pdf_workers)
+            span.set(bytes=len(data) if data is not None else os.path.getsize(pdf_file_path), pages=pdf_result.page_count)
+        resume_text = pdf_result.text
+        # Page boundaries let compaction recognise running headers and footers
+        text_pages = pdf_result.pages
 
+        # Check if extracted text is empty
+        if not resume_text.strip():
+            text_pages = None
+            logging.warning(f"Empty text extracted from {pdf_file}, processing images instead.,")
+            # One image per page at the vision model's resolution, never one stitched canvas
+            with self.tracer.span("vision", file=pdf_file) as span:
+                page_images = pdf_page_images(pdf_file_path, self.image_budget, self.image_optimizer.grayscale, pdf_file)
+                if page_images:
+                    span.set(images=len(page_images))
+                    resume_text = self.client.call_gpt4o(page_images, "Extract text from these page images",self.json_template,self.system_prompt)
+        elif pdf_result.empty_pages:
+            # Blank pages (separators, trailing empty pages) hold nothing to read and are never sent
+            scanned = pdf_pages_with_graphics(pdf_file_path, pdf_result.empty_pages)
+            if scanned:
+                pages = ", ".join(str(i + 1) for i in scanned)
+                logging.warning(f"{pdf_file}: pages {pages} of {pdf_result.page_count} have no text layer, "
+                                f"transcribing them through the vision model.")
+                scanned_text = self.scanned_pages_text(pdf_file, pdf_file_path, scanned)
+                if scanned_text:
+                    # Their transcript goes in at the first scanned page's place
+                    text_pages = list(text_pages)
+                    for i in scanned:
+                        text_pages[i] = ""
+                    text_pages[scanned[0]] = f"\n{scanned_text}\n"
+                    resume_text = "".join(text_pages)
+
+        return self.prompt_compactor.compact(resume_text, text_pages, pdf_file)
+
+    def scanned_pages_text(self, pdf_file, pdf_file_path, pages):
+        """Plain text of the given (0-based) pages of a PDF, transcribed by the vision model; None on failure."""
+        with self.tracer.span("vision", file=pdf_file, pages=len(pages)) as span:
+            page_images = pdf_page_images(pdf_file_path, self.image_budget, self.image_optimizer.grayscale,
+                                          pdf_file, pages)
+            if not page_images:
+                return None
+            span.set(images=len(page_images))
             try:
-                pdf_loader = PyPDFLoader(pdf_file_path)
-                pdf_text = "".join(page.page_content for page in pdf_loader.load())
-
-                # Check if extracted text is empty
-                if not pdf_text.strip():
-                    logging.warning(f"Empty text extracted from {pdf_file}, processing images instead.,")
-                    combined_image_path = self.extract_and_combine_images(pdf_file_path)
-                    
-                    # Process combined image
-                    if combined_image_path and os.path.exists(combined_image_path):
-                        base64_image = self.encode_image_to_base64(combined_image_path)
-                        pdf_text = self.client.call_gpt4o(base64_image, "Extract text from this combined image",self.json_template,self.system_prompt)
-
-                resume_info = self.client.extract_resume_info(
-                    self.system_prompt, 
-                    self.user_prompt, 
-                    self.json_template, 
-                    pdf_text
-                )
+                answer = self.client.call_gpt4o(page_images, SCANNED_PAGES_PROMPT, SCANNED_PAGES_TEMPLATE,
+                                                SCANNED_PAGES_SYSTEM_PROMPT)
+            except Exception as e:
+                # The text layer of the other pages is still worth extracting
+                logging.warning(f"{pdf_file}: vision request for the scanned pages failed ({e}), "
+                                f"continuing without them.")
+                span.set(error=type(e).__name__)
+                return None
+        data = parse_lenient(answer)[0] if answer else None
+        text = data.get("text") if isinstance(data, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            logging.warning(f"{pdf_file}: no transcript of the scanned pages, continuing without them.")
+            return None
+        return text.strip()
+
+    def process_pdf_file(self, pdf_file):
+        start_time = time.time()
+        with self.tracer.span("file", file=pdf_file) as span:
+            try:
+                resume_text = self.pdf_resume_text(pdf_file)
+                resume_info = self.extract_resume(pdf_file, resume_text)
 
                 self.write_output_file(pdf_file, resume_info)
                 logging.info(f"Processed PDF file {pdf_file} in {time.time() - start_time:.2f} seconds.")
@@ -260,51 +697,74 @@ class FileProcessor:
                 #processed_files.add(pdf_file)
             except Exception as e:
                 logging.error(f"Error processing PDF {pdf_file}: {str(e)}")
+                span.set(error=type(e).__name__)
 
     # Process DOCX files
     def process_docx_files(self, docx_files):
-        for docx_file in docx_files:
-            start_time = time.time()
-            docx_file_path = os.path.join(self.input_directory, docx_file)
-            try:
+        self._dispatch([(self.process_docx_file, f) for f in docx_files])
+
+    def docx_resume_text(self, docx_file, data=None):
+        """Compacted resume text of a DOCX (data: its content, for uploads held in memory),
+        read through the vision model if it only holds images."""
+        with self.tracer.span("extract", file=docx_file) as span:
+            if data is not None:
+                # Docx2txtLoader only takes paths; it is docx2txt.process underneath
+                import docx2txt
+                docx_file_path = data
+                docx_text = docx2txt.process(BytesIO(data))
+                span.set(bytes=len(data))
+            else:
+                from langchain_community.document_loaders import Docx2txtLoader
+                docx_file_path = os.path.join(self.input_directory, docx_file)
                 docx_loader = Docx2txtLoader(docx_file_path)
                 docx_text = "".join(page.page_content for page in docx_loader.load())
+                span.set(bytes=os.path.getsize(docx_file_path))
 
-                if not docx_text.strip():
-                    logging.warning(f"Empty text extracted from {docx_file}, processing images instead.")
-                    combined_image_path = self.extract_and_combine_images_from_docx(docx_file_path)
+        if not docx_text.strip():
+            logging.warning(f"Empty text extracted from {docx_file}, processing images instead.")
+            with self.tracer.span("vision", file=docx_file) as span:
+                embedded_images = docx_images(docx_file_path, self.image_budget, self.image_optimizer, docx_file)
+                if embedded_images:
+                    span.set(images=len(embedded_images))
+                    docx_text = self.client.call_gpt4o(embedded_images, "Extract text from these images",self.json_template,self.system_prompt)
 
-                    # Process combined image if it exists
-                    if combined_image_path and os.path.exists(combined_image_path):
-                        base64_image = self.encode_image_to_base64(combined_image_path)
-                        docx_text = self.client.call_gpt4o(base64_image, "Extract text from this combined image",self.json_template,self.system_prompt)
+        return self.prompt_compactor.compact(docx_text, name=docx_file)
 
-                resume_info = self.client.extract_resume_info(
-                    self.system_prompt, 
-                    self.user_prompt, 
-                    self.json_template, 
-                    docx_text
-                )
+    def process_docx_file(self, docx_file):
+        start_time = time.time()
+        with self.tracer.span("file", file=docx_file) as span:
+            try:
+                docx_text = self.docx_resume_text(docx_file)
+                resume_info = self.extract_resume(docx_file, docx_text)
 
                 self.write_output_file(docx_file, resume_info)
                 logging.info(f"Processed DOCX file {docx_file} in {time.time() - start_time:.2f} seconds.")
 
             except Exception as e:
                 logging.error(f"Error processing DOCX {docx_file}: {str(e)}")
+                span.set(error=type(e).__name__)
 
     # Process Image files
     def process_image_files(self, image_files):
-        for image_file in image_files:
-            start_time = time.time()
-            image_file_path = os.path.join(self.input_directory, image_file)
+        self._dispatch([(self.process_single_image, f) for f in image_files])
+
+    def process_single_image(self, image_file):
+        start_time = time.time()
+        image_file_path = os.path.join(self.input_directory, image_file)
+        with self.tracer.span("file", file=image_file) as span:
             extracted_info = self.process_image_file(image_file_path, self.json_template)  # No separate call to extract_resume_info
             if extracted_info:
                 self.write_output_file(image_file, extracted_info)
                 logging.info(f"Processed image file {image_file} in {time.time() - start_time:.2f} seconds.")
+            else:
+                span.set(error="no answer")
 
 
 
+    # Stitched single-image fallback, superseded by utils/page_images.py; kept for benchmarks/bench_page_images.py
     def extract_and_combine_images(self, pdf_path):
+        import fitz  # PyMuPDF
+        from PIL import Image
         start_time = time.time()
         # Extract the base name of the PDF (without extension)
         base_name = os.path.splitext(os.path.basename(pdf_path))[0]
@@ -359,6 +819,7 @@ class FileProcessor:
             return None
 
     def extract_and_combine_images_from_docx(self, docx_path):
+        from PIL import Image
         # Extract the base name of the DOCX (without extension)
         start_time = time.time()
         base_name = os.path.splitext(os.path.basename(docx_path))[0]
@@ -420,12 +881,13 @@ class FileProcessor:
         if os.name == "nt":  # Windows
             try:
                 print(f" Converting {doc_path} to {docx_path} using MS Word...")
-                word = Dispatch("Word.Application")
-                word.Visible = False  # Background execution
-                doc = word.Documents.Open(os.path.abspath(doc_path))
-                doc.SaveAs(os.path.abspath(docx_path), FileFormat=16)  # Convert to .docx
-                doc.Close()
-                word.Quit()
+                with self._conversion_lock:
+                    word = Dispatch("Word.Application")
+                    word.Visible = False  # Background execution
+                    doc = word.Documents.Open(os.path.abspath(doc_path))
+                    doc.SaveAs(os.path.abspath(docx_path), FileFormat=16)  # Convert to .docx
+                    doc.Close()
+                    word.Quit()
                 print(f"Conversion successful: {docx_path}")
                 return docx_path
             except Exception as e:
@@ -435,8 +897,8 @@ class FileProcessor:
         elif os.name == "posix":  # Linux/macOS
             try:
                 print(f" Converting {doc_path} using LibreOffice...")
-                subprocess.run(["libreoffice", "--headless", "--convert-to", "docx", doc_path], check=True)
-                return docx_path if os.path.exists(docx_path) else None
+                # Written to the pool's scratch directory, not next to the input
+                return self.office_pool.convert(doc_path)
             except Exception as e:
                 print(f"ERROR: LibreOffice conversion failed for {doc_path} - {e}")
                 return None
@@ -445,37 +907,144 @@ class FileProcessor:
 
   
     def process_doc_files(self, doc_files):
-        for doc_file in doc_files:
-            start_time = time.time()
-            doc_file_path = os.path.join(self.input_directory, doc_file)
+        self._dispatch([(self.process_doc_file, f) for f in doc_files])
+
+    def read_doc_natively(self, doc_file, doc_file_path):
+        """Text of a Word 97-2003 .doc read straight from the file (path or bytes), or None if it has to be converted."""
+        if not self.native_doc_reader:
+            return None
+        size = len(doc_file_path) if isinstance(doc_file_path, bytes) else os.path.getsize(doc_file_path)
+        with self.tracer.span("extract", file=doc_file, bytes=size, reader="native") as span:
+            try:
+                doc_result = extract_doc_text(doc_file_path)
+            except DocFormatError as e:
+                logging.info(f"Native .doc reader cannot read {doc_file} ({e}), converting instead.")
+                span.set(error="unreadable")
+                return None
+            if not doc_result.text.strip():
+                # Image-only document: the converted .docx is needed to get at the pictures
+                logging.info(f"No text in {doc_file} ({doc_result.object_count} embedded objects), converting instead.")
+                span.set(error="no text")
+                return None
+        return doc_result.text
 
-            # Convert .doc to .docx
-            docx_file_path = self.convert_doc_to_docx(doc_file_path)
-            if not docx_file_path:
-                logging.error(f"Skipping {doc_file} due to conversion failure.")
-                continue  # Skip processing if conversion fails
+    def doc_resume_text(self, doc_file, data=None):
+        """Compacted resume text of a .doc; None if it could be neither read nor converted.
 
+        data is the file's content for uploads held in memory. Those are only written to disk
+        (a temporary file) when the native reader cannot handle them and an office suite must.
+        """
+        doc_file_path = os.path.join(self.input_directory, doc_file) if data is None else None
+
+        # Plain-text .doc files are read directly; only unreadable or image-only ones are converted
+        doc_text = self.read_doc_natively(doc_file, data if data is not None else doc_file_path)
+        if doc_text is None:
+            upload_dir = None
+            if data is not None:
+                # The office suite needs a file: the upload is kept in a private directory until it is read
+                upload_dir = tempfile.mkdtemp(prefix="upload_")
+                doc_file_path = os.path.join(upload_dir, "upload.doc")
+                with open(doc_file_path, "wb") as f:
+                    f.write(data)
             try:
-                # Process converted .docx file
-                docx_loader = Docx2txtLoader(docx_file_path)
-                doc_text = "".join(page.page_content for page in docx_loader.load())
+                # Convert .doc to .docx
+                with self.tracer.span("convert", file=doc_file, bytes=os.path.getsize(doc_file_path)) as span:
+                    docx_file_path = self.convert_doc_to_docx(doc_file_path)
+                    if not docx_file_path:
+                        span.set(error="conversion failed")
+                if not docx_file_path:
+                    logging.error(f"Skipping {doc_file} due to conversion failure.")
+                    return None  # Skip processing if conversion fails
 
-                if not doc_text.strip():
-                    logging.warning(f"Empty text extracted from {doc_file}, processing images instead.")
-                    combined_image_path = self.extract_and_combine_images_from_docx(docx_file_path)
+                try:
+                    # Process converted .docx file
+                    from langchain_community.document_loaders import Docx2txtLoader
+                    with self.tracer.span("extract", file=doc_file, reader="converted"):
+                        docx_loader = Docx2txtLoader(docx_file_path)
+                        doc_text = "".join(page.page_content for page in docx_loader.load())
 
-                    # Process extracted images
-                    if combined_image_path and os.path.exists(combined_image_path):
-                        base64_image = self.encode_image_to_base64(combined_image_path)
-                        doc_text = self.client.call_gpt4o(base64_image, "Extract text from this combined image", self.json_template,self.system_prompt)
+                    if not doc_text.strip():
+                        logging.warning(f"Empty text extracted from {doc_file}, processing images instead.")
+                        with self.tracer.span("vision", file=doc_file) as span:
+                            embedded_images = docx_images(docx_file_path, self.image_budget, self.image_optimizer)
+                            if embedded_images:
+                                span.set(images=len(embedded_images))
+                                doc_text = self.client.call_gpt4o(embedded_images, "Extract text from these images", self.json_template,self.system_prompt)
+                finally:
+                    if self.office_pool is not None and os.name == "posix":
+                        self.office_pool.release(docx_file_path)
+            finally:
+                if upload_dir is not None:
+                    shutil.rmtree(upload_dir, ignore_errors=True)
 
-                resume_info = self.client.extract_resume_info(
-                    self.system_prompt, self.user_prompt, self.json_template, doc_text
-                )
+        return self.prompt_compactor.compact(doc_text, name=doc_file)
+
+    def process_doc_file(self, doc_file):
+        start_time = time.time()
+        with self.tracer.span("file", file=doc_file) as span:
+            try:
+                doc_text = self.doc_resume_text(doc_file)
+                if doc_text is None:
+                    return
+                resume_info = self.extract_resume(doc_file, doc_text)
 
                 self.write_output_file(doc_file, resume_info)
                 logging.info(f"Processed DOC file {doc_file} in {time.time() - start_time:.2f} seconds.")
 
             except Exception as e:
                 logging.error(f"Error processing DOC {doc_file}: {str(e)}")
-    
\ No newline at end of file
+                span.set(error=type(e).__name__)
+
+    def extract_resume(self, filename, resume_text):
+        """LLM answer (JSON text) for compacted resume text; a near-duplicate of an earlier resume is answered
+        from its extraction when possible."""
+        def full_extraction():
+            return self.client.extract(self.system_prompt, self.user_prompt, self.json_template, resume_text,
+                                       label=filename)
+
+        index = self.near_duplicates
+        if index is None or not index.enabled or not isinstance(resume_text, str) or not resume_text.strip():
+            return full_extraction()
+        with self.tracer.span("near_dup", file=filename):
+            lookup = index.lookup(resume_text)
+        answer = index.answer(lookup, filename)
+        if answer is None:
+            answer = full_extraction()
+            index.add(lookup, filename, answer)
+        return answer
+
+    def resume_text(self, filename):
+        """Compacted resume text of any supported non-image file (the input of extract_resume_info)."""
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == ".pdf":
+            return self.pdf_resume_text(filename)
+        if extension == ".docx":
+            return self.docx_resume_text(filename)
+        if extension == ".doc":
+            return self.doc_resume_text(filename)
+        raise ValueError(f"No text stage for {filename}")
+
+    def extract_bytes(self, name, data, file_type):
+        """Validated resume info (JSON text) for a file held in memory, or None; nothing is read from or
+        written to the input/output directories. file_type is what base64_decoder.determine_file_type
+        reports: 'pdf', 'docx', 'doc', 'jpg' or 'png'."""
+        with self.tracer.span("file", file=name, file_type=file_type):
+            if file_type in ("jpg", "png"):
+                with self.tracer.span("vision", bytes=len(data), images=1):
+                    try:
+                        image = self.image_optimizer.optimize(data, name)
+                    except Exception as e:
+                        logging.error(f"Error optimizing image {name}, sending it unchanged: {str(e)}")
+                        image = data
+                    resume_info = self.client.call_gpt4o(base64.b64encode(image).decode("ascii"), "Extract text from this image",
+                                                         self.json_template, self.system_prompt)
+            elif file_type in ("pdf", "docx", "doc"):
+                text_stage = {"pdf": self.pdf_resume_text, "docx": self.docx_resume_text, "doc": self.doc_resume_text}
+                resume_text = text_stage[file_type](name, data)
+                if resume_text is None:
+                    return None
+                resume_info = self.extract_resume(name, resume_text)
+            else:
+                raise ValueError(f"Unsupported file type '{file_type}' for {name}")
+            with self.tracer.span("validate"):
+                return self.output_validator.validate(name, resume_info)
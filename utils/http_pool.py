@@ -0,0 +1,90 @@
+import importlib.util
+import logging
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Defaults used when OpenAIClient is created without explicit pool settings
+DEFAULT_POOL_SIZE = 32
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+
+
+def http2_available():
+    """HTTP/2 needs httpx plus the optional h2 package (pip install httpx[http2])."""
+    return importlib.util.find_spec("httpx") is not None and importlib.util.find_spec("h2") is not None
+
+
+def build_httpx_client(pool_size, connect_timeout, read_timeout, http2=False, verify=True):
+    """httpx client with the same pool limits; also handed to the openai SDK for call_gpt4o."""
+    import httpx  # installed alongside the openai SDK
+    return httpx.Client(
+        http2=bool(http2) and http2_available(),
+        verify=verify,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
+
+
+class PooledTransport:
+    """Thread-safe keep-alive connection pool for one provider.
+
+    Every worker thread posting to the same provider shares the pool, so TCP+TLS
+    handshakes are paid once per connection instead of once per resume. When HTTP/2
+    is requested and available, httpx multiplexes all requests over one connection;
+    otherwise a requests.Session with a bounded urllib3 pool is used.
+    """
+
+    def __init__(self, name, pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, http2=False, verify=False):
+        self.name = name
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+        self.http2 = bool(http2) and http2_available()
+        if http2 and not self.http2:
+            logging.info(f"[{name}] HTTP/2 requested but httpx[http2] is not installed, using HTTP/1.1 keep-alive")
+
+        if self.http2:
+            self.session = build_httpx_client(pool_size, connect_timeout, read_timeout, http2=True, verify=verify)
+        else:
+            self.session = requests.Session()
+            # pool_block keeps at most pool_size sockets open even with more worker threads
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True, max_retries=0)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+    def post(self, url, headers=None, json=None):
+        if self.http2:
+            return self.session.post(url, headers=headers, json=json)
+        # verify is passed per request: a session-level value is overridden by REQUESTS_CA_BUNDLE
+        return self.session.post(url, headers=headers, json=json, timeout=self.timeout, verify=self.verify)
+
+    @contextmanager
+    def stream(self, url, headers=None, json=None):
+        """POST without reading the body; yields (response, line iterator).
+
+        Leaving the block before the body is consumed closes the connection, which is how
+        a generation is aborted mid-stream.
+        """
+        if self.http2:
+            with self.session.stream("POST", url, headers=headers, json=json) as response:
+                yield response, response.iter_lines()
+            return
+        response = self.session.post(url, headers=headers, json=json, timeout=self.timeout, verify=self.verify,
+                                     stream=True)
+        try:
+            yield response, response.iter_lines(decode_unicode=True)
+        finally:
+            response.close()
+
+    def close(self):
+        self.session.close()
+
+
+def response_text(response):
+    """Body of a response opened by PooledTransport.stream (httpx needs an explicit read first)."""
+    if hasattr(response, "read"):
+        response.read()
+    return response.text
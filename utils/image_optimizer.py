@@ -0,0 +1,101 @@
+import hashlib
+import io
+import logging
+import os
+import uuid
+
+# Bump when the optimization pipeline changes so stale cached outputs are not reused
+OPTIMIZER_VERSION = 2
+
+# Refuse to decode images larger than this (decompression-bomb guard)
+MAX_SOURCE_PIXELS = 100_000_000
+
+
+class ImageOptimizer:
+    """Shrinks images to what the vision model actually looks at before they are uploaded.
+
+    Applies EXIF orientation, downscales to the budget's long/short edge (decoding JPEGs
+    at reduced size where possible), optionally drops colour, and recompresses as JPEG.
+    Results are cached on disk by a hash of the source bytes and the settings, so a
+    resubmitted image is not decoded again.
+    """
+
+    def __init__(self, budget, grayscale=False, cache_dir=None):
+        self.budget = budget
+        self.grayscale = grayscale
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, data):
+        digest = hashlib.sha256()
+        digest.update(data)
+        budget = self.budget
+        digest.update(repr((OPTIMIZER_VERSION, budget.max_long_edge, budget.max_short_edge,
+                            budget.jpeg_quality, self.grayscale)).encode())
+        key = digest.hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def prepare(self, image):
+        """Orient, downscale and convert a PIL image; the source is decoded at most once."""
+        from PIL import Image, ImageOps
+        scale = self.budget.scale_for(*image.size)
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # For JPEGs, draft() decodes at 1/2, 1/4 or 1/8 scale so the full image is never in memory
+        image.draft("L" if self.grayscale else "RGB", target)
+        image = ImageOps.exif_transpose(image)
+        # exif_transpose may have swapped the axes
+        scale = self.budget.scale_for(*image.size)
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if image.size != target:
+            image = image.resize(target, Image.LANCZOS)
+        if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+            # Transparent areas would turn black in RGB/L: put the image on a white page first
+            image = image.convert("RGBA")
+            image = Image.alpha_composite(Image.new("RGBA", image.size, "white"), image).convert("RGB")
+        if self.grayscale:
+            image = image.convert("L")
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        return image
+
+    def encode(self, image):
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.budget.jpeg_quality, optimize=True)
+        return buffer.getvalue()
+
+    def optimize(self, data, name=""):
+        """Return JPEG bytes ready for the vision model; never larger than the input when it is usable as-is."""
+        cache_path = self._cache_path(data) if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                optimized = f.read()
+            logging.info(f"Optimized image for {name} served from cache ({len(data)} -> {len(optimized)} bytes).")
+            return optimized
+
+        # Pillow is imported on the first image, not when the pipeline starts
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > MAX_SOURCE_PIXELS:
+                raise ValueError(f"image too large to decode: {image.size}")
+            keep_original = image.format == "JPEG" and image.getexif().get(0x0112, 1) == 1 and not self.grayscale
+            optimized = self.encode(self.prepare(image))
+        if keep_original and len(optimized) >= len(data):
+            # Already a small, upright JPEG: recompressing it would only add artifacts
+            optimized = data
+
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            partial_path = f"{cache_path}.partial_{uuid.uuid4().hex}"
+            with open(partial_path, "wb") as f:
+                f.write(optimized)
+            os.replace(partial_path, cache_path)
+
+        saved = len(data) - len(optimized)
+        logging.info(f"Optimized image for {name}: {len(data)} -> {len(optimized)} bytes "
+                     f"({saved} bytes, {saved / len(data) * 100 if data else 0:.0f}% saved).")
+        return optimized
+
+    def optimize_file(self, path):
+        with open(path, "rb") as f:
+            return self.optimize(f.read(), os.path.basename(path))
@@ -0,0 +1,432 @@
+import calendar
+import json
+import logging
+import re
+import threading
+
+# Values accepted as-is in date fields (ongoing roles and courses)
+OPEN_ENDED_DATES = {"present", "current", "currently", "till date", "till now", "to date", "now",
+                    "ongoing", "pursuing", "continuing"}
+
+# Truncated output is repaired by cutting back to one of the last few complete values
+MAX_TRUNCATION_ATTEMPTS = 64
+
+FIX_JSON_INSTRUCTION = ("The JSON below is malformed. Return the same data as one valid JSON object that "
+                        "follows this template, without adding or inventing values:")
+FIX_FIELDS_INSTRUCTION = ("Each key below is a field path and each value was extracted for that field but does "
+                          "not follow the rules. Return a JSON object with the same keys and corrected values. "
+                          "Dates must be dd/MM/yyyy; use \"\" if a value cannot be corrected.")
+
+_MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_MONTHS["sept"] = 9
+_MONTH_NAME = r"(?P<month_name>[A-Za-z]{3,9})\.?"
+
+_DATE_PATTERNS = [
+    # 05/03/2019, 5-3-2019, 5.3.2019
+    re.compile(r"^(?P<day>\d{1,2})[/.\-](?P<month>\d{1,2})[/.\-](?P<year>\d{4})$"),
+    # 2019-03-05, 2019/03/05
+    re.compile(r"^(?P<year>\d{4})[/.\-](?P<month>\d{1,2})[/.\-](?P<day>\d{1,2})$"),
+    # 03/2019, 3-2019
+    re.compile(r"^(?P<month>\d{1,2})[/.\-](?P<year>\d{4})$"),
+    # 2019-03
+    re.compile(r"^(?P<year>\d{4})[/.\-](?P<month>\d{1,2})$"),
+    # 5 March 2019, 5th Mar, 2019
+    re.compile(r"^(?P<day>\d{1,2})(st|nd|rd|th)?[\s\-]+" + _MONTH_NAME + r"[\s,\-]+(?P<year>\d{4})$"),
+    # March 5, 2019
+    re.compile(r"^" + _MONTH_NAME + r"\s+(?P<day>\d{1,2})(st|nd|rd|th)?,?\s+(?P<year>\d{4})$"),
+    # March 2019, Mar-2019, Mar'2019
+    re.compile(r"^" + _MONTH_NAME + r"[\s,\-'/]+(?P<year>\d{4})$"),
+    # 2019 March
+    re.compile(r"^(?P<year>\d{4})[\s,\-]+" + _MONTH_NAME + r"$"),
+    # 2019
+    re.compile(r"^(?P<year>\d{4})$"),
+]
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+
+
+class RepairResult:
+    def __init__(self, data=None, defects=None, problems=None):
+        # Parsed output conformed to the template, or None if the text could not be parsed at all
+        self.data = data
+        # Defects fixed locally, e.g. ["fence", "trailing_comma", "date"]
+        self.defects = defects or []
+        # Fields that could not be fixed locally: [(path, value, reason)]
+        self.problems = problems or []
+
+
+def format_path(path):
+    out = ""
+    for part in path:
+        out += f"[{part}]" if isinstance(part, int) else (f".{part}" if out else part)
+    return out
+
+
+def is_date_field(key):
+    return isinstance(key, str) and "date" in key.lower()
+
+
+def normalize_date(value, end=False):
+    """value as dd/MM/yyyy following the rules in system_prompt, or None if it cannot be read.
+
+    A bare year becomes the first (start dates) or last (end dates) day of the year, a month and
+    year the first or last day of the month. Empty and open-ended values ("Present") are kept.
+    """
+    text = " ".join(str(value).split())
+    if not text or text.lower().strip(".") in OPEN_ENDED_DATES:
+        return text
+    for pattern in _DATE_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        parts = match.groupdict()
+        year = int(parts["year"])
+        if parts.get("month_name"):
+            month = _MONTHS.get(parts["month_name"].lower())
+            if month is None:
+                return None
+        elif parts.get("month"):
+            month = int(parts["month"])
+        else:
+            month = 12 if end else 1
+        day = int(parts["day"]) if parts.get("day") else None
+        if day is not None and month > 12 and day <= 12:
+            # MM/dd/yyyy
+            day, month = month, day
+        if not 1 <= month <= 12 or not 1900 <= year <= 2100:
+            return None
+        last_day = calendar.monthrange(year, month)[1]
+        if day is None:
+            day = last_day if end else 1
+        if not 1 <= day <= last_day:
+            return None
+        return f"{day:02d}/{month:02d}/{year:04d}"
+    return None
+
+
+def _scan(text, start):
+    """Walk a JSON value from text[start] ("{"), tracking strings and nesting.
+
+    Returns (end, cut_points, stack, in_string, trailing_commas, literals): end is the index just
+    past the closing brace (None if the text ends first); cut_points are (index, open containers)
+    where the text can be cut and closed to give valid JSON (just before a "," or just after an
+    opening bracket); trailing_commas are indices of commas directly followed by a closing bracket;
+    literals are (index, word) for Python None/True/False outside strings.
+    """
+    stack = []
+    cut_points = []
+    trailing_commas = []
+    literals = []
+    in_string = False
+    escape = False
+    i = start
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+            cut_points.append((i + 1, tuple(stack)))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return i + 1, cut_points, stack, False, trailing_commas, literals
+        elif ch == ",":
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j < n and text[j] in "}]":
+                trailing_commas.append(i)
+            else:
+                cut_points.append((i, tuple(stack)))
+        elif ch in "NTF":
+            for word in _PYTHON_LITERALS:
+                if text.startswith(word, i):
+                    literals.append((i, word))
+                    i += len(word) - 1
+                    break
+        i += 1
+    return None, cut_points, stack, in_string, trailing_commas, literals
+
+
+def _closers(stack):
+    return "".join("}" if ch == "{" else "]" for ch in reversed(stack))
+
+
+def parse_lenient(text):
+    """Parse model output that should be one JSON object; returns (data or None, defects)."""
+    defects = []
+    stripped = text.strip()
+    try:
+        data = json.loads(stripped)
+        if isinstance(data, dict):
+            return data, defects
+    except ValueError:
+        pass
+
+    fence = _FENCE.search(stripped)
+    if fence and "{" in fence.group(1):
+        defects.append("fence")
+        stripped = fence.group(1).strip()
+    start = stripped.find("{")
+    if start < 0:
+        return None, defects + ["no_object"]
+    if start > 0:
+        defects.append("prose")
+
+    end, cut_points, stack, in_string, trailing_commas, literals = _scan(stripped, start)
+    body = stripped[start:end] if end is not None else stripped[start:]
+    if end is not None and stripped[end:].strip():
+        defects.append("prose")
+
+    # Edits are applied back to front so earlier indices stay valid
+    edits = [(i - start, i - start + 1, "") for i in trailing_commas]
+    edits += [(i - start, i - start + len(word), _PYTHON_LITERALS[word]) for i, word in literals]
+    if trailing_commas:
+        defects.append("trailing_comma")
+    if literals:
+        defects.append("python_literal")
+
+    def apply(candidate_end, closers):
+        chunk = body[:candidate_end]
+        for edit_start, edit_end, replacement in sorted(edits, reverse=True):
+            if edit_end <= candidate_end:
+                chunk = chunk[:edit_start] + replacement + chunk[edit_end:]
+        return chunk + closers
+
+    if end is not None:
+        try:
+            data = json.loads(apply(len(body), ""))
+            return (data, defects) if isinstance(data, dict) else (None, defects)
+        except ValueError:
+            pass
+
+    # Truncated (or broken near the end): close what is open, else cut back to the last complete value
+    defects.append("truncated")
+    candidates = []
+    if end is None:
+        candidates.append(apply(len(body), ('"' if in_string else "") + _closers(stack)))
+    for cut, open_containers in reversed(cut_points[-MAX_TRUNCATION_ATTEMPTS:]):
+        candidates.append(apply(cut - start, _closers(open_containers)))
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data, defects
+    return None, defects
+
+
+def _key_lookup(data):
+    # Tolerate "Start Date", "startdate", "start_date" for "StartDate"
+    return {re.sub(r"[\s_\-]", "", key).lower(): key for key in data}
+
+
+def conform(value, template, path=(), defects=None, problems=None):
+    """value reshaped to the template: missing keys added empty, unknown keys dropped, scalars as strings,
+    dates as dd/MM/yyyy. Anything that cannot be fixed is kept and reported in problems."""
+    defects = [] if defects is None else defects
+    problems = [] if problems is None else problems
+
+    if isinstance(template, dict):
+        if not isinstance(value, dict):
+            if value in (None, "", []):
+                defects.append("type")
+                value = {}
+            else:
+                problems.append((path, value, "expected an object"))
+                return value, defects, problems
+        lookup = _key_lookup(value)
+        out = {}
+        used = set()
+        for key, sub_template in template.items():
+            source = key if key in value else lookup.get(re.sub(r"[\s_\-]", "", key).lower())
+            if source is None:
+                defects.append("missing_key")
+                out[key] = json.loads(json.dumps(sub_template))
+                if isinstance(out[key], list):
+                    out[key] = []
+                continue
+            if source != key:
+                defects.append("key_name")
+            used.add(source)
+            out[key], _, _ = conform(value[source], sub_template, path + (key,), defects, problems)
+        if any(key not in used for key in value):
+            defects.append("unknown_key")
+        return out, defects, problems
+
+    if isinstance(template, list):
+        item_template = template[0] if template else ""
+        if value is None or value == "":
+            if value is None:
+                defects.append("type")
+            return [], defects, problems
+        if not isinstance(value, list):
+            defects.append("type")
+            if isinstance(value, str) and not isinstance(item_template, (dict, list)):
+                value = [part.strip() for part in re.split(r"[,;\n]", value) if part.strip()]
+            else:
+                value = [value]
+        out = []
+        for i, item in enumerate(value):
+            if item is None or item == "":
+                continue
+            conformed, _, _ = conform(item, item_template, path + (i,), defects, problems)
+            out.append(conformed)
+        return out, defects, problems
+
+    # Scalar field; the template uses "" for every one
+    if value is None:
+        defects.append("type")
+        return "", defects, problems
+    if isinstance(value, bool) or isinstance(value, (int, float)):
+        defects.append("type")
+        value = str(value)
+    elif not isinstance(value, str):
+        problems.append((path, value, "expected a string"))
+        return value, defects, problems
+    if path and is_date_field(path[-1]):
+        normalized = normalize_date(value, end="end" in path[-1].lower() or "expiry" in path[-1].lower())
+        if normalized is None:
+            problems.append((path, value, "date is not dd/MM/yyyy"))
+        elif normalized != value:
+            defects.append("date")
+            value = normalized
+    return value, defects, problems
+
+
+def repair(text, template):
+    """Parse and conform model output to the template, fixing what can be fixed without the LLM."""
+    data, defects = parse_lenient(text)
+    if data is None:
+        return RepairResult(None, defects)
+    data, defects, problems = conform(data, template, defects=defects)
+    return RepairResult(data, defects, problems)
+
+
+def _template_at(template, path):
+    for part in path:
+        template = (template[0] if template else "") if isinstance(part, int) else template[part]
+    return template
+
+
+def _set_path(data, path, value):
+    for part in path[:-1]:
+        data = data[part]
+    data[path[-1]] = value
+
+
+class OutputValidator:
+    """Validates LLM output against json_template before it is written, repairing it locally.
+
+    Output that cannot be repaired locally gets one small targeted request through fix_request
+    (fix_request(instruction, payload) -> str or None): the broken JSON alone when it cannot be
+    parsed, or just the offending fields. Neither needs the resume again. Counters feed log_stats().
+    """
+
+    def __init__(self, json_template, fix_request=None, enabled=True):
+        self.json_template = json_template
+        self.fix_request = fix_request
+        self.enabled = enabled
+        self.checked = 0
+        self.clean = 0
+        self.repaired = 0
+        self.fixed = 0
+        self.fix_requests = 0
+        self.failed = 0
+        self.defect_counts = {}
+        self._lock = threading.Lock()
+
+    def _count(self, **counters):
+        with self._lock:
+            for name, increment in counters.items():
+                setattr(self, name, getattr(self, name) + increment)
+
+    def _ask(self, instruction, payload):
+        if self.fix_request is None:
+            return None
+        self._count(fix_requests=1)
+        try:
+            return self.fix_request(instruction, payload)
+        except Exception as e:
+            logging.error(f"Fix request failed: {e}")
+            return None
+
+    def _fix_fields(self, name, data, problems):
+        payload = json.dumps({format_path(path): value for path, value, _ in problems}, ensure_ascii=False)
+        answer = self._ask(FIX_FIELDS_INSTRUCTION, payload)
+        fixes = parse_lenient(answer)[0] if answer else None
+        unresolved = []
+        for path, value, reason in problems:
+            fixed = (fixes or {}).get(format_path(path))
+            conformed, _, remaining = conform(fixed, _template_at(self.json_template, path), path)
+            if fixed is not None and not remaining:
+                _set_path(data, path, conformed)
+            else:
+                unresolved.append(f"{format_path(path)} ({reason})")
+        if unresolved:
+            logging.warning(f"{name}: kept unfixable values for {', '.join(unresolved)}")
+        return not unresolved
+
+    def validate(self, name, content):
+        """Canonical JSON text for content, or None if it is unusable."""
+        if content is None or not self.enabled:
+            return content
+        result = repair(content, self.json_template)
+        used_request = False
+        if result.data is None and "no_object" in result.defects:
+            # Nothing to repair: the model answered in prose
+            self._count(checked=1, failed=1)
+            logging.error(f"{name}: output contains no JSON object.")
+            return None
+        if result.data is None:
+            logging.warning(f"{name}: output is not parseable JSON ({', '.join(result.defects)}), requesting a fix.")
+            answer = self._ask(f"{FIX_JSON_INSTRUCTION}\n{json.dumps(self.json_template, separators=(',', ':'))}",
+                               content)
+            used_request = True
+            if answer:
+                result = repair(answer, self.json_template)
+            if result.data is None:
+                self._count(checked=1, failed=1)
+                logging.error(f"{name}: output could not be repaired.")
+                return None
+        if result.problems:
+            used_request = True
+            self._fix_fields(name, result.data, result.problems)
+
+        with self._lock:
+            self.checked += 1
+            for defect in set(result.defects):
+                self.defect_counts[defect] = self.defect_counts.get(defect, 0) + 1
+            if used_request:
+                self.fixed += 1
+            elif result.defects:
+                self.repaired += 1
+            else:
+                self.clean += 1
+        if result.defects and not used_request:
+            logging.info(f"{name}: repaired output locally ({', '.join(sorted(set(result.defects)))}).")
+        return json.dumps(result.data, ensure_ascii=False, indent=4)
+
+    def log_stats(self):
+        if not self.enabled or not self.checked:
+            return
+        defective = self.checked - self.clean
+        rate = self.repaired / defective if defective else 1.0
+        defects = ", ".join(f"{name} {count}" for name, count in sorted(self.defect_counts.items()))
+        logging.info(f"Output validation: {self.checked} outputs, {self.clean} valid as returned, "
+                     f"{self.repaired} repaired locally, {self.fixed} fixed with {self.fix_requests} targeted "
+                     f"requests, {self.failed} unusable. Local repair rate {rate:.0%}; LLM calls avoided: "
+                     f"{self.repaired} (re-extractions avoided: {self.repaired + self.fixed}). Defects: {defects or 'none'}")
@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def output_name_for(filename):
+    """Name of the JSON written for an input file by the per-file output sink (utils/output_sink.py)."""
+    return os.path.splitext(filename)[0] + "_extracted_info.json"
+
+
+class ProcessingManifest:
+    """Persistent index of processed inputs, consulted before any extraction or LLM work.
+
+    Each row maps an input file (size, mtime, content hash) to its output path and status.
+    A rescan needs one directory listing plus primary-key lookups of the listed files only
+    (500 per query), so a small --watch batch costs the same at any manifest size. Unchanged
+    files are recognised from size+mtime alone, touched-but-identical files from their hash,
+    and output files are never stat-ed individually.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                input_path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                content_hash TEXT,
+                output_path TEXT,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+        self.conn.commit()
+
+    def _load(self, input_paths):
+        """Rows of just these inputs, looked up by primary key in chunks: a --watch batch of a few files
+        never reads the whole table."""
+        known = {}
+        with self.lock:
+            for start in range(0, len(input_paths), 500):
+                chunk = input_paths[start:start + 500]
+                known.update((row[0], row[1:]) for row in self.conn.execute(
+                    f"SELECT input_path, size, mtime_ns, content_hash, status FROM files "
+                    f"WHERE input_path IN ({','.join('?' * len(chunk))})", chunk))
+        return known
+
+    def is_empty(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+
+    def bootstrap(self, input_directory, entries, outputs):
+        """Adopt outputs written before the manifest existed; outputs maps input names to their output location
+        (the output sink's locations(), one directory listing or index query)."""
+        adopted = []
+        now = time.time()
+        for entry in entries:
+            output_path = outputs.get(entry.name)
+            if output_path is not None:
+                stat = entry.stat()
+                # No hash yet: if the input later changes on disk it is simply reprocessed
+                adopted.append((os.path.join(input_directory, entry.name), stat.st_size, stat.st_mtime_ns, None,
+                                output_path, STATUS_DONE, now))
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", adopted)
+            self.conn.commit()
+        logging.info(f"Manifest bootstrapped with {len(adopted)} previously processed files.")
+        return len(adopted)
+
+    def pending(self, input_directory, entries):
+        """Split entries into (todo, changed).
+
+        todo holds the DirEntries that still need processing; unchanged, completed files are
+        dropped. changed holds the names of completed files whose content has since changed,
+        whose existing output should be replaced.
+        """
+        known = self._load([os.path.join(input_directory, entry.name) for entry in entries])
+        todo = []
+        changed = []
+        refreshed = []
+        for entry in entries:
+            input_path = os.path.join(input_directory, entry.name)
+            row = known.get(input_path)
+            if row is None or row[3] != STATUS_DONE:
+                todo.append(entry)
+                continue
+            size, mtime_ns, content_hash, _ = row
+            stat = entry.stat()
+            if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+                continue
+            # Touched or copied: only the content hash can tell whether it really changed
+            if content_hash and stat.st_size == size and file_sha256(input_path) == content_hash:
+                refreshed.append((stat.st_mtime_ns, input_path))
+                continue
+            todo.append(entry)
+            changed.append(entry.name)
+        if refreshed:
+            with self.lock:
+                self.conn.executemany("UPDATE files SET mtime_ns = ? WHERE input_path = ?", refreshed)
+                self.conn.commit()
+        logging.info(f"Manifest: {len(entries) - len(todo)} of {len(entries)} files unchanged since last run, "
+                     f"{len(todo)} to process ({len(changed)} changed).")
+        return todo, changed
+
+    def classify(self, input_path):
+        """Single-file variant of pending(), used by --process: "new", "unchanged" or "changed"."""
+        with self.lock:
+            row = self.conn.execute("SELECT size, mtime_ns, content_hash, status FROM files WHERE input_path = ?",
+                                    (input_path,)).fetchone()
+        if row is None or row[3] != STATUS_DONE:
+            return "new"
+        stat = os.stat(input_path)
+        if stat.st_size == row[0] and stat.st_mtime_ns == row[1]:
+            return "unchanged"
+        if row[2] and file_sha256(input_path) == row[2]:
+            return "unchanged"
+        return "changed"
+
+    def record(self, input_path, output_path, status):
+        try:
+            stat = os.stat(input_path)
+            size, mtime_ns, content_hash = stat.st_size, stat.st_mtime_ns, file_sha256(input_path)
+        except OSError:
+            size = mtime_ns = content_hash = None
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (input_path, size, mtime_ns, content_hash, output_path, status, time.time()))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,305 @@
+import array
+import difflib
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils.json_repair import parse_lenient
+from utils.prompt_compaction import estimate_tokens
+
+# MinHash values per resume; split into LSH_BANDS bands of NUM_PERM // LSH_BANDS rows. With 16 bands of 4 rows
+# a pair of resumes with Jaccard similarity 0.8 shares a band 99.9% of the time, one at 0.3 only 12% of the time
+NUM_PERM = 64
+LSH_BANDS = 16
+
+# Words per shingle
+SHINGLE_WORDS = 3
+
+# Estimated Jaccard similarity from which an earlier resume counts as the same CV
+DEFAULT_THRESHOLD = 0.75
+
+# Similarity from which the earlier JSON is reused without any request even if lines changed; None: only when
+# no line of the text changed (an estimate of 1.0 does not mean identical text, a new phone number can score it)
+DEFAULT_REUSE_THRESHOLD = None
+
+# Changed lines (removed plus added) beyond which an update request saves too little over a full extraction
+DEFAULT_MAX_DIFF_LINES = 40
+
+# Candidates read per band; entries in very crowded buckets (boilerplate text) are not worth comparing
+MAX_CANDIDATES_PER_BAND = 32
+
+# Mersenne prime of the universal hash family (a * x + b) mod p
+_PRIME = (1 << 61) - 1
+
+UPDATE_INSTRUCTION = (
+    "An earlier version of this resume was extracted into the JSON below. Since then, the lines marked \"-\" were "
+    "removed from the resume and the lines marked \"+\" were added. Respond with one valid JSON object that holds "
+    "only the top-level fields of the JSON whose values change, each with its complete new value in the same "
+    "format, or {} if nothing changes. No explanations."
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def shingle_hashes(text):
+    """64-bit hashes of the overlapping SHINGLE_WORDS-word shingles of lower-cased text."""
+    words = _WORD.findall((text or "").lower())
+    if len(words) < SHINGLE_WORDS:
+        words = words + [""] * (SHINGLE_WORDS - len(words))
+    return {int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"),
+                                           digest_size=8).digest(), "little") & _PRIME
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+class MinHasher:
+    """NUM_PERM universal hash functions from a fixed seed, so signatures stay comparable between runs."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, hashes):
+        """Minimum of every hash function over the shingles, kept to 32 bits."""
+        return array.array("I", (min((a * x + b) % _PRIME for x in hashes) & 0xFFFFFFFF
+                                 for a, b in self.params))
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+def text_lines(text):
+    return [" ".join(line.split()) for line in (text or "").splitlines() if line.strip()]
+
+
+def changed_lines(old_text, new_text):
+    """(removed, added) lines between two versions of a resume text, whitespace ignored."""
+    old, new = text_lines(old_text), text_lines(new_text)
+    removed, added = [], []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag != "equal":
+            removed += old[i1:i2]
+            added += new[j1:j2]
+    return removed, added
+
+
+def build_update_payload(prior_json, removed, added):
+    changes = "\n".join([f"- {line}" for line in removed] + [f"+ {line}" for line in added])
+    return f"Previous JSON:\n{prior_json}\nChanges:\n{changes}"
+
+
+def merge_update(prior, update):
+    """prior with the top-level fields of update that it knows replaced; None if update is not an object."""
+    if not isinstance(update, dict):
+        return None
+    merged = dict(prior)
+    merged.update({key: value for key, value in update.items() if key in prior})
+    return merged
+
+
+class Lookup:
+    """Signature of one resume text and the closest earlier resume found for it (match is None if there is none)."""
+
+    __slots__ = ("text", "signature", "band_keys", "match")
+
+    def __init__(self, text, signature, band_keys, match=None):
+        self.text = text
+        self.signature = signature
+        self.band_keys = band_keys
+        self.match = match
+
+
+class Match:
+    __slots__ = ("entry_id", "source", "similarity", "text", "result")
+
+    def __init__(self, entry_id, source, similarity, text, result):
+        self.entry_id = entry_id
+        self.source = source
+        self.similarity = similarity
+        self.text = text
+        self.result = result
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash/LSH index of extracted resumes, to answer resubmitted CVs without a full extraction.
+
+    Every extracted resume is stored with its MinHash signature, its text (compressed) and its JSON
+    result; its signature is split into LSH bands, each band a row in an indexed SQLite table, so a
+    lookup costs LSH_BANDS index probes and a few signature comparisons however many resumes are
+    stored. When a new resume is at least threshold similar to an earlier one, the earlier JSON is
+    reused as is if no line changed (or the similarity reaches reuse_threshold, if given); otherwise the
+    removed and added lines are sent with the earlier JSON in a small update_request(instruction,
+    payload), whose changed fields are merged into it. Resumes whose diff exceeds max_diff_lines,
+    or whose update fails, get a full extraction. Band keys include a hash of the prompts and
+    template (namespace), so results extracted for another template are never reused.
+    """
+
+    def __init__(self, path, namespace="", update_request=None, threshold=DEFAULT_THRESHOLD,
+                 reuse_threshold=DEFAULT_REUSE_THRESHOLD, max_diff_lines=DEFAULT_MAX_DIFF_LINES, enabled=True):
+        self.path = path
+        self.namespace = hashlib.sha256(namespace.encode("utf-8")).digest()[:8]
+        self.update_request = update_request
+        self.threshold = threshold
+        self.reuse_threshold = reuse_threshold
+        self.max_diff_lines = max_diff_lines
+        self.enabled = enabled
+        self.hasher = MinHasher()
+        self.rows = NUM_PERM // LSH_BANDS
+        self.counters = {"lookups": 0, "matches": 0, "reused": 0, "updated": 0, "update_failed": 0,
+                         "diff_too_large": 0, "added": 0, "update_tokens": 0, "full_tokens_avoided": 0}
+        self.lock = threading.Lock()
+        self.conn = None
+        if not self.enabled:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                source TEXT,
+                signature BLOB NOT NULL,
+                text BLOB NOT NULL,
+                result TEXT NOT NULL,
+                created REAL NOT NULL
+            )""")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bands (
+                key INTEGER NOT NULL,
+                entry_id INTEGER NOT NULL,
+                PRIMARY KEY (key, entry_id)
+            ) WITHOUT ROWID""")
+        self.conn.commit()
+
+    def _count(self, **counters):
+        with self.lock:
+            for name, increment in counters.items():
+                self.counters[name] += increment
+
+    def _band_keys(self, signature):
+        keys = []
+        for band in range(LSH_BANDS):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(self.namespace + bytes([band]) + rows.tobytes(), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    def lookup(self, text):
+        """Lookup for text, with the most similar earlier resume at or above threshold, if any."""
+        signature = self.hasher.signature(shingle_hashes(text))
+        lookup = Lookup(text, signature, self._band_keys(signature))
+        self._count(lookups=1)
+        with self.lock:
+            candidates = set()
+            for key in lookup.band_keys:
+                candidates.update(row[0] for row in self.conn.execute(
+                    "SELECT entry_id FROM bands WHERE key = ? LIMIT ?", (key, MAX_CANDIDATES_PER_BAND)))
+            if not candidates:
+                return lookup
+            best_id, best = None, 0.0
+            candidates = list(candidates)
+            for row in self.conn.execute(f"SELECT id, signature FROM entries WHERE id IN "
+                                         f"({','.join('?' * len(candidates))})", candidates):
+                score = similarity(signature, array.array("I", row[1]))
+                # The newest of equally similar entries, i.e. the latest version of the CV
+                if score > best or (score == best and best_id is not None and row[0] > best_id):
+                    best_id, best = row[0], score
+            if best_id is None or best < self.threshold:
+                return lookup
+            source, prior_text, result = self.conn.execute(
+                "SELECT source, text, result FROM entries WHERE id = ?", (best_id,)).fetchone()
+        lookup.match = Match(best_id, source, best, zlib.decompress(prior_text).decode("utf-8"), result)
+        self._count(matches=1)
+        return lookup
+
+    def answer(self, lookup, source):
+        """JSON text for a lookup with a match, from the earlier result and at most a small update request,
+        indexed under source if the text changed; None when a full extraction is needed."""
+        match = lookup.match
+        if match is None:
+            return None
+        removed, added = changed_lines(match.text, lookup.text)
+        full_tokens = estimate_tokens(lookup.text) + estimate_tokens(match.result)
+        reuse = self.reuse_threshold is not None and match.similarity >= self.reuse_threshold
+        if not removed and not added or reuse:
+            logging.info(f"{source}: reusing the extraction of near-duplicate {match.source} "
+                         f"(similarity {match.similarity:.2f}, {len(removed) + len(added)} lines changed)")
+            self._count(reused=1, full_tokens_avoided=full_tokens)
+            if removed or added:
+                self.add(lookup, source, match.result)
+            return match.result
+        if self.update_request is None or len(removed) + len(added) > self.max_diff_lines:
+            self._count(diff_too_large=1)
+            return None
+        payload = build_update_payload(match.result, removed, added)
+        try:
+            answer = self.update_request(UPDATE_INSTRUCTION, payload)
+        except Exception as e:
+            logging.warning(f"{source}: update request for near-duplicate {match.source} failed: {str(e)}")
+            answer = None
+        prior, _ = parse_lenient(match.result)
+        update, _ = parse_lenient(answer) if answer else (None, [])
+        merged = merge_update(prior, update) if isinstance(prior, dict) else None
+        if merged is None:
+            self._count(update_failed=1)
+            return None
+        update_tokens = estimate_tokens(UPDATE_INSTRUCTION + payload) + estimate_tokens(answer)
+        self._count(updated=1, update_tokens=update_tokens, full_tokens_avoided=full_tokens)
+        answer = json.dumps(merged, ensure_ascii=False)
+        self.add(lookup, source, answer)
+        logging.info(f"{source}: updated the extraction of near-duplicate {match.source} "
+                     f"(similarity {match.similarity:.2f}, {len(removed)} lines removed, {len(added)} added, "
+                     f"fields {', '.join(update) or 'none'})")
+        return answer
+
+    def add(self, lookup, source, answer):
+        """Store the extraction answer for the text of lookup; answers that are not a JSON object are skipped."""
+        data, _ = parse_lenient(answer) if answer else (None, [])
+        if not isinstance(data, dict):
+            return
+        result = json.dumps(data, ensure_ascii=False)
+        text = zlib.compress(lookup.text.encode("utf-8"))
+        with self.lock:
+            cursor = self.conn.execute("INSERT INTO entries (source, signature, text, result, created) "
+                                       "VALUES (?, ?, ?, ?, ?)",
+                                       (source, lookup.signature.tobytes(), text, result, time.time()))
+            self.conn.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?)",
+                                  [(key, cursor.lastrowid) for key in lookup.band_keys])
+            self.conn.commit()
+        self._count(added=1)
+
+    def entries(self):
+        if not self.enabled:
+            return 0
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def log_stats(self):
+        if not self.enabled or not self.counters["lookups"]:
+            return
+        stats = self.stats()
+        logging.info(f"Near-duplicates: {stats['matches']} of {stats['lookups']} resumes matched an earlier one, "
+                     f"{stats['reused']} reused as is, {stats['updated']} updated with "
+                     f"{stats['update_tokens']} tokens instead of about {stats['full_tokens_avoided']}, "
+                     f"{stats['update_failed'] + stats['diff_too_large']} extracted in full.")
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+                self.conn = None
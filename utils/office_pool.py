@@ -0,0 +1,246 @@
+import logging
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+DEFAULT_INSTANCES = 2
+DEFAULT_TIMEOUT = 120
+DOCX_FILTER = "MS Word 2007 XML"
+
+# How long a freshly started instance gets to open its UNO socket
+STARTUP_TIMEOUT = 60
+
+
+def find_soffice():
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def uno_available():
+    try:
+        import uno  # noqa: F401  (python3-uno, shipped with LibreOffice)
+        return True
+    except ImportError:
+        return False
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _file_url(path):
+    return "file://" + os.path.abspath(path).replace(os.sep, "/")
+
+
+class OfficeInstance:
+    """One headless LibreOffice with its own user profile, converting one file at a time.
+
+    With python3-uno the office process is started once and kept running; each conversion
+    is a loadComponentFromURL/storeToURL round trip over its socket. Without uno every
+    conversion still launches soffice, but against this instance's persistent profile, so
+    instances never contend for a profile lock and profile creation is paid only once.
+    A conversion that exceeds the timeout kills the whole office process group; the
+    instance is restarted on its next use.
+    """
+
+    def __init__(self, index, soffice, work_dir, timeout=DEFAULT_TIMEOUT, use_uno=None):
+        self.index = index
+        self.soffice = soffice
+        self.timeout = timeout
+        self.use_uno = uno_available() if use_uno is None else use_uno
+        self.profile_dir = os.path.join(work_dir, f"profile_{index}")
+        self.output_dir = os.path.join(work_dir, f"out_{index}")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.process = None
+        self.desktop = None
+        self.conversions = 0
+        self.restarts = 0
+
+    def _base_command(self):
+        return [self.soffice, f"-env:UserInstallation={_file_url(self.profile_dir)}", "--headless", "--invisible",
+                "--nologo", "--norestore", "--nodefault", "--nolockcheck"]
+
+    def start(self):
+        if not self.use_uno or self.process is not None:
+            return
+        import uno
+        port = _free_port()
+        self.process = subprocess.Popen(
+            self._base_command() + [f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"office instance {self.index} did not start")
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        logging.info(f"Started office instance {self.index} (pid {self.process.pid}, port {port}).")
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._kill(self.process)
+            self.process = None
+
+    @staticmethod
+    def _kill(process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        process.wait()
+
+    def restart(self):
+        self.restarts += 1
+        logging.warning(f"Restarting office instance {self.index}.")
+        if self.process is not None:
+            self._kill(self.process)
+            self.process = None
+        self.desktop = None
+
+    def convert(self, doc_path):
+        """Convert doc_path to .docx in this instance's output directory and return the new path."""
+        docx_path = os.path.join(self.output_dir, os.path.splitext(os.path.basename(doc_path))[0] + ".docx")
+        if os.path.exists(docx_path):
+            os.remove(docx_path)
+        if self.use_uno:
+            self._convert_uno(doc_path, docx_path)
+        else:
+            self._convert_cli(doc_path)
+        self.conversions += 1
+        return docx_path if os.path.exists(docx_path) else None
+
+    def _convert_uno(self, doc_path, docx_path):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            return p
+
+        self.start()
+        process = self.process
+        # A hung load/store blocks the UNO call; killing office makes it raise instead
+        watchdog = threading.Timer(self.timeout, self._kill, (process,))
+        watchdog.start()
+        try:
+            document = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(doc_path)), "_blank", 0,
+                                                         (prop("Hidden", True), prop("ReadOnly", True)))
+            try:
+                document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(docx_path)), (prop("FilterName", DOCX_FILTER),))
+            finally:
+                document.close(True)
+        except Exception:
+            self.restart()
+            raise
+        finally:
+            watchdog.cancel()
+
+    def _convert_cli(self, doc_path):
+        process = subprocess.Popen(
+            self._base_command() + ["--convert-to", f"docx:{DOCX_FILTER}", "--outdir", self.output_dir, doc_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self._kill(process)
+            self.restarts += 1
+            raise TimeoutError(f"conversion of {doc_path} timed out after {self.timeout}s")
+
+
+class OfficeConversionPool:
+    """N office instances converting .doc files to .docx in parallel, into a scratch directory.
+
+    Nothing is set up until the first conversion, so runs without .doc files pay nothing; instances
+    are then started lazily and reused until close(). Each pool works in its own fresh subdirectory
+    of scratch_dir (profiles and converted files), so concurrent runs and service workers sharing
+    one scratch_dir never share a profile or overwrite each other's output; it is removed on
+    close(). Converted files are never written next to the inputs; callers remove them once read
+    (see release()).
+    """
+
+    def __init__(self, instances=DEFAULT_INSTANCES, scratch_dir=None, timeout=DEFAULT_TIMEOUT, soffice=None,
+                 use_uno=None):
+        self.soffice = soffice or find_soffice()
+        self.size = max(1, instances)
+        self.base_dir = scratch_dir
+        self.timeout = timeout
+        self.use_uno = use_uno
+        self.scratch_dir = None
+        self.instances = []
+        self._idle = queue.Queue()
+        self._setup_lock = threading.Lock()
+
+    def _setup(self):
+        """Create the scratch directory and the instances (with their profiles) on first use."""
+        with self._setup_lock:
+            if self.scratch_dir is not None:
+                return
+            if self.base_dir is not None:
+                os.makedirs(self.base_dir, exist_ok=True)
+            scratch_dir = tempfile.mkdtemp(prefix=f"office_pool_{os.getpid()}_", dir=self.base_dir)
+            self.instances = [OfficeInstance(i, self.soffice, scratch_dir, self.timeout, self.use_uno)
+                              for i in range(self.size)]
+            for instance in self.instances:
+                self._idle.put(instance)
+            self.scratch_dir = scratch_dir
+
+    def convert(self, doc_path):
+        """Convert one file on the next idle instance; a failed or hung conversion is retried once."""
+        if not self.soffice:
+            raise RuntimeError("LibreOffice (soffice) not found on PATH")
+        if self.scratch_dir is None:
+            self._setup()
+        instance = self._idle.get()
+        try:
+            try:
+                return instance.convert(doc_path)
+            except Exception as e:
+                logging.warning(f"Office instance {instance.index} failed on {doc_path} ({e}), retrying.")
+                return instance.convert(doc_path)
+        finally:
+            self._idle.put(instance)
+
+    @staticmethod
+    def release(docx_path):
+        """Delete a converted file once it has been read."""
+        try:
+            os.remove(docx_path)
+        except OSError:
+            pass
+
+    def stats(self):
+        return {
+            "instances": self.size,
+            "conversions": sum(i.conversions for i in self.instances),
+            "restarts": sum(i.restarts for i in self.instances),
+        }
+
+    def close(self):
+        for instance in self.instances:
+            instance.stop()
+        if self.scratch_dir is not None:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
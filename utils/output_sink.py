@@ -0,0 +1,334 @@
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from utils.manifest import output_name_for
+
+# Segments are closed and a new one started once they reach this size
+DEFAULT_SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+
+# Records appended between fsyncs (and index commits) of the JSONL sink
+DEFAULT_FSYNC_BATCH = 256
+
+# Seconds a record may wait for its fsync when fewer than DEFAULT_FSYNC_BATCH arrive
+DEFAULT_FSYNC_INTERVAL = 1.0
+
+SEGMENT_PATTERN = "results-{number:06d}.jsonl"
+INDEX_NAME = "index.sqlite3"
+LOCK_NAME = "sink.lock"
+
+SINKS = ("files", "jsonl")
+
+
+def _write_all(fd, data):
+    while data:
+        data = data[os.write(fd, data):]
+
+
+class FileSink:
+    """One <name>_extracted_info.json per input in directory (the original layout).
+
+    Each file is written to a temporary name beside it and renamed into place, so a crash leaves
+    either the previous output or the complete new one, never half a file. With fsync, the data
+    also survives a power loss, at the cost of one disk flush per file.
+    """
+
+    name = "files"
+
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        self.written = 0
+
+    def location(self, filename):
+        return os.path.join(self.directory, output_name_for(filename))
+
+    def exists(self, filename):
+        return os.path.exists(self.location(filename))
+
+    def locations(self, filenames):
+        """Output path of every filename that already has one, from a single directory listing."""
+        if not os.path.isdir(self.directory):
+            return {}
+        with os.scandir(self.directory) as it:
+            existing = {entry.name for entry in it}
+        return {f: os.path.join(self.directory, output_name_for(f)) for f in filenames
+                if output_name_for(f) in existing}
+
+    def write(self, filename, text):
+        """Write text as the output of filename; returns the output path."""
+        output_path = self.location(filename)
+        temp_path = os.path.join(self.directory,
+                                 f".{os.path.basename(output_path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.write("\n")
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.written += 1
+        return output_path
+
+    def read(self, filename):
+        try:
+            with open(self.location(filename), encoding="utf-8") as f:
+                return f.read().rstrip("\n")
+        except FileNotFoundError:
+            return None
+
+    def stats(self):
+        return {"sink": self.name, "written": self.written}
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """Append-only JSONL segments with a SQLite offset index (main.py --output-sink jsonl).
+
+    Every output is one line {"source": <input file>, "written_at": <epoch>, "data": <extracted JSON>}
+    appended to results-NNNNNN.jsonl; a segment is closed once it reaches segment_max_bytes. Lines
+    are handed to the OS as they are written, so a crash of the process loses nothing. They are
+    fsynced, and their (segment, offset, length) committed to index.sqlite3, every fsync_batch records
+    or fsync_interval seconds. On open, complete lines past the last indexed offset are indexed again
+    (an unreadable one is skipped, not indexed) and a torn last line is cut off. A source written twice has two lines; the index points at the
+    newest, and bulk readers (iter_results) should let later lines replace earlier ones.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, directory, segment_max_bytes=DEFAULT_SEGMENT_MAX_BYTES, fsync_batch=DEFAULT_FSYNC_BATCH,
+                 fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_batch = max(1, fsync_batch)
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.counters = {"written": 0, "fsyncs": 0, "segments": 0, "recovered": 0, "skipped": 0,
+                         "truncated_bytes": 0}
+        os.makedirs(directory, exist_ok=True)
+        self.lock_fd = self._lock_directory()
+        self.conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                source TEXT PRIMARY KEY,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                written_at REAL NOT NULL
+            )""")
+        self.conn.commit()
+        # Index rows of lines written since the last fsync, keyed by source
+        self.unsynced = {}
+        self.last_sync = time.monotonic()
+        self.fd = None
+        self._open_last_segment()
+        self.stopping = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, name="output-sink-fsync", daemon=True)
+        self.flusher.start()
+
+    def _lock_directory(self):
+        """Hold an exclusive lock on the directory, so two runs never append to the same segment."""
+        fd = os.open(os.path.join(self.directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            import fcntl
+        except ImportError:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise RuntimeError(f"{self.directory} is being written by another process")
+        return fd
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "results-*.jsonl")))
+
+    def _open_last_segment(self):
+        segments = self._segments()
+        if segments:
+            self.segment = segments[-1]
+            self._recover(self.segment)
+        else:
+            self.segment = os.path.join(self.directory, SEGMENT_PATTERN.format(number=1))
+        self.fd = os.open(self.segment, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.segment_size = os.fstat(self.fd).st_size
+        self.counters["segments"] = max(1, len(segments))
+
+    def _recover(self, segment):
+        """Index the complete lines after the last indexed one and cut off a torn last line."""
+        name = os.path.basename(segment)
+        row = self.conn.execute("SELECT MAX(offset + length) FROM records WHERE segment = ?", (name,)).fetchone()
+        start = row[0] or 0
+        rows = []
+        with open(segment, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                    rows.append((record["source"], name, offset, len(line), record.get("written_at", 0.0)))
+                except (ValueError, TypeError, KeyError):
+                    # A complete but unreadable line: leave it unindexed, keep the records after it
+                    logging.warning(f"Output sink: skipping an unreadable record at {segment}:{offset}")
+                    self.counters["skipped"] += 1
+                offset += len(line)
+            size = f.seek(0, os.SEEK_END)
+        if offset < size:
+            logging.warning(f"Output sink: cutting {size - offset} bytes of an incomplete record off {segment}")
+            os.truncate(segment, offset)
+            self.counters["truncated_bytes"] += size - offset
+        if rows:
+            self.conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+            self.counters["recovered"] += len(rows)
+            logging.info(f"Output sink: indexed {len(rows)} records written after the last index commit.")
+
+    def _rotate(self):
+        self._sync()
+        os.close(self.fd)
+        number = int(os.path.basename(self.segment)[len("results-"):-len(".jsonl")]) + 1
+        self.segment = os.path.join(self.directory, SEGMENT_PATTERN.format(number=number))
+        self.fd = os.open(self.segment, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.segment_size = 0
+        self.counters["segments"] += 1
+        logging.info(f"Output sink: started segment {self.segment}")
+
+    def _sync(self):
+        """fsync the current segment and commit the index rows of the lines it holds; call with the lock held."""
+        if not self.unsynced:
+            return
+        os.fsync(self.fd)
+        self.conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)", self.unsynced.values())
+        self.conn.commit()
+        self.unsynced = {}
+        self.last_sync = time.monotonic()
+        self.counters["fsyncs"] += 1
+
+    def _flush_periodically(self):
+        while not self.stopping.wait(self.fsync_interval / 2):
+            with self.lock:
+                if self.unsynced and time.monotonic() - self.last_sync >= self.fsync_interval:
+                    self._sync()
+
+    def location(self, filename):
+        return os.path.join(self.directory, output_name_for(filename))
+
+    def _lookup(self, filename):
+        with self.lock:
+            row = self.unsynced.get(filename)
+            if row is None:
+                row = self.conn.execute("SELECT source, segment, offset, length, written_at FROM records "
+                                        "WHERE source = ?", (filename,)).fetchone()
+        return row
+
+    def exists(self, filename):
+        return self._lookup(filename) is not None
+
+    def locations(self, filenames):
+        """Segment and offset of the latest record of every filename that has one."""
+        found = {}
+        with self.lock:
+            rows = {f: self.unsynced[f] for f in filenames if f in self.unsynced}
+            names = [f for f in filenames if f not in rows]
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                rows.update((row[0], row) for row in self.conn.execute(
+                    f"SELECT source, segment, offset, length, written_at FROM records "
+                    f"WHERE source IN ({','.join('?' * len(chunk))})", chunk))
+        for source, (_, segment, offset, _, _) in rows.items():
+            found[source] = f"{os.path.join(self.directory, segment)}:{offset}"
+        return found
+
+    def write(self, filename, text):
+        """Append the output of filename; returns "<segment path>:<offset>".
+
+        Raises ValueError unless text is a JSON object: anything else would not be a readable record.
+        """
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError(f"output of {filename} is not a JSON object")
+        # One record per line
+        text = json.dumps(data, ensure_ascii=False)
+        written_at = round(time.time(), 3)
+        line = (f'{{"source": {json.dumps(filename, ensure_ascii=False)}, "written_at": {written_at}, '
+                f'"data": {text}}}\n').encode("utf-8")
+        with self.lock:
+            if self.segment_size and self.segment_size + len(line) > self.segment_max_bytes:
+                self._rotate()
+            offset = self.segment_size
+            _write_all(self.fd, line)
+            self.segment_size += len(line)
+            segment = os.path.basename(self.segment)
+            self.unsynced[filename] = (filename, segment, offset, len(line), written_at)
+            self.counters["written"] += 1
+            if len(self.unsynced) >= self.fsync_batch:
+                self._sync()
+        return f"{self.segment}:{offset}"
+
+    def read(self, filename):
+        """Extracted JSON text of the latest record of filename, or None."""
+        row = self._lookup(filename)
+        if row is None:
+            return None
+        _, segment, offset, length, _ = row
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            record = json.loads(f.read(length))
+        return json.dumps(record["data"], ensure_ascii=False)
+
+    def flush(self):
+        with self.lock:
+            self._sync()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, sink=self.name, segment=os.path.basename(self.segment),
+                        segment_bytes=self.segment_size)
+
+    def close(self):
+        if self.fd is None:
+            return
+        self.stopping.set()
+        self.flusher.join()
+        with self.lock:
+            self._sync()
+            os.close(self.fd)
+            self.fd = None
+            self.conn.close()
+        os.close(self.lock_fd)
+        logging.info(f"Output sink: {self.stats()}")
+
+
+def iter_results(directory):
+    """Every record of a JSONL sink directory as a dict, oldest first; later records of a source replace earlier ones."""
+    for segment in sorted(glob.glob(os.path.join(directory, "results-*.jsonl"))):
+        with open(segment, "rb") as f:
+            for line in f:
+                if line.endswith(b"\n"):
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        logging.warning(f"Output sink: skipping an unreadable record in {segment}")
+
+
+def open_sink(kind, directory, **options):
+    """FileSink or JsonlSink writing to directory; options are passed to the sink's constructor."""
+    if kind == "files":
+        return FileSink(directory, **options)
+    if kind == "jsonl":
+        return JsonlSink(directory, **options)
+    raise ValueError(f"Unknown output sink {kind!r}, expected one of {', '.join(SINKS)}")
@@ -0,0 +1,216 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.json_repair import parse_lenient, repair
+from utils.prompt_compaction import estimate_tokens, build_user_message, compact_template
+
+# Resume text (estimated tokens) packed into one request, on top of the prompt and template sent once
+DEFAULT_PACK_TOKEN_BUDGET = 6000
+
+# Only resumes up to this many tokens are packed; longer ones gain little and get their own request
+DEFAULT_MAX_RESUME_TOKENS = 1500
+
+# Upper bound on resumes per request, so one bad answer never costs many fallback calls
+DEFAULT_MAX_PER_REQUEST = 8
+
+RESUME_HEADER = "### Resume {id}"
+
+PACK_INSTRUCTION = (
+    "The resume text below holds {count} separate resumes, each starting with a line \"### Resume <id>\". "
+    "Extract each resume on its own; never mix details between resumes. Respond with one valid JSON object "
+    "of the form {{\"resumes\": [{{\"resume_id\": \"<id>\", \"data\": <JSON following the template>}}, ...]}} "
+    "with exactly one entry per resume, in the order given."
+)
+
+
+def build_packed_message(user_prompt, json_template, resumes):
+    """User message asking for every (id, text) in resumes at once; the static prefix matches build_user_message."""
+    sections = "\n\n".join(f"{RESUME_HEADER.format(id=resume_id)}\n{text}" for resume_id, text in resumes)
+    return (f"{user_prompt}\nJson Template:\n{compact_template(json_template)}\n"
+            f"{PACK_INSTRUCTION.format(count=len(resumes))}\nResume text:\n{sections}")
+
+
+def pack(items, token_budget, max_per_request):
+    """First-fit decreasing bin packing of (key, tokens) items; returns lists of keys, one per request."""
+    bins = []
+    for key, tokens in sorted(items, key=lambda item: item[1], reverse=True):
+        for packed in bins:
+            if packed["tokens"] + tokens <= token_budget and len(packed["keys"]) < max_per_request:
+                packed["keys"].append(key)
+                packed["tokens"] += tokens
+                break
+        else:
+            bins.append({"keys": [key], "tokens": tokens})
+    return [packed["keys"] for packed in bins]
+
+
+def split_packed(answer, resume_ids):
+    """Map each resume id to its slice of a packed answer (a JSON string), or None if it is missing."""
+    data, _ = parse_lenient(answer) if answer else (None, [])
+    slices = dict.fromkeys(resume_ids)
+    if isinstance(data, dict):
+        # {"resumes": [...]} as asked, or the ids used directly as keys
+        entries = data.get("resumes", data.get("results"))
+        if entries is None:
+            entries = [{"resume_id": key, "data": value} for key, value in data.items()]
+    else:
+        entries = data
+    if not isinstance(entries, list):
+        return slices
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        resume_id = str(entry.get("resume_id", entry.get("id", "")))
+        value = entry.get("data")
+        if resume_id in slices and slices[resume_id] is None and isinstance(value, dict):
+            slices[resume_id] = json.dumps(value, ensure_ascii=False)
+    return slices
+
+
+class ResumePacker:
+    """Sends several short resumes in one extraction request (main.py --pack).
+
+    process(filenames) extracts the text of every file, bin-packs the short ones into requests of
+    at most token_budget resume tokens (the system prompt and template are paid once per request
+    instead of once per resume), and asks for one JSON object {"resumes": [{"resume_id", "data"}, ...]}
+    (PACK_INSTRUCTION), one entry per resume id. Each slice of the answer is checked against the
+    template; slices that are missing or need more than local repair, and resumes too long to pack,
+    go through the usual single-file extraction.
+    """
+
+    def __init__(self, processor, token_budget=DEFAULT_PACK_TOKEN_BUDGET, max_resume_tokens=DEFAULT_MAX_RESUME_TOKENS,
+                 max_per_request=DEFAULT_MAX_PER_REQUEST, enabled=True):
+        self.processor = processor
+        self.client = processor.client
+        self.token_budget = token_budget
+        self.max_resume_tokens = max_resume_tokens
+        self.max_per_request = max(1, max_per_request)
+        self.enabled = enabled
+        # Tokens of the system prompt and user message without any resume: what packing saves per resume
+        self.fixed_tokens = estimate_tokens(processor.system_prompt) + estimate_tokens(
+            build_user_message(processor.user_prompt, processor.json_template, ""))
+        self.counters = {"resumes": 0, "packed": 0, "packed_requests": 0, "single_requests": 0, "fallbacks": 0,
+                         "prompt_tokens": 0, "completion_tokens": 0}
+        # Near-duplicate lookups of resumes waiting for their extraction, by filename
+        self.lookups = {}
+        self.lock = threading.Lock()
+
+    def _count(self, **counters):
+        with self.lock:
+            for name, increment in counters.items():
+                self.counters[name] += increment
+
+    def _single(self, filename, resume_text):
+        answer = self.client.extract(self.processor.system_prompt, self.processor.user_prompt,
+                                     self.processor.json_template, resume_text, label=filename)
+        self._remember(filename, answer)
+        self._count(single_requests=1, prompt_tokens=self.fixed_tokens + estimate_tokens(resume_text or ""),
+                    completion_tokens=estimate_tokens(answer) if answer else 0)
+        self.processor.write_output_file(filename, answer)
+
+    def _packed(self, filenames, texts):
+        resume_ids = [f"R{i + 1}" for i in range(len(filenames))]
+        resumes = list(zip(resume_ids, (texts[f] for f in filenames)))
+        label = f"{filenames[0]} (+{len(filenames) - 1} packed)"
+        answer = self.client.extract(self.processor.system_prompt, self.processor.user_prompt,
+                                     self.processor.json_template, resumes, label=label)
+        self._count(packed_requests=1,
+                    prompt_tokens=estimate_tokens(self.processor.system_prompt) + estimate_tokens(
+                        build_packed_message(self.processor.user_prompt, self.processor.json_template, resumes)),
+                    completion_tokens=estimate_tokens(answer) if answer else 0)
+        slices = split_packed(answer, resume_ids)
+        for resume_id, filename in zip(resume_ids, filenames):
+            content = slices[resume_id]
+            result = repair(content, self.processor.json_template) if content is not None else None
+            if result is None or result.data is None or result.problems:
+                logging.warning(f"{filename}: packed answer slice unusable, extracting it on its own")
+                self._count(fallbacks=1)
+                self._single(filename, texts[filename])
+                continue
+            self._count(packed=1)
+            self._remember(filename, content)
+            self.processor.write_output_file(filename, content)
+
+    def _near_duplicate(self, filename, resume_text):
+        """Write filename from the extraction of an earlier near-duplicate if possible; True when it was."""
+        index = self.processor.near_duplicates
+        if index is None or not index.enabled or not isinstance(resume_text, str) or not resume_text.strip():
+            return False
+        with self.processor.tracer.span("near_dup", file=filename):
+            lookup = index.lookup(resume_text)
+        answer = index.answer(lookup, filename)
+        if answer is None:
+            # Indexed once its own extraction is known
+            with self.lock:
+                self.lookups[filename] = lookup
+            return False
+        self.processor.write_output_file(filename, answer)
+        return True
+
+    def _remember(self, filename, answer):
+        with self.lock:
+            lookup = self.lookups.pop(filename, None)
+        if lookup is not None:
+            self.processor.near_duplicates.add(lookup, filename, answer)
+
+    def _run(self, unit, texts):
+        kind, filenames = unit
+        try:
+            if kind == "packed":
+                self._packed(filenames, texts)
+            else:
+                self._single(filenames[0], texts[filenames[0]])
+        except Exception as e:
+            logging.error(f"Error extracting {', '.join(filenames)}: {str(e)}")
+
+    def process(self, filenames):
+        """Extract and write every (non-image) file, packing the short ones."""
+        start_time = time.time()
+        processor = self.processor
+        texts = {}
+        processor.warm_pdf_workers(filenames)
+
+        def read(filename):
+            try:
+                text = processor.resume_text(filename)
+                # Resubmitted CVs are answered here and never packed
+                if not self._near_duplicate(filename, text):
+                    texts[filename] = text
+            except Exception as e:
+                logging.error(f"Error reading {filename}: {str(e)}")
+
+        with ThreadPoolExecutor(max_workers=processor.workers, thread_name_prefix="extract") as executor:
+            list(executor.map(read, filenames))
+            readable = [f for f in filenames if texts.get(f) is not None]
+            sizes = {f: estimate_tokens(texts[f]) for f in readable}
+            short = [(f, sizes[f]) for f in readable if sizes[f] <= self.max_resume_tokens]
+            units = [("packed" if len(keys) > 1 else "single", keys)
+                     for keys in pack(short, self.token_budget, self.max_per_request)]
+            units += [("single", [f]) for f in readable if sizes[f] > self.max_resume_tokens]
+            self._count(resumes=len(readable))
+            logging.info(f"Packing {len(short)} of {len(readable)} resumes into "
+                         f"{sum(1 for kind, _ in units if kind == 'packed')} requests.")
+            list(executor.map(lambda unit: self._run(unit, texts), units))
+        logging.info(f"Processed {len(filenames)} files with packing in {time.time() - start_time:.2f} seconds.")
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        resumes = stats["resumes"] or 1
+        requests = stats["packed_requests"] + stats["single_requests"]
+        stats["requests_per_resume"] = round(requests / resumes, 3)
+        stats["prompt_tokens_per_resume"] = round(stats["prompt_tokens"] / resumes, 1)
+        stats["completion_tokens_per_resume"] = round(stats["completion_tokens"] / resumes, 1)
+        return stats
+
+    def log_stats(self):
+        if not self.counters["resumes"]:
+            return
+        stats = self.stats()
+        logging.info(f"Resume packing: {stats['resumes']} resumes in {stats['packed_requests']} packed and "
+                     f"{stats['single_requests']} single requests ({stats['fallbacks']} fallbacks); "
+                     f"{stats['requests_per_resume']} requests, {stats['prompt_tokens_per_resume']} prompt and "
+                     f"{stats['completion_tokens_per_resume']} completion tokens per resume (estimated).")
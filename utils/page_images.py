@@ -0,0 +1,121 @@
+import base64
+import io
+import logging
+import os
+from zipfile import ZipFile
+
+from utils.image_optimizer import ImageOptimizer
+
+# gpt-4o (detail=high) scales every image to fit 2048x2048 and then its short side to 768px;
+# anything sent above that resolution is uploaded only to be thrown away.
+DEFAULT_MAX_LONG_EDGE = 2048
+DEFAULT_MAX_SHORT_EDGE = 768
+DEFAULT_JPEG_QUALITY = 80
+DEFAULT_MAX_IMAGES = 10
+DEFAULT_MAX_PAYLOAD_BYTES = 8 * 1024 * 1024
+
+
+class PageImageBudget:
+    """Limits for the images sent to the vision model for one document."""
+
+    def __init__(self, max_long_edge=DEFAULT_MAX_LONG_EDGE, max_short_edge=DEFAULT_MAX_SHORT_EDGE,
+                 jpeg_quality=DEFAULT_JPEG_QUALITY, max_images=DEFAULT_MAX_IMAGES,
+                 max_payload_bytes=DEFAULT_MAX_PAYLOAD_BYTES):
+        self.max_long_edge = max_long_edge
+        self.max_short_edge = max_short_edge
+        self.jpeg_quality = jpeg_quality
+        self.max_images = max_images
+        self.max_payload_bytes = max_payload_bytes
+
+    def scale_for(self, width, height):
+        """Factor (<= 1) that brings a width x height image down to the vision model's resolution."""
+        long_edge, short_edge = max(width, height), min(width, height)
+        if not long_edge:
+            return 1.0
+        return min(1.0, self.max_long_edge / long_edge, self.max_short_edge / short_edge)
+
+
+def _source_name(source, name=None):
+    """Label for log messages: name, else the file name of a path (uploads arrive as bytes)."""
+    if name:
+        return name
+    return os.path.basename(source) if isinstance(source, str) else "<bytes>"
+
+
+def iter_pdf_pages(pdf_path, budget, grayscale=False, pages=None):
+    """Yield one JPEG per PDF page (path or bytes), rendered directly at the vision model's resolution.
+
+    pages limits rendering to those (0-based) page numbers. Only one page's pixmap is alive
+    at a time, and it is never larger than the budget's long/short edge, whatever the DPI
+    of the scan inside it.
+    """
+    import fitz  # PyMuPDF
+    if isinstance(pdf_path, (bytes, bytearray)):
+        pdf = fitz.open(stream=bytes(pdf_path), filetype="pdf")
+    else:
+        pdf = fitz.open(pdf_path)
+    with pdf:
+        for page in (pdf if pages is None else (pdf[i] for i in pages)):
+            rect = page.rect
+            # Page size is in points (1/72"): pick the zoom that lands on the target pixel size
+            long_pts, short_pts = max(rect.width, rect.height), min(rect.width, rect.height)
+            zoom = min(budget.max_long_edge / long_pts, budget.max_short_edge / short_pts)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY if grayscale else fitz.csRGB, alpha=False)
+            jpeg = pixmap.tobytes("jpeg", jpg_quality=budget.jpeg_quality)
+            del pixmap
+            yield jpeg
+
+
+def pdf_pages_with_graphics(pdf_path, pages):
+    """The pages (0-based) among pages that hold an image or a vector drawing; blank ones are left out."""
+    import fitz  # PyMuPDF
+    if isinstance(pdf_path, (bytes, bytearray)):
+        pdf = fitz.open(stream=bytes(pdf_path), filetype="pdf")
+    else:
+        pdf = fitz.open(pdf_path)
+    with pdf:
+        return [i for i in pages if pdf[i].get_images() or pdf[i].get_drawings()]
+
+
+def iter_docx_images(docx_path, optimizer, name=None):
+    """Yield one optimized JPEG per image embedded in a DOCX (path or bytes, word/media/*), one at a time."""
+    name = _source_name(docx_path, name)
+    source = io.BytesIO(docx_path) if isinstance(docx_path, (bytes, bytearray)) else docx_path
+    with ZipFile(source, "r") as docx_zip:
+        for member in sorted(n for n in docx_zip.namelist() if n.startswith("word/media/")):
+            try:
+                jpeg = optimizer.optimize(docx_zip.read(member), f"{name}:{member}")
+            except Exception as e:
+                # EMF/WMF and other formats PIL cannot open are not worth a failed resume
+                logging.warning(f"Skipping unreadable image {member} in {name}: {str(e)}")
+                continue
+            yield jpeg
+
+
+def collect_images(images, budget, source=""):
+    """Base64-encode images until the image-count or payload budget is reached."""
+    encoded = []
+    total = 0
+    for count, jpeg in enumerate(images):
+        b64 = base64.b64encode(jpeg).decode("ascii")
+        if count >= budget.max_images or (encoded and total + len(b64) > budget.max_payload_bytes):
+            logging.warning(f"{source}: image budget reached, sending the first {len(encoded)} images only.")
+            break
+        encoded.append(b64)
+        total += len(b64)
+    if encoded:
+        logging.info(f"{source}: {len(encoded)} images, {total / 1024:.0f} KiB of base64 for the vision request.")
+    return encoded
+
+
+def pdf_page_images(pdf_path, budget=None, grayscale=False, name=None, pages=None):
+    budget = budget or PageImageBudget()
+    source = name or (pdf_path if isinstance(pdf_path, str) else "<bytes>")
+    return collect_images(iter_pdf_pages(pdf_path, budget, grayscale, pages), budget, source)
+
+
+def docx_images(docx_path, budget=None, optimizer=None, name=None):
+    budget = budget or PageImageBudget()
+    optimizer = optimizer or ImageOptimizer(budget)
+    source = name or (docx_path if isinstance(docx_path, str) else "<bytes>")
+    return collect_images(iter_docx_images(docx_path, optimizer, name), budget, source)
@@ -0,0 +1,125 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Pages with fewer non-whitespace characters than this are treated as having no text layer
+DEFAULT_EMPTY_PAGE_CHARS = 20
+
+# Documents shorter than this are extracted in-process; forking work out only pays off for long PDFs
+PARALLEL_MIN_PAGES = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PdfText:
+    """Per-page text of a PDF plus the pages that look scanned (near-empty text layer)."""
+
+    def __init__(self, pages, empty_page_chars=DEFAULT_EMPTY_PAGE_CHARS):
+        self.pages = pages
+        self.empty_pages = [i for i, page in enumerate(pages) if len("".join(page.split())) < empty_page_chars]
+
+    @property
+    def text(self):
+        # Joined without separators, exactly like the previous PyPDFLoader-based code
+        return "".join(self.pages)
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+
+def _open_pymupdf(source):
+    import fitz  # PyMuPDF
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def _pymupdf_page_range(source, start, stop):
+    """Worker entry point: each process opens its own document handle (PyMuPDF is not thread-safe)."""
+    with _open_pymupdf(source) as pdf:
+        return [pdf[i].get_text("text") for i in range(start, stop)]
+
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Workers come from a clean forkserver (spawn where there is none), never forked from a caller
+            # that may already run threads, whenever the pool is first needed
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def warm_pool(workers):
+    """Start the page workers now, so the first long PDF does not wait for them."""
+    if workers > 1:
+        _get_pool(workers).submit(os.getpid).result()
+
+
+def extract_pymupdf(source, workers=1):
+    with _open_pymupdf(source) as pdf:
+        page_count = len(pdf)
+        if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+            return [page.get_text("text") for page in pdf]
+
+    # Split the document into one contiguous page range per worker
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    pool = _get_pool(workers)
+    futures = [pool.submit(_pymupdf_page_range, source, start, stop) for start, stop in ranges]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def extract_pypdf(source, workers=1):
+    from io import BytesIO
+    from pypdf import PdfReader
+    reader = PdfReader(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def extract_langchain(source, workers=1):
+    """The original PyPDFLoader path, kept for comparison."""
+    from langchain_community.document_loaders import PyPDFLoader
+    return [page.page_content for page in PyPDFLoader(source).load()]
+
+
+BACKENDS = {
+    "pymupdf": extract_pymupdf,
+    "pypdf": extract_pypdf,
+    "langchain": extract_langchain,
+}
+
+
+def extract_pdf_text(source, backend="pymupdf", workers=1, empty_page_chars=DEFAULT_EMPTY_PAGE_CHARS):
+    """Extract per-page text from a PDF path (or bytes) with the chosen backend.
+
+    Falls back to pypdf when PyMuPDF cannot open the file, since the two parsers
+    tolerate different kinds of damage.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF text backend '{backend}', expected one of {sorted(BACKENDS)}")
+    try:
+        pages = BACKENDS[backend](source, workers)
+    except Exception as e:
+        if backend != "pymupdf":
+            raise
+        name = os.path.basename(source) if isinstance(source, str) else "<bytes>"
+        logging.warning(f"PyMuPDF failed on {name} ({e}), retrying with pypdf")
+        pages = extract_pypdf(source)
+    return PdfText(pages, empty_page_chars)
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
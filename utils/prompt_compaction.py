@@ -0,0 +1,216 @@
+import json
+import logging
+import re
+import unicodedata
+from collections import Counter
+
+# Resume text beyond this many (estimated) tokens is truncated before it is sent
+DEFAULT_TOKEN_BUDGET = 6000
+
+# Share of the budget kept from the start of the resume when truncating; the rest comes from the end
+HEAD_SHARE = 0.75
+
+# How many lines at the top and bottom of each page are candidates for running headers/footers,
+# and on what share of pages a line must recur there to be dropped
+EDGE_LINES = 3
+REPEATED_EDGE_SHARE = 0.5
+
+# Lines shorter than this are never dropped as duplicates ("Skills", "Responsibilities:", dates)
+MIN_DEDUPE_LINE_CHARS = 25
+
+TRUNCATION_MARKER = "[...]"
+
+RESPONSE_INSTRUCTION = "Please respond in valid JSON format according to the given template."
+
+_CID_ARTIFACT = re.compile(r"\(cid:\d+\)")
+_INVISIBLE = re.compile("[\u200b\u200c\u200d\u2060\ufeff\u00ad]")
+_BULLETS = re.compile("^[\u2022\u25cf\u25aa\u25a0\u2023\u2043\u25e6\u2219\uf0b7\uf0a7]\\s*")
+_SPACES = re.compile(r"[ \t\f\v]+")
+_HYPHENATED_BREAK = re.compile(r"([a-z])-\n([a-z])")
+_DIGITS = re.compile(r"\d+")
+_LETTER = re.compile(r"[^\W\d_]")
+# "3", "Page 3", "3 of 5", "Page 3/5": short numbers only, so phone numbers and years are never taken for one
+_PAGE_NUMBER = re.compile(r"^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$", re.IGNORECASE)
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Token count with tiktoken when installed, else the usual ~4 characters per token estimate."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def compact_template(json_template):
+    """The template as minified JSON (instead of the Python repr of the dict)."""
+    if isinstance(json_template, str):
+        try:
+            json_template = json.loads(json_template)
+        except ValueError:
+            return json_template.strip()
+    return json.dumps(json_template, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_user_message(user_prompt, json_template, resume_text):
+    """User message with everything static first, so provider-side prompt caching can reuse the prefix."""
+    return (f"{user_prompt}\nJson Template:\n{compact_template(json_template)}\n{RESPONSE_INSTRUCTION}\n"
+            f"Resume text:\n{resume_text}")
+
+
+def _clean_line(line):
+    line = _CID_ARTIFACT.sub("", line)
+    line = _BULLETS.sub("- ", line.strip())
+    return _SPACES.sub(" ", line).strip()
+
+
+def _edge_key(line):
+    # Page numbers and dates differ from page to page; compare running lines with digits masked
+    return _DIGITS.sub("#", line.lower())
+
+
+def _repeated_edges(pages):
+    """Masked forms of lines that recur at the top/bottom of enough pages to be running headers/footers."""
+    if len(pages) < 2:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        content = [line for line in lines if line]
+        edges = set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+        # A line of digits alone (a phone number, a year) is data, never a running header
+        counts.update({_edge_key(line) for line in edges if _LETTER.search(line)})
+    threshold = max(2, REPEATED_EDGE_SHARE * len(pages))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def normalize_text(text, pages=None):
+    """Deterministic cleanup of extracted resume text.
+
+    Collapses whitespace and blank lines, fixes PDF artifacts (cid glyph codes, invisible
+    characters, bullets, words hyphenated across lines), keeps only the first copy of running
+    page headers/footers and drops page numbers ("3", "Page 3 of 5") when page boundaries are
+    known, and removes repeated lines.
+    """
+    page_texts = pages if pages else [text]
+    page_lines = []
+    for page in page_texts:
+        page = unicodedata.normalize("NFKC", _INVISIBLE.sub("", page))
+        page = _HYPHENATED_BREAK.sub(r"\1\2", page.replace("\r\n", "\n").replace("\r", "\n"))
+        page_lines.append([_clean_line(line) for line in page.split("\n")])
+
+    edges = _repeated_edges(page_lines) if pages else set()
+    out = []
+    seen = set()
+    kept_edges = set()
+    for lines in page_lines:
+        content = [line for line in lines if line]
+        edge_lines = set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+        for line in lines:
+            if not line:
+                if out and out[-1]:
+                    out.append("")
+                continue
+            key = _edge_key(line)
+            if pages and line in edge_lines:
+                if _PAGE_NUMBER.match(line):
+                    continue
+                # Running headers often carry the candidate's name and contact details: keep the first copy
+                if key in edges:
+                    if key in kept_edges:
+                        continue
+                    kept_edges.add(key)
+            if out and line == out[-1]:
+                continue
+            if len(line) >= MIN_DEDUPE_LINE_CHARS:
+                if line in seen:
+                    continue
+                seen.add(line)
+            out.append(line)
+    return "\n".join(out).strip()
+
+
+def _cut_line(line, token_budget, keep_end=False):
+    """The longest start (or end, with keep_end) of line within token_budget, cut at a space where one is near."""
+    low, high = 0, len(line)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(line[len(line) - middle:] if keep_end else line[:middle]) <= token_budget:
+            low = middle
+        else:
+            high = middle - 1
+    piece = line[len(line) - low:] if keep_end else line[:low]
+    if low == len(line):
+        return piece
+    # Drop the partial word, unless the piece is one long word
+    if keep_end:
+        space = piece.find(" ")
+        return piece[space + 1:] if 0 <= space < len(piece) // 2 else piece
+    space = piece.rfind(" ")
+    return piece[:space] if space >= len(piece) // 2 else piece
+
+
+def truncate_to_budget(text, token_budget):
+    """Keep the start and the end of the text within token_budget, cutting at line boundaries.
+
+    The top of a resume (contact details, latest roles) is the most valuable part, so it gets
+    HEAD_SHARE of the budget; the remainder goes to the end (education, older roles). A first
+    or last line longer than its whole share (text without line breaks) is cut inside the line,
+    so the result always keeps some of the text, never just the marker.
+    """
+    if token_budget is None or token_budget <= 0 or estimate_tokens(text) <= token_budget:
+        return text
+    lines = text.split("\n")
+    head_budget = int(token_budget * HEAD_SHARE)
+    tail_budget = token_budget - head_budget - estimate_tokens(TRUNCATION_MARKER)
+
+    head, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > head_budget:
+            break
+        head.append(line)
+        used += cost
+    rest = lines[len(head):]
+    head_cut = _cut_line(rest[0], head_budget - 1) if not head and head_budget > 1 else ""
+    tail, used = [], 0
+    for line in reversed(rest):
+        cost = estimate_tokens(line) + 1
+        if used + cost > tail_budget:
+            break
+        tail.append(line)
+        used += cost
+    if not tail and tail_budget > 1:
+        tail_cut = _cut_line(rest[-1], tail_budget - 1, keep_end=True)
+        if tail_cut:
+            tail.append(tail_cut)
+    if head_cut:
+        head.append(head_cut)
+    if not head and not tail:
+        # Budget too small to share: spend it all on the start of the text
+        return _cut_line(text, token_budget)
+    return "\n".join(head + [TRUNCATION_MARKER] + tail[::-1])
+
+
+class PromptCompactor:
+    """Normalizes resume text and enforces the token budget; logs tokens before and after per file."""
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, enabled=True):
+        self.token_budget = token_budget
+        self.enabled = enabled
+
+    def compact(self, text, pages=None, name=""):
+        if not self.enabled or not text:
+            return text
+        before = estimate_tokens(text)
+        compacted = truncate_to_budget(normalize_text(text, pages), self.token_budget)
+        after = estimate_tokens(compacted)
+        truncated = " (truncated to budget)" if TRUNCATION_MARKER in compacted and TRUNCATION_MARKER not in text else ""
+        logging.info(f"Prompt compaction for {name}: ~{before} -> ~{after} resume tokens{truncated}.")
+        return compacted
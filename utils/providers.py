@@ -0,0 +1,82 @@
+import copy
+
+# Every provider speaks the OpenAI chat-completions protocol; they differ in URL, model and sampling
+# parameters. These defaults reproduce the requests the client has always sent, so cache keys are stable.
+DEFAULT_PROVIDERS = {
+    "cerebras": {
+        "url": "https://api.cerebras.ai/v1/chat/completions",
+        "model": "llama-3.3-70b",
+        # The client's api_key has always been the Cerebras key; other providers need their own
+        "uses_client_key": True,
+        "params": {"max_completion_tokens": -1, "temperature": 0.2, "top_p": 1, "seed": 0, "stream": False},
+    },
+    "together": {
+        "url": "https://api.together.xyz/v1/chat/completions",
+        "model": "meta-llama/Llama-3.3-70B-Instruct-Turbo",
+        "params": {"max_tokens": None, "temperature": 0.7, "top_p": 0.7, "top_k": 50, "repetition_penalty": 1,
+                   "stop": ["<|eot_id|>", "<|eom_id|>"]},
+    },
+    "openai": {
+        "url": "https://api.openai.com/v1/chat/completions",
+        "model": "gpt-4o-mini",
+        "params": {},
+    },
+}
+
+# Requests allowed in flight per provider when the registry does not say
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+class ProviderSpec:
+    """One chat-completions backend: where to send requests and how to fill them in."""
+
+    def __init__(self, name, url, model, params=None, api_key=None, weight=1.0, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 uses_client_key=False):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.params = dict(params or {})
+        # None means the client's api_key if uses_client_key, else no key: requests are refused
+        self.api_key = api_key
+        self.uses_client_key = uses_client_key
+        # Static preference, multiplied into the router's measured score
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+
+    def key(self, default_api_key):
+        """This provider's API key; default_api_key (the client's) only if uses_client_key."""
+        key = self.api_key or (default_api_key if self.uses_client_key else None)
+        if not key:
+            raise ValueError(f"No API key for provider {self.name}: set api_key in its LLM_PROVIDERS entry")
+        return key
+
+    def headers(self, default_api_key):
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.key(default_api_key)}"
+        }
+
+    def request(self, messages):
+        return dict({"model": self.model, "messages": messages}, **copy.deepcopy(self.params))
+
+
+def build_registry(overrides=None, urls=None):
+    """ProviderSpecs for DEFAULT_PROVIDERS updated with overrides (name -> dict of ProviderSpec fields).
+
+    Overrides may also add providers; a new entry needs at least url and model. urls (name -> url)
+    replaces just the endpoint, e.g. to point a provider at a local stand-in server.
+    """
+    entries = copy.deepcopy(DEFAULT_PROVIDERS)
+    for name, fields in (overrides or {}).items():
+        entry = entries.setdefault(name, {})
+        if "params" in fields and "params" in entry:
+            fields = dict(fields, params=dict(entry["params"], **fields["params"]))
+        entry.update(fields)
+    for name, url in (urls or {}).items():
+        entries.setdefault(name, {})["url"] = url
+    registry = {}
+    for name, entry in entries.items():
+        if not entry.get("url") or not entry.get("model"):
+            raise ValueError(f"Provider {name} needs at least a url and a model")
+        registry[name] = ProviderSpec(name, **entry)
+    return registry
@@ -0,0 +1,120 @@
+import logging
+import re
+import threading
+import time
+
+# Header pairs (remaining, reset) published by the providers we talk to.
+# OpenAI and Together use the *-requests/-tokens names, Cerebras adds a -minute/-day suffix.
+RATE_LIMIT_HEADER_PAIRS = [
+    ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+    ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+    ("x-ratelimit-remaining-requests-minute", "x-ratelimit-reset-requests-minute"),
+    ("x-ratelimit-remaining-tokens-minute", "x-ratelimit-reset-tokens-minute"),
+    ("x-ratelimit-remaining-requests-day", "x-ratelimit-reset-requests-day"),
+    ("x-ratelimit-remaining", "x-ratelimit-reset"),
+]
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value):
+    """Parse a reset/retry header ("20ms", "1.5s", "6m0s", "2") into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    multipliers = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(amount) * multipliers[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker calling the same provider.
+
+    The configured rate is a ceiling. A 429 halves the effective rate and pauses the
+    bucket for Retry-After; successful calls grow it back additively (AIMD), and
+    exhausted rate-limit headers pause the bucket until the advertised reset.
+    """
+
+    def __init__(self, name, requests_per_minute, burst=None):
+        self.name = name
+        self.max_rate = requests_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = float(burst) if burst else max(1.0, requests_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self.last_refill = time.monotonic()
+        self.throttled = 0
+        self.consecutive_throttles = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+
+    def acquire(self):
+        """Block until a request may be sent; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    delay = (1.0 - self.tokens) / self.rate
+            delay = min(max(delay, 0.001), 5.0)
+            time.sleep(delay)
+            waited += delay
+
+    def update_from_headers(self, headers):
+        """Pause the bucket when the provider reports an exhausted rate-limit window."""
+        if not headers:
+            return
+        for remaining_header, reset_header in RATE_LIMIT_HEADER_PAIRS:
+            remaining = headers.get(remaining_header)
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            with self.lock:
+                if remaining < self.tokens:
+                    self.tokens = max(0.0, remaining)
+                if remaining <= 0:
+                    reset = parse_duration(headers.get(reset_header)) or 1.0
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + reset)
+                    logging.warning(f"[{self.name}] rate limit window exhausted ({remaining_header}), pausing {reset:.2f}s")
+
+    def on_success(self):
+        with self.lock:
+            self.consecutive_throttles = 0
+            # Additive increase: recover 5% of the configured ceiling per successful call
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_rate_limited(self, retry_after=None):
+        """Handle an HTTP 429: back off for Retry-After and halve the sending rate."""
+        with self.lock:
+            self.throttled += 1
+            self.consecutive_throttles += 1
+            delay = parse_duration(retry_after)
+            if delay is None:
+                delay = min(60.0, 2.0 ** min(self.consecutive_throttles, 6))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.rate = max(self.max_rate / 64.0, self.rate / 2.0)
+            self.tokens = 0.0
+        logging.warning(f"[{self.name}] HTTP 429 received, backing off {delay:.2f}s (rate now {self.rate * 60:.1f} req/min)")
+        return delay
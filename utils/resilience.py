@@ -0,0 +1,363 @@
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from utils.prompt_compaction import estimate_tokens
+
+# HTTP statuses worth retrying on the same provider; other 4xx answers will not change on retry
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504, 520, 522, 524, 529}
+
+# Successful call latencies remembered per provider for the hedge delay
+LATENCY_WINDOW = 200
+# Below this many samples the hedge delay is the configured initial delay
+MIN_LATENCY_SAMPLES = 20
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# Set in the context of each hedged request; set() once the other request of the hedge has won
+_cancel_event = contextvars.ContextVar("hedge_cancel_event", default=None)
+
+
+class ProviderError(Exception):
+    """A provider answered with an error status, or its answer was unusable (status None)."""
+
+    def __init__(self, provider, status, message=""):
+        super().__init__(f"[{provider}] {status or 'failed'}: {message}"[:500])
+        self.provider = provider
+        self.status = status
+
+    @property
+    def retryable(self):
+        return self.status is None or self.status in RETRYABLE_STATUSES
+
+
+class RequestCancelled(Exception):
+    """Raised inside a hedged request that lost to the other one; partial is what it had streamed."""
+
+    def __init__(self, provider, partial=""):
+        super().__init__(f"[{provider}] cancelled: the hedged request lost")
+        self.provider = provider
+        self.partial = partial
+
+
+def check_cancelled(provider):
+    """Raise RequestCancelled if the hedged request running in this context has lost."""
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise RequestCancelled(provider)
+
+
+def until_cancelled(provider, deltas):
+    """Pass deltas through until the hedged request running in this context loses, then raise
+    RequestCancelled; the caller leaving its stream block closes the connection and ends the generation."""
+    event = _cancel_event.get()
+    if event is None:
+        yield from deltas
+        return
+    parts = []
+    for delta in deltas:
+        if event.is_set():
+            raise RequestCancelled(provider, "".join(parts))
+        parts.append(delta)
+        yield delta
+
+
+def request_tokens(args):
+    """Estimated prompt tokens of a call's arguments (prompts, template and resume text)."""
+    return sum(estimate_tokens(arg if isinstance(arg, str) else json.dumps(arg, default=str))
+               for arg in args if arg is not None)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n sleeps uniform(0, min(max_delay, base_delay * 2**n))."""
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0, rng=None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt):
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Per-provider breaker: opens after failure_threshold consecutive failures, stops sending to the
+    provider for reset_timeout seconds, then lets a single trial call through (half-open). The trial
+    closes the breaker on success and reopens it on failure."""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    def available(self):
+        """Whether allow() could let a call through now; unlike allow() it does not claim the trial call."""
+        with self.lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.state == CLOSED or not self.trial_in_flight
+
+    def allow(self):
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logging.info(f"[{self.name}] circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                logging.warning(f"[{self.name}] circuit open after {self.failures} consecutive failures, "
+                                f"pausing for {self.reset_timeout:.0f}s")
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one provider."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def quantile(self, q):
+        with self.lock:
+            if len(self.samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """Calls an ordered list of providers with retries, circuit breakers and optional hedging.
+
+    providers is [(name, call)], preferred first; call(*args) returns an answer or raises
+    (ProviderError, network errors). An answer counts only if is_valid(answer) holds. Each
+    attempt goes to the first provider whose breaker is closed (falling through the list), and
+    with hedging a second request goes to the next provider once the first has been running
+    longer than the primary's recent hedge_quantile latency; the first valid answer wins. The
+    losing request is cancelled: a streamed one stops at its next chunk and closes its connection
+    (see until_cancelled), one not sent yet is never sent, and a non-streamed one in flight is
+    discarded when it arrives. What losers cost is counted in hedge_wasted_tokens (estimated prompt
+    tokens plus what they generated). Failed attempts are retried with jittered exponential
+    backoff. Returns None when every attempt failed.
+
+    With a router (utils/router.py) the primary and hedge providers are picked by its live
+    weighted split instead of list order, within its per-provider concurrency caps, and every
+    request's latency, output tokens and outcome feed its statistics.
+    """
+
+    def __init__(self, providers, is_valid=None, policy=None, failure_threshold=5, reset_timeout=30.0,
+                 hedge=False, hedge_quantile=0.95, hedge_initial_delay=15.0, hedge_min_delay=1.0, max_workers=32,
+                 router=None):
+        self.providers = list(providers)
+        self.router = router
+        self.is_valid = is_valid or (lambda answer: answer is not None)
+        self.policy = policy or RetryPolicy()
+        self.breakers = {name: CircuitBreaker(name, failure_threshold, reset_timeout) for name, _ in self.providers}
+        self.latencies = {name: LatencyTracker() for name, _ in self.providers}
+        self.hedge = hedge and len(self.providers) > 1
+        self.hedge_quantile = hedge_quantile
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm") if self.hedge else None
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "hedged": 0, "hedge_wins": 0,
+                         "hedge_losers": 0, "hedge_cancelled": 0, "hedge_wasted_tokens": 0}
+        self.sent = {name: 0 for name, _ in self.providers}
+        self.lock = threading.Lock()
+
+    def _count(self, name, increment=1):
+        with self.lock:
+            self.counters[name] += increment
+
+    def hedge_delay(self, provider):
+        observed = self.latencies[provider].quantile(self.hedge_quantile)
+        if observed is None:
+            return self.hedge_initial_delay
+        return max(self.hedge_min_delay, observed)
+
+    def _pick(self, excluded, block=True):
+        if self.router is None:
+            for name, call in self.providers:
+                if name not in excluded and self.breakers[name].allow():
+                    return name, call
+            return None, None
+        calls = dict(self.providers)
+        skipped = set(excluded)
+        while True:
+            candidates = [name for name in calls if name not in skipped and self.breakers[name].available()]
+            name = self.router.acquire(candidates, block) if candidates else None
+            if name is None:
+                return None, None
+            if self.breakers[name].allow():
+                return name, calls[name]
+            # Another thread took the half-open trial call meanwhile
+            self.router.cancel(name)
+            skipped.add(name)
+
+    def _run(self, name, call, args, cancel_event=None):
+        """One request; returns (name, answer, error). Breaker and latency bookkeeping happen here.
+
+        cancel_event is set when the request loses a hedge; it must run in its own context (see _submit).
+        """
+        if cancel_event is not None:
+            _cancel_event.set(cancel_event)
+        with self.lock:
+            self.sent[name] += 1
+        start = time.perf_counter()
+        answer, error = None, None
+        try:
+            answer = call(*args)
+            if not self.is_valid(answer):
+                answer, error = None, ProviderError(name, None, "no valid answer")
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - start
+        if cancel_event is not None and cancel_event.is_set():
+            # Cut short by the other request of its hedge: says nothing about this provider's health or speed
+            if self.router is not None:
+                self.router.cancel(name)
+            return name, answer, error
+        if error is not None:
+            self.breakers[name].record_failure()
+        else:
+            self.breakers[name].record_success()
+            self.latencies[name].add(elapsed)
+        if self.router is not None:
+            self.router.release(name, elapsed, estimate_tokens(answer) if answer else 0, error is None)
+        return name, answer, error
+
+    def _attempt(self, args, excluded):
+        """One attempt, possibly hedged; returns (answer, [(name, error)])."""
+        primary, call = self._pick(excluded)
+        if primary is None:
+            return None, []
+        if not self.hedge:
+            name, answer, error = self._run(primary, call, args)
+            return answer, [(name, error)] if error else []
+
+        events = {}
+        pending = {self._submit(primary, call, args, events)}
+        done, _ = wait(pending, timeout=self.hedge_delay(primary))
+        if not done:
+            backup, backup_call = self._pick(excluded | {primary}, block=False)
+            if backup is not None:
+                logging.info(f"[{primary}] no answer after {self.hedge_delay(primary):.1f}s, hedging with {backup}")
+                self._count("hedged")
+                pending.add(self._submit(backup, backup_call, args, events))
+        errors = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, answer, error = future.result()
+                if error is None:
+                    if name != primary:
+                        self._count("hedge_wins")
+                    # The other request (still running, or finished at the same moment) is not needed
+                    for loser in pending | (done - {future}):
+                        events[loser].set()
+                        with self.lock:
+                            self.counters["hedge_losers"] += 1
+                            self.counters["hedge_wasted_tokens"] += request_tokens(args)
+                        loser.add_done_callback(self._discard)
+                    return answer, errors
+                errors.append((name, error))
+        return None, errors
+
+    def _submit(self, name, call, args, events):
+        """Start one request of a hedge with its own cancel event; returns its future."""
+        event = threading.Event()
+        # Attempts run in a copy of the caller's context, so their spans (utils/tracing.py) nest under its own
+        future = self.executor.submit(contextvars.copy_context().run, self._run, name, call, args, event)
+        events[future] = event
+        return future
+
+    def _discard(self, future):
+        """Add what a losing hedged request generated before it stopped (its prompt is counted when it loses)."""
+        _, answer, error = future.result()
+        if answer is not None:
+            generated = estimate_tokens(answer)
+        elif isinstance(error, RequestCancelled):
+            generated = estimate_tokens(error.partial)
+        else:
+            generated = 0
+        with self.lock:
+            self.counters["hedge_cancelled"] += isinstance(error, RequestCancelled)
+            self.counters["hedge_wasted_tokens"] += generated
+
+    def call(self, *args, label=""):
+        self._count("calls")
+        excluded = set()
+        for attempt in range(self.policy.max_attempts):
+            answer, errors = self._attempt(args, excluded)
+            if answer is not None:
+                self._count("succeeded")
+                return answer
+            for name, error in errors:
+                logging.warning(f"{label} attempt {attempt + 1} on {name} failed: {error}")
+                # Bad requests, auth errors etc. will fail the same way again on this provider
+                if isinstance(error, ProviderError) and not error.retryable:
+                    excluded.add(name)
+            if len(excluded) == len(self.providers):
+                break
+            if attempt + 1 < self.policy.max_attempts:
+                self._count("retries")
+                if errors:
+                    time.sleep(self.policy.delay(attempt))
+                else:
+                    # Every breaker is open: wait for the first one to allow a trial call
+                    time.sleep(min(self.policy.max_delay, min(b.reset_timeout for b in self.breakers.values())))
+        self._count("failed")
+        logging.error(f"{label} no valid answer after {self.policy.max_attempts} attempts")
+        return None
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["sent"] = dict(self.sent)
+        stats["circuits"] = {name: breaker.state for name, breaker in self.breakers.items()}
+        if self.router is not None:
+            stats["routing"] = self.router.snapshot()
+        return stats
+
+    def log_stats(self):
+        if self.counters["calls"]:
+            logging.info(f"Resilient calls: {self.stats()}")
+            if self.router is not None:
+                self.router.report()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+# Smoothing factor of the rolling (exponentially weighted) latency, throughput and error-rate averages
+EWMA_ALPHA = 0.1
+
+# Every healthy provider keeps at least this share of the traffic, so its statistics stay current
+MIN_SHARE = 0.05
+
+# Error rate above which a provider only gets the MIN_SHARE probe traffic
+UNHEALTHY_ERROR_RATE = 0.5
+
+
+class ProviderStats:
+    def __init__(self, name, weight, max_concurrency):
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        # Rolling averages; None until the first observation
+        self.latency = None
+        self.tokens_per_sec = None
+        self.error_rate = 0.0
+
+    def observe(self, seconds, tokens, ok):
+        self.requests += 1
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            self.failures += 1
+            return
+        self.latency = seconds if self.latency is None else self.latency + EWMA_ALPHA * (seconds - self.latency)
+        if tokens and seconds > 0:
+            rate = tokens / seconds
+            self.tokens_per_sec = rate if self.tokens_per_sec is None else \
+                self.tokens_per_sec + EWMA_ALPHA * (rate - self.tokens_per_sec)
+
+    @property
+    def healthy(self):
+        return self.error_rate <= UNHEALTHY_ERROR_RATE
+
+
+class AdaptiveRouter:
+    """Weighted traffic split across providers, driven by live measurements.
+
+    Each provider's score is its configured weight times its measured speed (rolling output
+    tokens/second, or 1/latency before any tokens are counted) times its success rate squared.
+    Providers without measurements are scored like the best measured one so they get tried.
+    Shares follow the scores, with MIN_SHARE kept for every provider so a recovered or newly
+    fast backend is noticed, and requests are only sent to providers below their concurrency
+    cap. snapshot() shows the numbers behind the current split; it is logged, and written to
+    stats_path, every stats_interval seconds.
+    """
+
+    def __init__(self, providers, stats_interval=60.0, stats_path=None, rng=None):
+        self.stats = {spec.name: ProviderStats(spec.name, spec.weight, spec.max_concurrency) for spec in providers}
+        self.stats_interval = stats_interval
+        self.stats_path = stats_path
+        self.rng = rng or random.Random()
+        self.condition = threading.Condition()
+        self.last_report = time.monotonic()
+
+    def _speed(self, stats):
+        if stats.tokens_per_sec is not None:
+            return stats.tokens_per_sec
+        if stats.latency is not None:
+            return 1.0 / max(stats.latency, 1e-3)
+        return None
+
+    def shares(self, names=None):
+        """Target traffic share per provider (the caller holds the lock or accepts a racy read)."""
+        names = list(names if names is not None else self.stats)
+        measured = [self._speed(self.stats[name]) for name in names]
+        known = [speed for speed in measured if speed is not None]
+        optimistic = max(known) if known else 1.0
+        scores = {}
+        for name, speed in zip(names, measured):
+            stats = self.stats[name]
+            score = stats.weight * (speed if speed is not None else optimistic) * (1.0 - stats.error_rate) ** 2
+            scores[name] = score if stats.healthy else 0.0
+        total = sum(scores.values())
+        if not total:
+            return {name: 1.0 / len(names) for name in names} if names else {}
+        floor = min(MIN_SHARE, 1.0 / len(names))
+        return {name: floor + (1.0 - floor * len(names)) * score / total for name, score in scores.items()}
+
+    def acquire(self, candidates, block=True):
+        """Pick one of candidates by share among those below their cap and take a slot; None if none
+        is free and block is False. Blocks until a slot frees up otherwise."""
+        candidates = [name for name in candidates if name in self.stats]
+        if not candidates:
+            return None
+        with self.condition:
+            while True:
+                free = [name for name in candidates if self.stats[name].in_flight < self.stats[name].max_concurrency]
+                if free:
+                    shares = self.shares(free)
+                    pick = self.rng.uniform(0, sum(shares.values()))
+                    for name in free:
+                        pick -= shares[name]
+                        if pick <= 0:
+                            break
+                    self.stats[name].in_flight += 1
+                    return name
+                if not block:
+                    return None
+                self.condition.wait()
+
+    def cancel(self, name):
+        """Give back a slot taken by acquire() without recording a request."""
+        with self.condition:
+            self.stats[name].in_flight -= 1
+            self.condition.notify_all()
+
+    def release(self, name, seconds, tokens=0, ok=True):
+        with self.condition:
+            stats = self.stats[name]
+            stats.in_flight -= 1
+            stats.observe(seconds, tokens, ok)
+            self.condition.notify_all()
+            report = time.monotonic() - self.last_report >= self.stats_interval
+            if report:
+                self.last_report = time.monotonic()
+        if report:
+            self.report()
+
+    def snapshot(self):
+        with self.condition:
+            shares = self.shares()
+            return {
+                name: {
+                    "share": round(shares[name], 3),
+                    "weight": stats.weight,
+                    "latency_s": round(stats.latency, 3) if stats.latency is not None else None,
+                    "tokens_per_sec": round(stats.tokens_per_sec, 1) if stats.tokens_per_sec is not None else None,
+                    "error_rate": round(stats.error_rate, 3),
+                    "in_flight": stats.in_flight,
+                    "max_concurrency": stats.max_concurrency,
+                    "requests": stats.requests,
+                    "failures": stats.failures,
+                }
+                for name, stats in self.stats.items()
+            }
+
+    def report(self):
+        snapshot = self.snapshot()
+        logging.info("Provider routing: " + "; ".join(
+            f"{name} {s['share']:.0%} (latency {s['latency_s']}s, {s['tokens_per_sec']} tok/s, "
+            f"errors {s['error_rate']:.0%}, {s['in_flight']}/{s['max_concurrency']} in flight)"
+            for name, s in snapshot.items()))
+        if self.stats_path:
+            directory = os.path.dirname(self.stats_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.stats_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"time": time.time(), "providers": snapshot}, f, indent=2)
+            os.replace(temp_path, self.stats_path)
+        return snapshot
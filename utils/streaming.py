@@ -0,0 +1,196 @@
+import json
+import logging
+import time
+
+# Generations longer than this many characters are cut off; a filled-in template is a few KB
+DEFAULT_MAX_RESPONSE_CHARS = 32000
+
+# No single value in a filled-in template is anywhere near this long; a longer string is a runaway generation
+DEFAULT_MAX_STRING_CHARS = 2000
+
+# After the object closes, read at most this much more so the connection can be reused
+TRAILING_ALLOWANCE = 64
+
+# Top-level keys outside the template tolerated before the answer is treated as off-template
+DEFAULT_MAX_UNKNOWN_KEYS = 3
+
+# Outside strings, JSON only ever contains these characters
+_JSON_STRUCTURAL = set("{}[],: \t\r\n")
+_JSON_SCALAR = set("0123456789-+.eE") | set("truefalsn")
+
+
+class StreamAborted(Exception):
+    """Raised by JsonStreamGuard when the generation clearly is not the JSON we asked for."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class JsonStreamGuard:
+    """Incremental, character-level check that a streamed answer is one JSON object shaped like the template.
+
+    Aborts on markdown fences or prose (anything but "{" first, or non-JSON characters between
+    tokens), on too many top-level keys the template does not have, on any string longer than
+    max_string_chars and on answers longer than max_chars. complete becomes True as soon as the top-level object closes, so the caller can
+    stop reading instead of waiting for trailing text.
+    """
+
+    def __init__(self, json_template=None, max_chars=DEFAULT_MAX_RESPONSE_CHARS, max_unknown_keys=DEFAULT_MAX_UNKNOWN_KEYS,
+                 max_string_chars=DEFAULT_MAX_STRING_CHARS):
+        if isinstance(json_template, str):
+            try:
+                json_template = json.loads(json_template)
+            except ValueError:
+                json_template = None
+        self.expected_keys = set(json_template) if isinstance(json_template, dict) else None
+        self.max_chars = max_chars
+        self.max_unknown_keys = max_unknown_keys
+        self.max_string_chars = max_string_chars
+        self.string_chars = 0
+        self.size = 0
+        self.started = False
+        self.complete = False
+        # Characters up to and including the closing brace of the top-level object
+        self.end = None
+        self.in_string = False
+        self.escape = False
+        # Containers currently open: "{" or "["; a string directly inside "{" after "{" or "," is a key
+        self.stack = []
+        self.expect_key = False
+        self.key_chars = None
+        self.unknown_keys = []
+
+    def feed(self, delta):
+        self.size += len(delta)
+        if self.size > self.max_chars:
+            raise StreamAborted(f"response longer than {self.max_chars} characters")
+        for i, ch in enumerate(delta):
+            self._step(ch)
+            if self.complete:
+                self.end = self.size - len(delta) + i + 1
+                return
+
+    def _step(self, ch):
+        if self.in_string:
+            self.string_chars += 1
+            if self.string_chars > self.max_string_chars:
+                raise StreamAborted(f"string value longer than {self.max_string_chars} characters")
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                if self.key_chars is not None:
+                    self._check_key("".join(self.key_chars))
+                    self.key_chars = None
+                return
+            if self.key_chars is not None:
+                self.key_chars.append(ch)
+            return
+
+        if not self.started:
+            if ch.isspace():
+                return
+            if ch == "`":
+                raise StreamAborted("markdown code fence")
+            if ch != "{":
+                raise StreamAborted("prose instead of a JSON object")
+            self.started = True
+
+        if ch == '"':
+            self.in_string = True
+            self.string_chars = 0
+            if self.expect_key and len(self.stack) == 1:
+                self.key_chars = []
+            self.expect_key = False
+        elif ch in "{[":
+            self.stack.append(ch)
+            self.expect_key = ch == "{"
+        elif ch in "}]":
+            if not self.stack or (self.stack[-1] == "{") != (ch == "}"):
+                raise StreamAborted("unbalanced JSON")
+            self.stack.pop()
+            self.expect_key = False
+            if not self.stack:
+                self.complete = True
+        elif ch == ",":
+            self.expect_key = bool(self.stack) and self.stack[-1] == "{"
+        elif ch not in _JSON_STRUCTURAL and ch not in _JSON_SCALAR:
+            raise StreamAborted(f"non-JSON character {ch!r} in response")
+
+    def _check_key(self, key):
+        if self.expected_keys is None or key in self.expected_keys:
+            return
+        self.unknown_keys.append(key)
+        if len(self.unknown_keys) > self.max_unknown_keys:
+            raise StreamAborted(f"keys not in template: {', '.join(self.unknown_keys)}")
+
+
+class StreamResult:
+    def __init__(self, started_at=None):
+        self.parts = []
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.ttft = None
+        self.total = None
+        self.aborted = None
+
+    @property
+    def content(self):
+        return "".join(self.parts)
+
+
+def iter_sse_deltas(lines):
+    """Content deltas from an OpenAI-style server-sent event stream of chat.completion.chunk objects."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            # Keep reading to the end of the body so the connection goes back to the pool
+            continue
+        try:
+            chunk = json.loads(payload)
+        except ValueError:
+            logging.warning(f"Skipping malformed stream chunk: {payload[:80]}")
+            continue
+        if chunk.get("error"):
+            raise RuntimeError(f"provider error in stream: {chunk['error']}")
+        for choice in chunk.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+def consume_stream(deltas, guard, started_at=None):
+    """Read deltas through guard; stops at the end of the JSON object, on abort, or when the stream ends.
+
+    started_at (a time.perf_counter() value) should be taken before the request was sent, so
+    ttft includes the time to the response headers.
+    """
+    result = StreamResult(started_at)
+    try:
+        for delta in deltas:
+            if result.ttft is None:
+                result.ttft = time.perf_counter() - result.started_at
+            result.parts.append(delta)
+            guard.feed(delta)
+            if guard.complete:
+                break
+        if guard.complete:
+            trailing = 0
+            for delta in deltas:
+                trailing += len(delta)
+                if trailing > TRAILING_ALLOWANCE:
+                    break
+    except StreamAborted as e:
+        result.aborted = e.reason
+    if guard.complete and guard.end is not None:
+        # Drop anything generated after the object closed (", hope this helps!" etc.)
+        content = result.content[:guard.end]
+        result.parts = [content]
+    result.total = time.perf_counter() - result.started_at
+    return result
@@ -0,0 +1,317 @@
+import bisect
+import contextvars
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stages instrumented in utils/functions.py. Spans nest: "file" covers a whole input, "vision" includes the
+# "llm" call it makes, "validate" includes any repair call, so stage times do not add up to the file time.
+STAGES = ("file", "extract", "convert", "vision", "near_dup", "llm", "validate", "write")
+
+# Counted attributes of a span, summed per stage and file type
+COUNTED = ("bytes", "pages", "images", "prompt_tokens", "completion_tokens")
+
+# Histogram bucket edges in seconds: 0.1 ms * 2^(k/4), up to about 28 minutes. Quantiles are interpolated
+# inside a bucket (at most 19% wide); Prometheus gets every fourth edge (powers of two) as its buckets.
+BUCKET_EDGES = tuple(0.0001 * 2 ** (k / 4) for k in range(97))
+PROMETHEUS_EDGES = BUCKET_EDGES[::4]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Slowest files kept with their per-stage breakdown for the end-of-run report
+DEFAULT_SLOWEST_FILES = 10
+
+METRIC_PREFIX = "resume_parser"
+
+# Innermost open span of the running thread (or of the task a copied context was handed to)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def file_type_of(name):
+    extension = os.path.splitext(name or "")[1].lower().lstrip(".")
+    return "jpg" if extension == "jpeg" else extension or "none"
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKET_EDGES, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKET_EDGES[i - 1] if i > 0 else 0.0
+                upper = BUCKET_EDGES[i] if i < len(BUCKET_EDGES) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def cumulative(self, edges):
+        """Observations at or below each of edges (which must be a subset of BUCKET_EDGES)."""
+        totals = []
+        running = 0
+        position = 0
+        for edge in edges:
+            index = BUCKET_EDGES.index(edge)
+            running += sum(self.counts[position:index + 1])
+            position = index + 1
+            totals.append(running)
+        return totals
+
+
+class StageStats:
+    __slots__ = ("histogram", "errors", "counters")
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.errors = 0
+        self.counters = dict.fromkeys(COUNTED, 0)
+
+
+class Span:
+    """One timed stage; attributes set on it are recorded when it ends."""
+
+    __slots__ = ("tracer", "stage", "attrs", "start", "parent", "breakdown", "token")
+
+    def __init__(self, tracer, stage, attrs):
+        self.tracer = tracer
+        self.stage = stage
+        self.attrs = attrs
+        self.breakdown = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        if self.parent is not None:
+            # Children are labelled with the file their parent is working on
+            for key in ("file", "file_type"):
+                if key not in self.attrs and key in self.parent.attrs:
+                    self.attrs[key] = self.parent.attrs[key]
+        if "file_type" not in self.attrs:
+            self.attrs["file_type"] = file_type_of(self.attrs.get("file"))
+        self.token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _current_span.reset(self.token)
+        if exc_type is not None and "error" not in self.attrs:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish(self, duration)
+        return False
+
+
+class NullSpan:
+    """What a disabled tracer hands out: entering, leaving and set() do nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Per-stage spans (utils/functions.py) aggregated into latency histograms and counters.
+
+    with tracer.span("extract", file=name, bytes=size) as span: ... span.set(pages=n)
+
+    Each finished span adds its duration to the histogram of (stage, file type) and its bytes,
+    pages, images and token attributes to that stage's counters; a span left through an exception,
+    or given an "error" attribute, counts as an error. Spans nest across threads started with a
+    copied context (hedged LLM calls). "file" spans also keep how long their file spent in each
+    stage, and the slowest files are listed in the report. A disabled tracer returns one shared
+    no-op span, so instrumented code costs a method call per stage.
+    """
+
+    def __init__(self, enabled=True, slowest_files=DEFAULT_SLOWEST_FILES):
+        self.enabled = enabled
+        self.slowest_files = slowest_files
+        self.stats = {}
+        self.slowest = []
+        self.finished_files = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def span(self, stage, **attrs):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage, attrs)
+
+    def _finish(self, span, duration):
+        attrs = span.attrs
+        # The file this span worked for collects the time of every stage under it
+        owner = span.parent
+        while owner is not None and owner.stage != "file":
+            owner = owner.parent
+        with self.lock:
+            if owner is not None:
+                if owner.breakdown is None:
+                    owner.breakdown = {}
+                owner.breakdown[span.stage] = owner.breakdown.get(span.stage, 0.0) + duration
+            key = (span.stage, attrs["file_type"])
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = StageStats()
+            stats.histogram.observe(duration)
+            if attrs.get("error"):
+                stats.errors += 1
+            for name in COUNTED:
+                value = attrs.get(name)
+                if value:
+                    stats.counters[name] += value
+            if span.stage == "file" and self.slowest_files:
+                self.finished_files += 1
+                # The sequence number keeps entries of equal duration from comparing their dicts
+                entry = (duration, self.finished_files, attrs.get("file", ""),
+                         {stage: round(seconds, 4) for stage, seconds in (span.breakdown or {}).items()})
+                if len(self.slowest) < self.slowest_files:
+                    heapq.heappush(self.slowest, entry)
+                elif duration > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, entry)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            details = " ".join(f"{name}={value}" for name, value in attrs.items() if name != "file")
+            logging.debug(f"span {span.stage} {attrs.get('file', '-')} {duration:.3f}s {details}")
+
+    def report(self):
+        """Per stage and file type: count, errors, seconds (sum, p50/p95/p99, max) and counters."""
+        with self.lock:
+            items = sorted(self.stats.items(), key=lambda item: (STAGES.index(item[0][0])
+                                                                 if item[0][0] in STAGES else len(STAGES), item[0][1]))
+            slowest = sorted(self.slowest, reverse=True)
+            stages = {}
+            for (stage, file_type), stats in items:
+                histogram = stats.histogram
+                entry = {"count": histogram.count, "errors": stats.errors, "seconds_total": round(histogram.sum, 4)}
+                for q in QUANTILES:
+                    entry[f"p{int(q * 100)}_seconds"] = round(histogram.quantile(q), 6)
+                entry["max_seconds"] = round(histogram.max, 6)
+                entry.update({name: value for name, value in stats.counters.items() if value})
+                stages.setdefault(stage, {})[file_type] = entry
+        return {"started": self.started, "wall_seconds": round(time.time() - self.started, 3), "stages": stages,
+                "slowest_files": [{"file": name, "seconds": round(duration, 4), "stages": breakdown}
+                                  for duration, _, name, breakdown in slowest]}
+
+    def write_report(self, path):
+        """Write report() as JSON to path (the end-of-run summary); nothing is written when disabled."""
+        if not self.enabled:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        logging.info(f"Stage timings written to {path}")
+
+    def log_summary(self):
+        """One line per stage: count and p50/p95/p99 over all file types."""
+        if not self.enabled:
+            return
+        with self.lock:
+            merged = {}
+            for (stage, _), stats in self.stats.items():
+                histogram = merged.setdefault(stage, Histogram())
+                for i, count in enumerate(stats.histogram.counts):
+                    histogram.counts[i] += count
+                histogram.count += stats.histogram.count
+                histogram.sum += stats.histogram.sum
+                for bound in (stats.histogram.min, stats.histogram.max):
+                    if bound is not None:
+                        histogram.min = bound if histogram.min is None else min(histogram.min, bound)
+                        histogram.max = bound if histogram.max is None else max(histogram.max, bound)
+        for stage in sorted(merged, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            histogram = merged[stage]
+            logging.info(f"Stage {stage}: {histogram.count} spans, p50 {histogram.quantile(0.5):.3f}s, "
+                         f"p95 {histogram.quantile(0.95):.3f}s, p99 {histogram.quantile(0.99):.3f}s")
+
+    def prometheus(self):
+        """Prometheus text exposition (format 0.0.4) of the stage histograms and counters."""
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent per pipeline stage.", f"# TYPE {name} histogram"]
+        quantile_lines = [f"# HELP {name}_quantile Interpolated latency quantiles per pipeline stage.",
+                          f"# TYPE {name}_quantile gauge"]
+        error_lines = [f"# HELP {METRIC_PREFIX}_stage_errors_total Spans that ended in an error.",
+                       f"# TYPE {METRIC_PREFIX}_stage_errors_total counter"]
+        counter_lines = {counted: [f"# HELP {METRIC_PREFIX}_{counted}_total Sum of {counted} per pipeline stage.",
+                                   f"# TYPE {METRIC_PREFIX}_{counted}_total counter"] for counted in COUNTED}
+        with self.lock:
+            for (stage, file_type), stats in sorted(self.stats.items()):
+                labels = f'stage="{stage}",file_type="{file_type}"'
+                histogram = stats.histogram
+                for edge, total in zip(PROMETHEUS_EDGES, histogram.cumulative(PROMETHEUS_EDGES)):
+                    lines.append(f'{name}_bucket{{{labels},le="{edge:.6g}"}} {total}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+                for q in QUANTILES:
+                    quantile_lines.append(f'{name}_quantile{{{labels},quantile="{q}"}} {histogram.quantile(q):.6f}')
+                error_lines.append(f"{METRIC_PREFIX}_stage_errors_total{{{labels}}} {stats.errors}")
+                for counted, value in stats.counters.items():
+                    if value:
+                        counter_lines[counted].append(f"{METRIC_PREFIX}_{counted}_total{{{labels}}} {value}")
+        body = lines + quantile_lines + error_lines
+        for counted in COUNTED:
+            if len(counter_lines[counted]) > 2:
+                body += counter_lines[counted]
+        return "\n".join(body) + "\n"
+
+
+NULL_TRACER = Tracer(enabled=False)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        payload = self.server.tracer.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_metrics_server(tracer, host, port):
+    """Serve tracer.prometheus() at http://host:port/metrics on a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.tracer = tracer
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Prometheus metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
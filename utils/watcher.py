@@ -0,0 +1,347 @@
+import ctypes
+import ctypes.util
+import importlib.util
+import logging
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+
+# Seconds a new file must go without writes, with an unchanged size and mtime, before it is processed
+DEFAULT_SETTLE_SECONDS = 1.0
+
+# Files handed to the pipeline in one go; arrivals during a batch form the next one
+DEFAULT_MAX_BATCH = 256
+
+# Rescan interval of the polling fallback (no inotify and no watchdog package)
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Kinds of events the backends report
+CHANGED, REMOVED, OVERFLOW = "changed", "removed", "overflow"
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF \
+    | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    """Linux inotify on one directory, through libc (no extra package)."""
+
+    name = "inotify"
+
+    def __init__(self, directory):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Cannot watch {directory}: {os.strerror(errno)}")
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("linux")
+
+    def events(self, timeout):
+        """(kind, name) pairs, waiting up to timeout seconds for the first one."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((OVERFLOW, None))
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                raise RuntimeError("The watched directory was removed or moved")
+            elif mask & IN_ISDIR or not name:
+                continue
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                events.append((REMOVED, name))
+            else:
+                events.append((CHANGED, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WatchdogBackend:
+    """The watchdog package (FSEvents on macOS, ReadDirectoryChangesW on Windows), when it is installed."""
+
+    name = "watchdog"
+
+    def __init__(self, directory):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+        self.queue = queue.Queue()
+        backend = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                if event.event_type in ("deleted", "moved"):
+                    backend.queue.put((REMOVED, os.path.basename(event.src_path)))
+                if event.event_type == "moved":
+                    backend.queue.put((CHANGED, os.path.basename(event.dest_path)))
+                elif event.event_type in ("created", "modified", "closed"):
+                    backend.queue.put((CHANGED, os.path.basename(event.src_path)))
+
+        self.observer = Observer()
+        self.observer.schedule(Handler(), directory, recursive=False)
+        self.observer.start()
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec("watchdog") is not None
+
+    def events(self, timeout):
+        try:
+            events = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+class PollingBackend:
+    """Last resort: list the directory every poll_interval seconds and report what changed."""
+
+    name = "polling"
+
+    def __init__(self, directory, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.snapshot = self._scan()
+        self.next_scan = time.monotonic() + poll_interval
+
+    @staticmethod
+    def available():
+        return True
+
+    def _scan(self):
+        with os.scandir(self.directory) as it:
+            return {entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns) for entry in it if entry.is_file()}
+
+    def events(self, timeout):
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait))
+        self.next_scan = time.monotonic() + self.poll_interval
+        snapshot = self._scan()
+        events = [(CHANGED, name) for name, stat in snapshot.items() if self.snapshot.get(name) != stat]
+        events += [(REMOVED, name) for name in self.snapshot if name not in snapshot]
+        self.snapshot = snapshot
+        return events
+
+    def close(self):
+        pass
+
+
+def open_backend(directory, poll_interval=DEFAULT_POLL_INTERVAL):
+    if InotifyBackend.available():
+        return InotifyBackend(directory)
+    if WatchdogBackend.available():
+        return WatchdogBackend(directory)
+    logging.warning(f"No inotify and no watchdog package (pip install watchdog): polling {directory} "
+                    f"every {poll_interval} seconds.")
+    return PollingBackend(directory, poll_interval)
+
+
+class WatchedFile:
+    """The part of os.DirEntry that ProcessingManifest.pending uses, for a file reported by an event."""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+
+    def is_file(self):
+        return os.path.isfile(self.path)
+
+    def stat(self):
+        return os.stat(self.path)
+
+
+class DirectoryWatcher:
+    """Feeds files arriving in a directory to a handler as soon as they are completely written (main.py --watch).
+
+    The directory is subscribed to before the one catch-up listing at startup, so nothing written in
+    between is missed; after that only events are used, never a full rescan (except once after an
+    inotify queue overflow). A file is handed over once it has gone settle seconds without events and
+    its size and mtime did not change in that time, so half-copied uploads are never read. handle(entries)
+    runs on a separate thread with a list of os.DirEntry/WatchedFile objects; whatever becomes ready while
+    it runs is passed in the next call, at most max_batch files at a time.
+    """
+
+    def __init__(self, directory, extensions, handle, settle=DEFAULT_SETTLE_SECONDS, max_batch=DEFAULT_MAX_BATCH,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.directory = directory
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.handle = handle
+        self.settle = settle
+        self.max_batch = max(1, max_batch)
+        self.poll_interval = poll_interval
+        # name -> (monotonic time of the last event, (size, mtime_ns) then)
+        self.pending = {}
+        self.ready = queue.Queue()
+        self.stopping = threading.Event()
+        self.backend = None
+        self.worker = None
+        self.counters = {"events": 0, "handed_over": 0, "batches": 0}
+
+    def _wanted(self, name):
+        # Office lock files (~$cv.docx) and dot-files left by copy tools are never inputs
+        return name.lower().endswith(self.extensions) and not name.startswith((".", "~$"))
+
+    def _stat(self, name):
+        try:
+            stat = os.stat(os.path.join(self.directory, name))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _touch(self, name, now):
+        self.pending[name] = (now, self._stat(name))
+
+    def catch_up(self):
+        """Queue every input already in the directory (one listing); files still being written wait to settle."""
+        now = time.monotonic()
+        wall = time.time()
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file() or not self._wanted(entry.name):
+                    continue
+                stat = entry.stat()
+                age = wall - stat.st_mtime
+                if age >= self.settle and entry.name not in self.pending:
+                    entries.append(entry)
+                else:
+                    self.pending[entry.name] = (now - max(0.0, age), (stat.st_size, stat.st_mtime_ns))
+        logging.info(f"Watch: {len(entries)} files waiting in {self.directory}, {len(self.pending)} still settling.")
+        for start in range(0, len(entries), self.max_batch):
+            self.ready.put(entries[start:start + self.max_batch])
+
+    def _settled(self, now):
+        """Move pending files that stayed unchanged for settle seconds to the ready queue."""
+        ready = []
+        for name, (last_event, stat) in list(self.pending.items()):
+            if now - last_event < self.settle:
+                continue
+            current = self._stat(name)
+            if current is None:
+                del self.pending[name]
+            elif current != stat:
+                # Still growing without events (e.g. a network share): wait another period
+                self.pending[name] = (now, current)
+            else:
+                del self.pending[name]
+                ready.append(WatchedFile(self.directory, name))
+        for start in range(0, len(ready), self.max_batch):
+            self.ready.put(ready[start:start + self.max_batch])
+
+    def _process(self):
+        while True:
+            batch = self.ready.get()
+            if batch is None:
+                return
+            # Merge whatever else is ready, so a burst of arrivals is one pipeline run
+            while len(batch) < self.max_batch:
+                try:
+                    more = self.ready.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self.ready.put(None)
+                    break
+                batch.extend(more)
+            names = ", ".join(entry.name for entry in batch[:5]) + (" ..." if len(batch) > 5 else "")
+            logging.info(f"Watch: processing {len(batch)} new files ({names})")
+            self.counters["handed_over"] += len(batch)
+            self.counters["batches"] += 1
+            try:
+                self.handle(batch)
+            except Exception as e:
+                logging.error(f"Watch: error processing {names}: {str(e)}")
+
+    def run(self):
+        """Watch until stop() is called or the process is interrupted."""
+        self.backend = open_backend(self.directory, self.poll_interval)
+        logging.info(f"Watching {self.directory} for new files ({self.backend.name}).")
+        self.worker = threading.Thread(target=self._process, name="watch-pipeline", daemon=True)
+        self.worker.start()
+        self.catch_up()
+        while not self.stopping.is_set():
+            now = time.monotonic()
+            if self.pending:
+                timeout = max(0.05, min(last_event for last_event, _ in self.pending.values()) + self.settle - now)
+            else:
+                timeout = 1.0
+            for kind, name in self.backend.events(timeout):
+                self.counters["events"] += 1
+                if kind == OVERFLOW:
+                    logging.warning("Watch: inotify queue overflowed, listing the directory once to catch up.")
+                    self.catch_up()
+                elif not self._wanted(name):
+                    continue
+                elif kind == REMOVED:
+                    self.pending.pop(name, None)
+                else:
+                    self._touch(name, time.monotonic())
+            self._settled(time.monotonic())
+
+    def stop(self):
+        self.stopping.set()
+
+    def close(self):
+        """Stop watching and wait for the batch being processed (queued batches are left for the next start)."""
+        self.stopping.set()
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+        if self.worker is not None:
+            while True:
+                try:
+                    self.ready.get_nowait()
+                except queue.Empty:
+                    break
+            self.ready.put(None)
+            self.worker.join()
+            self.worker = None
+        logging.info(f"Watch: {self.counters['handed_over']} files in {self.counters['batches']} batches "
+                     f"from {self.counters['events']} events.")